@@ -0,0 +1,157 @@
+import re
+import math
+import unicodedata
+from functools import lru_cache
+
+from search_index import normalize
+
+
+# Проверка на свободен отговор
+# -----------------------------
+# И верният отговор, и написаното от ученика минават през една и съща
+# нормализация: Unicode NFKC, малки букви без ударения, латинските букви,
+# които изглеждат като кирилски (a, e, o, p, c, x...), стават кирилски, а
+# пунктуацията и излишните интервали отпадат. Така „коала “, „Коала.“ и
+# „кoала“ (с латинско o) са един и същ отговор.
+#
+# Отговорите с число (и мерна единица) се сравняват по стойност:
+# „24 см“, „24см“, „24 cm“, „24,0 см“ и „0,24 м“ са едно и също, а ако
+# ученикът не е написал единица, се сравнява само числото. Само позната
+# единица (_UNITS) се отделя от числото – „3 и 4“ и „2 пъти“ се сравняват
+# като текст.
+#
+# Освен "answer" въпросът може да има "accepted" – други верни отговори.
+# Нормализираните верни отговори се пазят (lru_cache) – при повторна
+# проверка на хиляди отговори се нормализира само написаното от ученика.
+
+# латински букви, които на екрана не се различават от кирилските
+# (след casefold – затова и b/h/m/t/k от главните B, H, M, T, K)
+_HOMOGLYPHS = str.maketrans({
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "k": "к", "m": "м",
+    "o": "о", "p": "р", "t": "т", "x": "х", "y": "у",
+})
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+# число (с десетична запетая или точка, или дроб) и незадължителна единица
+_QUANTITY_RE = re.compile(r"^([+\-−]?)(\d+(?:[.,]\d+)?)(?:\s*/\s*(\d+))?\s*(.*?)[\s.]*$")
+
+# единица -> ((величина, множител към основната единица), ...); ключовете
+# са след _fold, затова „cm“ вече е „см“, а „kg“ – „кg“. Съкращението може
+# да е на няколко величини („г“ – грам или година)
+_UNITS = {}
+
+
+def _add_units(dimension: str, factors: dict):
+    for names, factor in factors.items():
+        for name in names.split():
+            _UNITS[name] = _UNITS.get(name, ()) + ((dimension, factor),)
+
+
+_add_units("length", {"мм": 0.001, "см": 0.01, "дм": 0.1, "м метра метър": 1.0, "км": 1000.0})
+_add_units("area", {"мм2 кв.мм": 1e-6, "см2 кв.см": 1e-4, "дм2 кв.дм": 1e-2,
+                    "м2 кв.м": 1.0, "км2 кв.км": 1e6})
+_add_units("volume", {"мм3": 1e-9, "см3": 1e-6, "дм3": 1e-3, "м3": 1.0,
+                      "мл мl": 1e-6, "л l": 1e-3})
+_add_units("mass", {"мг мg": 0.001, "г гр g": 1.0, "кг кg": 1000.0, "т тон": 1e6})
+_add_units("time", {"с сек s": 1.0, "мин мin": 60.0, "ч час часа н": 3600.0})
+_add_units("money", {"ст стотинки": 0.01, "лв лева лев": 1.0})
+_add_units("angle", {"°": 1.0, "градуса градус": 1.0})
+_add_units("percent", {"%": 1.0, "процента процент": 1.0})
+_add_units("year", {"г год година": 1.0})
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return normalize(text).translate(_HOMOGLYPHS)
+
+
+def normalize_answer(text: str) -> str:
+    """Отговорът във вида, в който се сравнява (без пунктуация и излишни интервали)."""
+    return _NON_WORD_RE.sub(" ", _fold(text)).strip()
+
+
+def _parse_quantity(folded: str):
+    """
+    (стойност, единица) за вече нормализиран текст или None, ако не е число
+    с позната единица (или без единица).
+    """
+    m = _QUANTITY_RE.match(folded.strip())
+    if m is None:
+        return None
+    sign, number, denominator, unit = m.groups()
+    value = float(number.replace(",", "."))
+    if denominator:
+        if int(denominator) == 0:
+            return None
+        value /= int(denominator)
+    if sign:
+        value = -value
+    # „5 кв. м“ -> „кв.м“; точката накрая („24 см.“) вече е махната
+    unit = unit.replace(" ", "")
+    if unit and unit not in _UNITS:
+        return None
+    return value, unit
+
+
+def parse_quantity(text: str):
+    """(стойност, единица) за отговор като „24 см“ или None."""
+    return _parse_quantity(_fold(text))
+
+
+def _same_quantity(user, correct) -> bool:
+    u_value, u_unit = user
+    c_value, c_unit = correct
+
+    if not u_unit or not c_unit or u_unit == c_unit:
+        # без единица от едната страна – сравняваме само числото
+        return math.isclose(u_value, c_value, rel_tol=1e-9, abs_tol=1e-12)
+
+    for u_dim, u_factor in _UNITS[u_unit]:
+        for c_dim, c_factor in _UNITS[c_unit]:
+            if u_dim == c_dim and math.isclose(u_value * u_factor, c_value * c_factor,
+                                               rel_tol=1e-9, abs_tol=1e-12):
+                return True
+    return False
+
+
+class AnswerMatcher:
+    """Верните отговори на един въпрос, нормализирани веднъж."""
+
+    __slots__ = ("texts", "quantities")
+
+    def __init__(self, answers):
+        folded = [_fold(str(a)) for a in answers]
+        self.texts = frozenset(t for t in (_NON_WORD_RE.sub(" ", f).strip() for f in folded) if t)
+        self.quantities = tuple(q for q in map(_parse_quantity, folded) if q is not None)
+
+    def matches(self, user_raw: str) -> bool:
+        folded = _fold(user_raw)
+        if self.quantities:
+            user = _parse_quantity(folded)
+            if user is not None:
+                # по стойност – текстово „-5“ и „5“ биха съвпаднали
+                return any(_same_quantity(user, c) for c in self.quantities)
+        text = _NON_WORD_RE.sub(" ", folded).strip()
+        return bool(text) and text in self.texts
+
+
+def accepted_answers(question: dict) -> list:
+    """Отговорът от "answer" и другите приети отговори от "accepted"."""
+    answers = [question.get("answer") or ""]
+    answers.extend(question.get("accepted") or [])
+    return answers
+
+
+@lru_cache(maxsize=65536)
+def _compiled(answers: tuple) -> AnswerMatcher:
+    return AnswerMatcher(answers)
+
+
+def matcher_for(question: dict) -> AnswerMatcher:
+    return _compiled(tuple(str(a) for a in accepted_answers(question)))
+
+
+def compile_bank(questions: list) -> list:
+    """AnswerMatcher за всеки въпрос със свободен отговор (None за другите)."""
+    return [matcher_for(q) if q.get("type") == "text" else None for q in questions]
@@ -0,0 +1,331 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, Signal
+
+from question_bank import load_bank, bank_path, bank_stamp, BANK_EXTENSIONS
+
+
+# Кеш на заредените банки за целия процес
+# ----------------------------------------
+# Ключ е пътят към файла, а записът е валиден, докато (размер, mtime) на
+# файла и журнала му са същите. Въпросите в кеша са само за четене
+# (FrozenQuestion, списъците са tuple), затова всички тестове ползват едни
+# и същи обекти, без копиране. Редакторът е отделен процес и не ползва
+# кеша – чете банката направо в обикновени dict-ове.
+#
+# BankWatcher следи questions/ с QFileSystemWatcher. Докато следи папката,
+# кешът вярва на събитията и изобщо не проверява файловете – повторно
+# започнат тест не чете нищо от диска. При промяна (редакторът, копиран
+# файл...) засегнатите банки се зареждат наново във фонова нишка.
+#
+# В кеша влизат банки общо до QUIZ_BANK_CACHE_MB мегабайта JSON (по
+# подразбиране DEFAULT_CACHE_MB); по-големите се четат през индекса, както
+# досега (виж question_bank.py).
+
+DEFAULT_CACHE_MB = 64
+
+# събитията от един запис (временен файл, преименуване, журнал) се
+# обработват заедно след толкова милисекунди
+RELOAD_DELAY_MS = 200
+
+
+class FrozenQuestion(dict):
+    """dict, който не може да се променя – въпрос, споделен между тестовете."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Въпросите в кеша са само за четене.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenQuestion, (dict(self),))
+
+
+def freeze_question(question: dict) -> FrozenQuestion:
+    return FrozenQuestion({k: tuple(v) if isinstance(v, list) else v for k, v in question.items()})
+
+
+class CachedBank:
+    """Една заредена банка: въпросите (tuple) и Selector-а за тях при нужда."""
+
+    __slots__ = ("path", "stamp", "questions", "size", "_selector")
+
+    def __init__(self, path: str, stamp: tuple, questions: tuple):
+        self.path = path
+        self.stamp = stamp
+        self.questions = questions
+        self.size = sum(s[0] for s in stamp if s is not None)
+        self._selector = None
+
+    @property
+    def selector(self):
+        """Alias таблиците за selection.json – правят се при първата нужда."""
+        if self._selector is None:
+            from selection import Selector
+
+            self._selector = Selector.from_questions(self.questions)
+        return self._selector
+
+
+class BankCache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._items = OrderedDict()     # абсолютен път -> CachedBank
+        self._lock = threading.Lock()
+        # папки, чиито промени идват от BankWatcher – там не проверяваме файловете
+        self._trusted = set()
+
+    def get(self, path: str):
+        """
+        Банката от кеша (заредена при нужда) или None, ако е по-голяма от
+        бюджета. FileNotFoundError, ако файлът липсва; ValueError при грешен JSON.
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and os.path.dirname(key) in self._trusted:
+                self._items.move_to_end(key)
+                return entry
+
+        stamp = bank_stamp(key)
+        if stamp[0] is None:
+            self.invalidate(key)
+            raise FileNotFoundError(key)
+        if entry is not None and entry.stamp == stamp:
+            with self._lock:
+                if key in self._items:
+                    self._items.move_to_end(key)
+            return entry
+        return self.load(key, stamp)
+
+    def find(self, questions_path: str, grade: str, category: str):
+        """
+        (път, CachedBank или None) за банката на клас/предмет – само ако вече
+        е в кеша и е актуална; нищо не се зарежда. Ако папката се следи и
+        банката е в кеша – без нито едно четене от диска.
+        """
+        folder = os.path.abspath(questions_path)
+        with self._lock:
+            if folder in self._trusted:
+                for ext in BANK_EXTENSIONS:
+                    key = os.path.join(folder, f"{grade}_{category}{ext}")
+                    if key in self._items:
+                        self._items.move_to_end(key)
+                        return key, self._items[key]
+        path = os.path.abspath(bank_path(questions_path, grade, category))
+        entry = self.peek(path)
+        if entry is not None and entry.stamp != bank_stamp(path):
+            self.invalidate(path)
+            entry = None
+        return path, entry
+
+    def load(self, path: str, stamp: tuple = None):
+        """Чете банката наново (може и от работна нишка)."""
+        key = os.path.abspath(path)
+        # печатът е отпреди четенето – ако файлът се смени междувременно,
+        # следващата проверка ще го забележи
+        stamp = stamp or bank_stamp(key)
+        if stamp[0] is None:
+            self.invalidate(key)
+            raise FileNotFoundError(key)
+        if sum(s[0] for s in stamp if s is not None) > self.budget_bytes:
+            self.invalidate(key)
+            return None
+
+        questions = tuple(freeze_question(q) for q in load_bank(key))
+        entry = CachedBank(key, stamp, questions)
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: CachedBank):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old.size
+            self._items[key] = entry
+            self.used_bytes += entry.size
+            # най-старите излизат първи; последната банка остава винаги
+            while self.used_bytes > self.budget_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.used_bytes -= evicted.size
+
+    def peek(self, path: str):
+        """Записът в кеша без проверка на файла (или None)."""
+        with self._lock:
+            return self._items.get(os.path.abspath(path))
+
+    def invalidate(self, path: str):
+        with self._lock:
+            old = self._items.pop(os.path.abspath(path), None)
+            if old is not None:
+                self.used_bytes -= old.size
+
+    def cached_paths(self, folder: str = None) -> list:
+        with self._lock:
+            paths = list(self._items)
+        if folder is not None:
+            folder = os.path.abspath(folder)
+            paths = [p for p in paths if os.path.dirname(p) == folder]
+        return paths
+
+    def trust(self, folder: str, trusted: bool = True):
+        folder = os.path.abspath(folder)
+        with self._lock:
+            if trusted:
+                self._trusted.add(folder)
+            else:
+                self._trusted.discard(folder)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.used_bytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._items
+
+
+# -------------------------------------------------------
+#  Следене на questions/
+# -------------------------------------------------------
+class _ReloadSignals(QObject):
+    done = Signal(str)
+    failed = Signal(str, str)
+
+
+class _ReloadTask(QRunnable):
+    def __init__(self, cache: BankCache, path: str, signals: _ReloadSignals):
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        try:
+            self.cache.load(self.path)
+        except (OSError, ValueError) as e:
+            self.signals.failed.emit(self.path, str(e))
+            return
+        self.signals.done.emit(self.path)
+
+
+class BankWatcher(QObject):
+    """
+    Следи папката с банките и поддържа кеша актуален: сменените банки се
+    махат от кеша и се зареждат наново във фонов режим (bank_reloaded).
+    folder_changed се излъчва при всяка промяна в папката (напр. за
+    selection.json).
+    """
+
+    bank_reloaded = Signal(str)
+    folder_changed = Signal(str)
+
+    def __init__(self, cache: BankCache, folder: str, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.folder = os.path.abspath(folder)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._signals = _ReloadSignals()
+        self._signals.done.connect(self._on_done)
+        self._signals.failed.connect(self._on_failed)
+        self._pending = {}       # път -> брой пуснати презареждания
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(RELOAD_DELAY_MS)
+        self._timer.timeout.connect(self._refresh)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_changed)
+        self.watcher.fileChanged.connect(self._on_changed)
+        self.watching = os.path.isdir(self.folder) and self.watcher.addPath(self.folder)
+        if self.watching:
+            self._watch_files()
+            cache.trust(self.folder)
+
+    def _watch_files(self):
+        # файловете, сменени с преименуване (write_bank), изпадат от
+        # списъка на QFileSystemWatcher – добавяме ги отново
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        watched = set(self.watcher.files())
+        paths = [os.path.join(self.folder, n) for n in names]
+        missing = [p for p in paths if p not in watched and os.path.isfile(p)]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def _on_changed(self, path: str):
+        # до обработката на събитията кешът пак проверява файловете
+        self.cache.trust(self.folder, False)
+        self._timer.start()
+
+    def _refresh(self):
+        self._watch_files()
+        for path in set(self.cache.cached_paths(self.folder)) | set(self._pending):
+            entry = self.cache.peek(path)
+            # текущото презареждане може да е прочело файла преди промяната –
+            # пускаме още едно (нишката е една, последното остава в кеша)
+            if path not in self._pending and (entry is None or bank_stamp(path) == entry.stamp):
+                continue
+            self.cache.invalidate(path)
+            if os.path.exists(path):
+                self._pending[path] = self._pending.get(path, 0) + 1
+                self.pool.start(_ReloadTask(self.cache, path, self._signals))
+        if self.watching:
+            self.cache.trust(self.folder)
+        self.folder_changed.emit(self.folder)
+
+    def preload(self, path: str):
+        """Зарежда банката в кеша във фонов режим (ако вече не се зарежда)."""
+        path = os.path.abspath(path)
+        if path in self._pending or self.cache.peek(path) is not None:
+            return
+        self._pending[path] = 1
+        self.pool.start(_ReloadTask(self.cache, path, self._signals))
+
+    def _finished(self, path: str):
+        left = self._pending.get(path, 1) - 1
+        if left > 0:
+            self._pending[path] = left
+        else:
+            self._pending.pop(path, None)
+        return left == 0
+
+    def _on_done(self, path: str):
+        if self._finished(path):
+            self.bank_reloaded.emit(path)
+
+    def _on_failed(self, path: str, error: str):
+        self._finished(path)
+        print(f"Банката {os.path.basename(path)} не може да се зареди наново: {error}")
+
+    def stop(self):
+        self.watching = False
+        self.cache.trust(self.folder, False)
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+def _budget_from_env() -> int:
+    try:
+        mb = float(os.environ.get("QUIZ_BANK_CACHE_MB", DEFAULT_CACHE_MB))
+    except ValueError:
+        mb = DEFAULT_CACHE_MB
+    return int(mb * 1024 * 1024)
+
+
+# един общ кеш за целия процес (тестовете и редакторът)
+bank_cache = BankCache(_budget_from_env())
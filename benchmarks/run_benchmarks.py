@@ -0,0 +1,503 @@
+"""
+Бенчмаркове за QuizApp и редактора.
+
+Генерира синтетични банки във формата на questions/*.json (10 / 1k / 100k /
+1M въпроса), мери зареждане, избор на въпроси, показване на екраните,
+картинките и операциите в редактора под QT_QPA_PLATFORM=offscreen и
+записва резултатите в JSON файл, за да могат да се сравняват между
+версиите.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 10,1000 --output before.json
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+    python benchmarks/run_benchmarks.py --only stream --sizes 1000000
+
+Бенчмарковете "stream.*" се пускат всеки в отделен процес – така пиковата
+памет (peak_rss_mb) е само за тази операция. Мерят времето до първия
+въпрос (QuizSession.from_bank) без индекс и с индекс, reservoir
+sampling през файла (JSON и JSON Lines) и за сравнение json.load на
+цялата банка.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [10, 1_000, 100_000, 1_000_000]
+DEFAULT_DATA_DIR = os.path.join(BENCH_DIR, ".data")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# версия на генератора – ако се смени, банките в .data се генерират наново
+GENERATOR_VERSION = 1
+SEED = 12345
+
+# картинка "от телефон" – много по-голяма от рамката 800x200
+PHOTO_SIZE = (4000, 3000)
+
+
+# -------------------------------------------------------
+#  Синтетични данни
+# -------------------------------------------------------
+def make_question(rng: random.Random, i: int) -> dict:
+    a, b = rng.randint(10, 999), rng.randint(10, 999)
+    if i % 3 == 2:
+        return {
+            "type": "text",
+            "question": f"Въпрос №{i}: колко е {a} + {b}? Напишете само числото.",
+            "answer": str(a + b),
+        }
+
+    options = [str(a + b), str(a + b + 10), str(a + b - 10), str(a + b + 100)]
+    rng.shuffle(options)
+    q = {
+        "type": "choice",
+        "question": f"Въпрос №{i}: колко е {a} + {b}?",
+        "options": options,
+        "answer": str(a + b),
+    }
+    if i % 10 == 0:
+        q["image"] = "bench_photo.jpg"
+    return q
+
+
+def generate_bank(path: str, size: int):
+    rng = random.Random(SEED + size)
+    questions = [make_question(rng, i) for i in range(size)]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(questions, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def generate_jsonl(json_path: str, path: str):
+    """Същата банка като JSON Lines (по един въпрос на ред)."""
+    from question_bank import iter_questions
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for question in iter_questions(json_path):
+            f.write(json.dumps(question, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def generate_photo(path: str):
+    from PIL import Image
+
+    w, h = PHOTO_SIZE
+    img = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    img.save(path, quality=92)
+
+
+def prepare_data(data_dir: str, sizes: list) -> dict:
+    """
+    Връща {size: папка}, в която има questions/4_math.json с size въпроса
+    и images/bench_photo.jpg. Готовите банки се преизползват.
+    """
+    dirs = {}
+    for size in sizes:
+        folder = os.path.join(data_dir, f"v{GENERATOR_VERSION}_{size}")
+        questions_path = os.path.join(folder, "questions")
+        images_path = os.path.join(folder, "images")
+        bank = os.path.join(questions_path, "4_math.json")
+        photo = os.path.join(images_path, "bench_photo.jpg")
+
+        os.makedirs(questions_path, exist_ok=True)
+        os.makedirs(images_path, exist_ok=True)
+        if not os.path.exists(bank):
+            print(f"  генерирам банка с {size} въпроса...", flush=True)
+            generate_bank(bank, size)
+        if not os.path.exists(photo):
+            generate_photo(photo)
+        # JSON Lines – в отделна папка, иначе bank_path избира .json
+        jsonl = os.path.join(folder, "jsonl", "4_math.jsonl")
+        if not os.path.exists(jsonl):
+            os.makedirs(os.path.dirname(jsonl), exist_ok=True)
+            generate_jsonl(bank, jsonl)
+        dirs[size] = folder
+    return dirs
+
+
+# -------------------------------------------------------
+#  Измерване
+# -------------------------------------------------------
+def measure(fn, *, setup=None, rounds: int = 20, max_time: float = 2.0) -> dict:
+    """
+    Пуска fn поне веднъж и най-много rounds пъти (или докато изтече
+    max_time секунди). setup() се вика преди всяко пускане и не се мери.
+    """
+    times = []
+    started = time.perf_counter()
+    while len(times) < rounds:
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > max_time:
+            break
+
+    return {
+        "rounds": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def peak_rss_mb():
+    # Linux: VmHWM е само за този процес (ru_maxrss се наследява и през exec
+    # от родителя, а той държи генерираните банки)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux връща KB, macOS – байтове
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Runner:
+    def __init__(self, max_time: float, rounds: int):
+        self.max_time = max_time
+        self.rounds = rounds
+        self.results = []
+
+    def run(self, name: str, size, fn, *, setup=None, rounds=None):
+        stats = measure(fn, setup=setup, rounds=rounds or self.rounds, max_time=self.max_time)
+        stats.update({"name": name, "size": size})
+        self.results.append(stats)
+        print(f"  {name:<40} {str(size):>8}  median {stats['median'] * 1000:10.3f} ms"
+              f"  ({stats['rounds']} rounds)", flush=True)
+        return stats
+
+
+# -------------------------------------------------------
+#  Бенчмаркове: QuizApp
+# -------------------------------------------------------
+def silence_dialogs(*modules):
+    # модалните съобщения ще блокират бенчмарка – тук само ги отпечатваме
+    def show(*args, **kwargs):
+        print("    [съобщение]", *args[1:3])
+        return None
+
+    for module in modules:
+        for name in ("information", "warning", "critical"):
+            setattr(module.QMessageBox, name, staticmethod(show))
+
+
+def bench_quiz(runner: Runner, app, folder: str, size: int):
+    import main
+    import question_bank
+    from image_cache import pixmap_cache, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT
+
+    window = main.QuizApp()
+    window.questions_path = os.path.join(folder, "questions")
+    window.images_path = os.path.join(folder, "images")
+    window.grade = "4"
+
+    bank = os.path.join(window.questions_path, "4_math.json")
+    index_path = question_bank.index_path_for(bank)
+
+    def drop_index():
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    def load():
+        window.load_questions("math")
+        app.processEvents()
+
+    runner.run("quiz.load_questions (cold index)", size, load, setup=drop_index, rounds=3)
+    runner.run("quiz.load_questions", size, load)
+
+    def show():
+        window.show_current_question()
+        app.processEvents()
+
+    runner.run("quiz.show_current_question", size, show)
+
+    def navigate():
+        if not window.session.next():
+            window.session.current_index = 0
+        window.show_current_question()
+        app.processEvents()
+
+    window.session.current_index = 0
+    runner.run("quiz.next_question (cycle)", size, navigate, rounds=100)
+
+    def pick_choice():
+        window.session.current_index = -1
+        while window.session.next():
+            if window.session.current_question["type"] == "choice":
+                break
+        window.show_current_question()
+        app.processEvents()
+
+    def mark():
+        window.mark_answer(window.option_buttons[0].text())
+        app.processEvents()
+
+    pick_choice()
+    if window.option_buttons:
+        runner.run("quiz.mark_answer", size, mark, rounds=100)
+
+    # отговаряме на всичко, за да има какво да се преглежда
+    session = window.session
+    session.current_index = -1
+    while session.next():
+        q = session.current_question
+        if q["type"] == "choice":
+            session.answer_choice(q["options"][0])
+        else:
+            session.answer_text(q["answer"])
+
+    def review():
+        window.review_index = (window.review_index + 1) % len(session.review_order)
+        window.show_review_question()
+        app.processEvents()
+
+    window.review_index = 0
+    runner.run("quiz.show_review_question", size, review)
+
+    photo = os.path.join(window.images_path, "bench_photo.jpg")
+    dpr = window.devicePixelRatioF()
+
+    def decode_cold():
+        pixmap_cache.pixmap(photo, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, dpr)
+
+    runner.run("image decode+scale (cold)", size, decode_cold, setup=pixmap_cache.clear, rounds=5)
+
+    pixmap_cache.pixmap(photo, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, dpr)
+    runner.run("quiz.create_image_label (cached)", size,
+               lambda: window.create_image_label("bench_photo.jpg"))
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+# -------------------------------------------------------
+#  Бенчмаркове: редактор
+# -------------------------------------------------------
+def bench_editor(runner: Runner, app, folder: str, size: int):
+    import editor
+
+    window = editor.QuestionEditor()
+    window.questions_path = os.path.join(folder, "questions")
+    window.grade_combo.setCurrentIndex(window.grade_combo.findData("4"))
+    window.cat_combo.setCurrentIndex(window.cat_combo.findData("math"))
+
+    def load():
+        window.load_questions()
+        app.processEvents()
+
+    runner.run("editor.load_questions", size, load, rounds=5)
+
+    def refresh():
+        window.refresh_list()
+        app.processEvents()
+
+    runner.run("editor.refresh_list", size, refresh, rounds=5)
+
+    # записваме в копие, за да не пипаме генерираната банка
+    save_dir = os.path.join(folder, "save_questions")
+    os.makedirs(save_dir, exist_ok=True)
+    window.questions_path = save_dir
+
+    runner.run("editor.save_questions", size, window.save_questions, rounds=5)
+
+    shutil.rmtree(save_dir, ignore_errors=True)
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+# -------------------------------------------------------
+#  Бенчмаркове: огромни банки (отделен процес за всеки)
+# -------------------------------------------------------
+STREAM_PROBES = [
+    ("stream.load_bank (json.load)", "load_bank", "json"),
+    ("stream.first_question (no index)", "first_cold", "json"),
+    ("stream.first_question (indexed)", "first_warm", "json"),
+    ("stream.sample_stream (reservoir)", "reservoir", "json"),
+    ("stream.sample_stream (jsonl)", "reservoir", "jsonl"),
+    ("stream.stream_select (quotas)", "stratified", "json"),
+]
+
+
+def probe(kind: str, path: str) -> dict:
+    """Една операция в този процес; връща секундите и пиковата памет."""
+    import question_bank
+    import selection
+    from quiz_session import QuizSession
+
+    rng = random.Random(SEED)
+    index_path = question_bank.index_path_for(path)
+    if kind == "first_cold" and os.path.exists(index_path):
+        os.remove(index_path)
+    if kind == "first_warm":
+        question_bank.BankIndex.open(path).close()
+    rss_before = peak_rss_mb()
+
+    t0 = time.perf_counter()
+    if kind == "load_bank":
+        count = len(question_bank.load_bank(path))
+    elif kind in ("first_cold", "first_warm"):
+        count = QuizSession.from_bank(path, rng=rng).total_questions
+    elif kind == "reservoir":
+        count = len(question_bank.sample_stream(path, 10, rng))
+    elif kind == "stratified":
+        spec = selection.SelectionSpec(10, {"type:text": 4, "type:choice": 4})
+        count = len(selection.stream_select(path, spec, rng))
+    else:
+        raise ValueError(kind)
+    seconds = time.perf_counter() - t0
+
+    return {"seconds": seconds, "count": count, "rss_before_mb": rss_before, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_stream(runner: Runner, folder: str, size: int):
+    paths = {
+        "json": os.path.join(folder, "questions", "4_math.json"),
+        "jsonl": os.path.join(folder, "jsonl", "4_math.jsonl"),
+    }
+    for name, kind, fmt in STREAM_PROBES:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--probe", kind, paths[fmt]],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(f"  {name:<40} {str(size):>8}  грешка:\n{out.stderr}", flush=True)
+            continue
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        seconds = result["seconds"]
+        stats = {
+            "rounds": 1, "min": seconds, "median": seconds, "mean": seconds, "stdev": 0.0,
+            "name": name, "size": size,
+            "file_mb": os.path.getsize(paths[fmt]) / (1024 * 1024),
+            "rss_before_mb": result["rss_before_mb"],
+            "peak_rss_mb": result["peak_rss_mb"],
+        }
+        runner.results.append(stats)
+        print(f"  {name:<40} {str(size):>8}  {seconds * 1000:10.1f} ms"
+              f"  peak {stats['peak_rss_mb']:7.1f} MB (файл {stats['file_mb']:.0f} MB)", flush=True)
+
+
+# -------------------------------------------------------
+#  Резултати
+# -------------------------------------------------------
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding="utf-8") as f:
+        before = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)["results"]
+
+    print(f"{'бенчмарк':<40} {'размер':>8} {'преди ms':>12} {'след ms':>12} {'x':>7}")
+    for r in after:
+        old = before.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        ratio = old["median"] / r["median"] if r["median"] else float("inf")
+        print(f"{r['name']:<40} {str(r['size']):>8} {old['median'] * 1000:12.3f}"
+              f" {r['median'] * 1000:12.3f} {ratio:7.2f}")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмаркове за QuizApp и редактора")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="размери на банките, разделени със запетая")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                        help="къде да се пазят генерираните банки")
+    parser.add_argument("--output", default=None,
+                        help="JSON файл за резултатите (по подразбиране benchmarks/results/<commit>.json)")
+    parser.add_argument("--max-time", type=float, default=2.0,
+                        help="горна граница в секунди за един бенчмарк")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--only", choices=["quiz", "editor", "stream"], default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="само сравнява два файла с резултати")
+    parser.add_argument("--probe", nargs=2, metavar=("KIND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if args.probe:
+        print(json.dumps(probe(*args.probe)))
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print("Подготовка на данните...", flush=True)
+    dirs = prepare_data(args.data_dir, sizes)
+
+    from PySide6.QtWidgets import QApplication
+    import PySide6
+
+    app = QApplication.instance() or QApplication([])
+
+    import main
+    import editor
+    silence_dialogs(main, editor)
+
+    runner = Runner(args.max_time, args.rounds)
+    for size in sizes:
+        print(f"Банка с {size} въпроса", flush=True)
+        if args.only in (None, "quiz"):
+            bench_quiz(runner, app, dirs[size], size)
+        if args.only in (None, "editor"):
+            bench_editor(runner, app, dirs[size], size)
+        if args.only in (None, "stream"):
+            bench_stream(runner, dirs[size], size)
+
+    commit = git_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pyside6": PySide6.__version__,
+        "platform": platform.platform(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": runner.results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Резултатите са записани в {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,242 @@
+import os
+import re
+
+import numpy as np
+
+from question_bank import load_bank
+from search_index import tokenize
+
+
+# Търсене на (почти) еднакви въпроси във всички банки
+# ----------------------------------------------------
+# Всеки въпрос се свежда до нормализиран текст (малки букви, без ударения и
+# пунктуация; вариантите са сортирани, за да не зависи от реда им) и се
+# разбива на препокриващи се парчета от SHINGLE_SIZE символа. MinHash дава
+# кратък подпис, чиято обща част между два въпроса е оценка на Jaccard
+# сходството им, а LSH (ленти от подписа) групира кандидатите без да
+# сравнява всеки с всеки – времето расте почти линейно с броя въпроси.
+#
+# Въпросите с различни картинки не са дубликати, дори текстът и вариантите
+# да съвпадат (напр. въпроси само с картинка) – картинката е част от
+# ключа на лентите, затова такива въпроси изобщо не стават кандидати.
+
+# {клас}_{предмет}.json, напр. 4_math.json
+BANK_FILE_RE = re.compile(r"^\d+_[a-z]+\.jsonl?$")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64          # дължина на подписа
+BANDS = 16             # LSH ленти по NUM_PERM // BANDS стойности
+DEFAULT_THRESHOLD = 0.8
+
+_SEED = 20240611       # фиксиран – едни и същи резултати при всяко пускане
+
+
+def bank_files(questions_dir: str) -> list:
+    return sorted(
+        name for name in os.listdir(questions_dir)
+        if BANK_FILE_RE.match(name)
+    )
+
+
+def load_banks(questions_dir: str) -> dict:
+    """{име на файла: списък с въпроси} за всички банки в папката."""
+    banks = {}
+    for name in bank_files(questions_dir):
+        try:
+            banks[name] = load_bank(os.path.join(questions_dir, name))
+        except (OSError, ValueError) as e:
+            print(f"{name}: пропуснат – {e}")
+    return banks
+
+
+def image_name(question: dict) -> str:
+    return str(question.get("image") or "").strip().lower()
+
+
+def normalized_text(question: dict) -> str:
+    """Текстът на въпроса, картинката и вариантите, нормализирани за сравнение."""
+    text = " ".join(tokenize(str(question.get("question") or "")))
+    image = image_name(question)
+    if image:
+        text += " [" + image + "]"
+    options = question.get("options")
+    if options:
+        # сортирани – редът на вариантите не е разлика
+        text += " | " + " ".join(sorted(" ".join(tokenize(str(o))) for o in options))
+    return text
+
+
+# -------------------------------------------------------
+#  Shingles и MinHash (векторно, без цикъл по въпроси)
+# -------------------------------------------------------
+def _shingle_hashes(texts: list):
+    """
+    Хешове на всички shingles на всички текстове в един масив + началото на
+    парчетата за всеки текст (за np.minimum.reduceat).
+    """
+    k = SHINGLE_SIZE
+    # по-кратките текстове се допълват, за да имат поне един shingle
+    texts = [t.ljust(k) for t in texts]
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    # полиномиален хеш на всеки прозорец от k символа (uint64 препълва – така и трябва)
+    base = np.uint64(1099511628211)
+    h = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+    for j in range(k):
+        h = h * base + codes[j:len(codes) - k + 1 + j]
+
+    # оставяме само прозорците изцяло в един текст
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    counts = lengths - k + 1
+    marks = np.zeros(len(h) + 1, dtype=np.int64)
+    np.add.at(marks, starts, 1)
+    np.add.at(marks, starts + counts, -1)
+    keep = np.cumsum(marks[:-1]) > 0
+
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return h[keep], offsets
+
+
+def minhash_signatures(texts: list, num_perm: int = NUM_PERM) -> np.ndarray:
+    """Матрица (брой текстове x num_perm) с MinHash подписите."""
+    if not texts:
+        return np.zeros((0, num_perm), dtype=np.uint32)
+
+    shingles, offsets = _shingle_hashes(texts)
+    # горните 32 бита на полиномиалния хеш – по-добре разбъркани от долните
+    shingles = (shingles >> np.uint64(32)).astype(np.uint32)
+
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(0, 2**32, size=num_perm, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+    b = rng.randint(0, 2**32, size=num_perm, dtype=np.uint64).astype(np.uint32)
+
+    sig = np.empty((len(texts), num_perm), dtype=np.uint32)
+    values = np.empty_like(shingles)
+    for i in range(num_perm):
+        # a*x + b (mod 2^32) с нечетно a е пермутация на 32-битовите числа
+        np.multiply(shingles, a[i], out=values)
+        np.add(values, b[i], out=values)
+        sig[:, i] = np.minimum.reduceat(values, offsets)
+    return sig
+
+
+# -------------------------------------------------------
+#  LSH и групиране
+# -------------------------------------------------------
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            # по-малкият номер остава корен – първият въпрос е представител
+            if ry < rx:
+                rx, ry = ry, rx
+            self.parent[ry] = rx
+
+
+def _band_keys(sig: np.ndarray, start: int, rows: int) -> np.ndarray:
+    """Една uint64 стойност за всяка лента (хеш на rows-те стойности в нея)."""
+    keys = np.zeros(sig.shape[0], dtype=np.uint64)
+    for j in range(start, start + rows):
+        keys = keys * np.uint64(0x9E3779B97F4A7C15) + sig[:, j]
+    return keys
+
+
+def _lsh_clusters(sig: np.ndarray, threshold: float, bands: int, groups: np.ndarray = None) -> list:
+    """groups – само въпросите с еднакъв номер на група могат да са дубликати."""
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    uf = _UnionFind(n)
+
+    for band in range(bands):
+        keys = _band_keys(sig, band * rows, rows)
+        if groups is not None:
+            keys = keys * np.uint64(0x9E3779B97F4A7C15) + groups
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        # начало на всяка кофа (поредица от еднакви ключове) в order
+        is_first = np.ones(n, dtype=bool)
+        is_first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        first_pos = np.maximum.accumulate(np.where(is_first, np.arange(n), 0))
+
+        # всеки член на кофа се сравнява само с първия в нея – линейно
+        members = order[~is_first]
+        reps = order[first_pos[~is_first]]
+        if len(members) == 0:
+            continue
+        sims = (sig[members] == sig[reps]).mean(axis=1)
+        similar = sims >= threshold
+        if groups is not None:
+            # еднакъв ключ от различни групи – рядко съвпадение на хешовете
+            similar &= groups[members] == groups[reps]
+        for rep, m in zip(reps[similar].tolist(), members[similar].tolist()):
+            uf.union(rep, m)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(uf.find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def find_duplicates(banks: dict, threshold: float = DEFAULT_THRESHOLD,
+                    num_perm: int = NUM_PERM, bands: int = BANDS) -> list:
+    """
+    Групи от почти еднакви въпроси във всички банки. Всяка група е списък
+    от {"bank", "index", "question", "similarity"}; първият елемент е
+    представителят, а similarity е оценката (MinHash) за сходство с него.
+    Групите са подредени по размер (най-големите първи).
+    """
+    refs = []
+    texts = []
+    images = {}
+    groups = []
+    for name, questions in banks.items():
+        for i, q in enumerate(questions):
+            refs.append((name, i, q))
+            texts.append(normalized_text(q))
+            groups.append(images.setdefault(image_name(q), len(images)))
+
+    sig = minhash_signatures(texts, num_perm)
+    clusters = []
+    for members in _lsh_clusters(sig, threshold, bands, np.array(groups, dtype=np.uint64)):
+        rep = members[0]
+        sims = (sig[members] == sig[rep]).mean(axis=1)
+        clusters.append([
+            {
+                "bank": refs[m][0],
+                "index": refs[m][1],
+                "question": refs[m][2].get("question", ""),
+                "similarity": round(float(s), 3),
+            }
+            for m, s in zip(members, sims)
+        ])
+
+    clusters.sort(key=lambda c: (-len(c), c[0]["bank"], c[0]["index"]))
+    return clusters
+
+
+def format_report(clusters: list) -> str:
+    if not clusters:
+        return "Няма намерени дубликати."
+
+    lines = [f"Групи с дубликати: {len(clusters)}"]
+    for n, cluster in enumerate(clusters, 1):
+        lines.append("")
+        lines.append(f"Група {n} ({len(cluster)} въпроса):")
+        for item in cluster:
+            text = item["question"].strip().replace("\n", " ")
+            if len(text) > 70:
+                text = text[:67] + "..."
+            lines.append(f"  {item['similarity']:.2f}  {item['bank']} №{item['index'] + 1}: {text}")
+    return "\n".join(lines)
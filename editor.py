@@ -1,6 +1,6 @@
 import sys
 import os
-import json
+from bisect import bisect_left
 
 from PySide6.QtWidgets import (
     QApplication,
@@ -9,19 +9,45 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QFormLayout,
-    QListWidget,
-    QListWidgetItem,
+    QListView,
     QPushButton,
     QLabel,
     QLineEdit,
     QComboBox,
+    QCheckBox,
     QPlainTextEdit,
     QMessageBox,
     QDialog,
     QDialogButtonBox,
+    QFileDialog,
+    QProgressDialog,
+    QTreeWidget,
+    QTreeWidgetItem,
 )
 from PySide6.QtGui import QFont
-from PySide6.QtCore import Qt
+from PySide6.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    Signal,
+)
+
+from search_index import SearchIndex, question_tokens
+from question_import import import_questions
+from question_bank import (
+    load_bank,
+    write_bank,
+    append_journal,
+    journal_base,
+    BankChangedError,
+    read_journal,
+    is_compact_file,
+    validate_question,
+    COMPACT_AFTER_OPS,
+)
 
 
 GRADE_DISPLAY = {
@@ -77,6 +103,111 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "Грешка", "Невалидни потребител или парола.")
 
 
+class QuestionListModel(QAbstractListModel):
+    """
+    Модел над списъка с въпроси (същият list обект като editor.questions).
+    Текстът за реда се смята чак когато изгледът го поиска – т.е. само за
+    видимите редове, дори банката да е с 100 000 въпроса.
+
+    С set_filter се показват само част от въпросите; тогава редът в изгледа
+    и индексът в списъка (source row) се различават.
+    """
+
+    PREVIEW_LEN = 80
+
+    def __init__(self, questions=None, parent=None):
+        super().__init__(parent)
+        self.questions = questions if questions is not None else []
+        self.rows = None          # видимите индекси (възходящо) или None = всички
+
+    def set_questions(self, questions: list):
+        self.beginResetModel()
+        self.questions = questions
+        self.rows = None
+        self.endResetModel()
+
+    def set_filter(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def source_row(self, row: int) -> int:
+        return row if self.rows is None else self.rows[row]
+
+    def view_row(self, source_row: int) -> int:
+        """Редът в изгледа за даден въпрос или -1, ако е скрит от филтъра."""
+        if self.rows is None:
+            return source_row
+        i = bisect_left(self.rows, source_row)
+        if i < len(self.rows) and self.rows[i] == source_row:
+            return i
+        return -1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self.rows is not None:
+            return len(self.rows)
+        return len(self.questions)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = self.source_row(index.row())
+        text = self.questions[row].get("question", "").strip().replace("\n", " ")
+        if len(text) > self.PREVIEW_LEN:
+            text = text[:self.PREVIEW_LEN - 3] + "..."
+        return f"{row+1}. {text}"
+
+    # -------------------------------------------------------
+    #  Промени по един ред (row = индекс в списъка)
+    # -------------------------------------------------------
+    # При активен филтър моделът само се презарежда – кои редове съвпадат
+    # решава редакторът (търсенето) след промяната.
+    def append_question(self, data: dict):
+        if self.rows is not None:
+            self.questions.append(data)
+            return
+        row = len(self.questions)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.questions.append(data)
+        self.endInsertRows()
+
+    def append_questions(self, items: list):
+        """Много въпроса наведнъж – един сигнал за всички нови редове."""
+        if not items:
+            return
+        if self.rows is not None:
+            self.questions.extend(items)
+            return
+        first = len(self.questions)
+        self.beginInsertRows(QModelIndex(), first, first + len(items) - 1)
+        self.questions.extend(items)
+        self.endInsertRows()
+
+    def replace_question(self, row: int, data: dict):
+        self.questions[row] = data
+        view_row = self.view_row(row)
+        if view_row >= 0:
+            idx = self.index(view_row)
+            self.dataChanged.emit(idx, idx, [Qt.DisplayRole])
+
+    def remove_question(self, row: int):
+        if self.rows is not None:
+            self.beginResetModel()
+            del self.questions[row]
+            self.rows = [r if r < row else r - 1 for r in self.rows if r != row]
+            self.endResetModel()
+            return
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.questions[row]
+        self.endRemoveRows()
+        # номерата на следващите редове са се сменили
+        if row < len(self.questions):
+            self.dataChanged.emit(self.index(row), self.index(len(self.questions) - 1), [Qt.DisplayRole])
+
+
 class QuestionDialog(QDialog):
     """
     Диалог за добавяне/редакция на един въпрос.
@@ -85,7 +216,9 @@ class QuestionDialog(QDialog):
       - question
       - answer
       - options (ако е choice)
+      - accepted (други верни отговори, ако е text)
       - image (по желание)
+      - tags (теми, по желание; виж selection.py)
     """
 
     def __init__(self, parent=None, question_data=None):
@@ -121,6 +254,14 @@ class QuestionDialog(QDialog):
         self.answer_edit.setFont(QFont("Helvetica", 12))
         form.addRow("Верен отговор:", self.answer_edit)
 
+        # Други верни отговори (ако е text)
+        self.accepted_edit = QLineEdit()
+        self.accepted_edit.setPlaceholderText("по избор, разделени с |  (напр. Ботев | Христо Ботев)")
+        self.accepted_edit.setMinimumHeight(20)
+        self.accepted_edit.setFont(QFont("Helvetica", 12))
+        self.accepted_label = QLabel("Други верни:")
+        form.addRow(self.accepted_label, self.accepted_edit)
+
         # Опции (ако е choice) 
         self.option_edits = []
         for i in range(4):
@@ -138,6 +279,13 @@ class QuestionDialog(QDialog):
         self.image_edit.setFont(QFont("Helvetica", 11))
         form.addRow("Картинка:", self.image_edit)
 
+        # Теми (по избор) – за квотите в selection.json
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("по избор, разделени със запетая (напр. дроби, геометрия)")
+        self.tags_edit.setMinimumHeight(20)
+        self.tags_edit.setFont(QFont("Helvetica", 11))
+        form.addRow("Теми:", self.tags_edit)
+
         # бутони OK / Cancel
         buttons = QDialogButtonBox(
             QDialogButtonBox.Ok | QDialogButtonBox.Cancel, Qt.Horizontal, self
@@ -159,8 +307,11 @@ class QuestionDialog(QDialog):
                 opts = question_data.get("options", [])
                 for i in range(min(4, len(opts))):
                     self.option_edits[i].setText(opts[i])
+            else:
+                self.accepted_edit.setText(" | ".join(question_data.get("accepted", [])))
 
             self.image_edit.setText(question_data.get("image", ""))
+            self.tags_edit.setText(", ".join(question_data.get("tags", [])))
 
         # показваме/скриваме полетата за опции според type
         self.type_combo.currentIndexChanged.connect(self._update_type_visibility)
@@ -172,6 +323,8 @@ class QuestionDialog(QDialog):
         for le in self.option_edits:
             le.setEnabled(is_choice)
             le.setVisible(is_choice)
+        self.accepted_edit.setVisible(not is_choice)
+        self.accepted_label.setVisible(not is_choice)
 
     def _on_accept(self):
         data = self.get_data()
@@ -187,45 +340,165 @@ class QuestionDialog(QDialog):
             "question": "...",
             "answer": "...",
             "options": [...],   # само за choice
-            "image": "..."      # ако е попълнено
+            "accepted": [...],  # само за text, ако има
+            "image": "...",     # ако е попълнено
+            "tags": [...],      # ако има
+            "weight": ...       # запазва се от стария въпрос, ако го има
         }
         """
-        qtype = self.type_combo.currentData()
-        question = self.question_edit.toPlainText()
-        answer = self.answer_edit.text().strip()
-        image = self.image_edit.text().strip()
-
-        if not question:
-            QMessageBox.warning(self, "Грешка", "Моля въведете въпрос.")
-            return None
-        if not answer:
-            QMessageBox.warning(self, "Грешка", "Моля въведете верния отговор.")
+        data, error = validate_question({
+            "type": self.type_combo.currentData(),
+            "question": self.question_edit.toPlainText(),
+            "answer": self.answer_edit.text(),
+            "options": [le.text() for le in self.option_edits],
+            "accepted": self.accepted_edit.text(),
+            "image": self.image_edit.text(),
+            "tags": self.tags_edit.text(),
+            "weight": self.question_data.get("weight"),
+        })
+        if error:
+            QMessageBox.warning(self, "Грешка", error)
             return None
+        return data
 
-        data = {
-            "type": qtype,
-            "question": question,
-            "answer": answer,
-        }
 
-        if qtype == "choice":
-            options = [le.text().strip() for le in self.option_edits if le.text().strip()]
-            if len(options) < 2:
-                QMessageBox.warning(self, "Грешка", "Моля въведете поне 2 възможни отговора.")
-                return None
-            if answer not in options:
-                QMessageBox.warning(
-                    self,
-                    "Грешка",
-                    "Верният отговор трябва да съвпада с един от вариантите."
-                )
-                return None
-            data["options"] = options
-
-        if image:
-            data["image"] = image
+class _ImportSignals(QObject):
+    progress = Signal(int, int)               # прочетени байтове, общо
+    # object, а не list – иначе Qt превръща dict-овете в QVariantMap
+    finished = Signal(object, object, object)  # въпроси, думи за търсене, грешки
+    failed = Signal(str)
 
-        return data
+
+class ImportTask(QRunnable):
+    """Чете и проверява файла за импорт в работна нишка."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.signals = _ImportSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            questions, errors = import_questions(
+                self.path,
+                progress=self.signals.progress.emit,
+                cancelled=lambda: self.cancelled,
+            )
+            # думите за търсене също се смятат тук, а не в GUI нишката
+            tokens = [question_tokens(q) for q in questions]
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(questions, tokens, errors)
+
+
+class _DedupeSignals(QObject):
+    finished = Signal(object)     # групи от dedupe.find_duplicates
+    failed = Signal(str)
+
+
+class DedupeTask(QRunnable):
+    """
+    Търси дубликати във всички банки в работна нишка. Текущата банка се
+    подава от паметта (с незаписаните промени), останалите се четат от диска.
+    """
+
+    def __init__(self, questions_path: str, current_name: str, current_questions: list):
+        super().__init__()
+        self.questions_path = questions_path
+        self.current_name = current_name
+        self.current_questions = list(current_questions)
+        self.signals = _DedupeSignals()
+
+    def run(self):
+        try:
+            # numpy се зарежда чак тук – редакторът стартира без него
+            from dedupe import load_banks, find_duplicates
+
+            banks = load_banks(self.questions_path) if os.path.isdir(self.questions_path) else {}
+            if self.current_name:
+                banks[self.current_name] = self.current_questions
+            clusters = find_duplicates(banks)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(clusters)
+
+
+class _RenditionsSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)     # резултатът от renditions.build_renditions
+    failed = Signal(str)
+
+
+class RenditionsTask(QRunnable):
+    """Подготвя готовите версии на картинките в работна нишка."""
+
+    def __init__(self, images_path: str):
+        super().__init__()
+        self.images_path = images_path
+        self.signals = _RenditionsSignals()
+
+    def run(self):
+        try:
+            from renditions import build_renditions
+
+            result = build_renditions(self.images_path, progress=self.signals.progress.emit)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(result)
+
+
+class DuplicatesDialog(QDialog):
+    """Групите дубликати; двоен клик отваря въпроса, ако е в текущата банка."""
+
+    def __init__(self, clusters: list, editor, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Дубликати")
+        self.resize(800, 500)
+        self.editor = editor
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Групи с почти еднакви въпроси: {len(clusters)}"))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Сходство", "Файл", "№", "Въпрос"])
+        for n, cluster in enumerate(clusters, 1):
+            group = QTreeWidgetItem([f"Група {n}", "", str(len(cluster)), ""])
+            for item in cluster:
+                text = item["question"].strip().replace("\n", " ")
+                child = QTreeWidgetItem([
+                    f"{item['similarity']:.2f}", item["bank"], str(item["index"] + 1), text,
+                ])
+                child.setData(0, Qt.UserRole, (item["bank"], item["index"]))
+                group.addChild(child)
+            self.tree.addTopLevelItem(group)
+        self.tree.expandAll()
+        for col in range(3):
+            self.tree.resizeColumnToContents(col)
+        self.tree.itemDoubleClicked.connect(self._on_double_click)
+        layout.addWidget(self.tree, 1)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close, Qt.Horizontal, self)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _on_double_click(self, item, column):
+        ref = item.data(0, Qt.UserRole)
+        if not ref:
+            return
+        bank, index = ref
+        if bank != self.editor.current_bank_name():
+            QMessageBox.information(self, "Дубликати", f"Въпросът е в {bank} – заредете тази банка.")
+            return
+        self.editor.search_edit.clear()
+        self.editor.select_row(index)
+        self.editor.list_view.scrollTo(self.editor.list_view.currentIndex())
 
 
 class QuestionEditor(QMainWindow):
@@ -237,11 +510,27 @@ class QuestionEditor(QMainWindow):
 
         base_path = os.path.dirname(os.path.abspath(__file__))
         self.questions_path = os.path.join(base_path, "questions")
+        self.images_path = os.path.join(base_path, "images")
 
         self.current_grade = None
         self.current_category = None
         self.questions = []
 
+        # файлът, от който са заредени self.questions, и промените по тях,
+        # които още не са записани (виж question_bank – журнал на промените)
+        self.loaded_filename = None
+        self.pending_ops = []
+        self.journal_ops = 0
+        self.written_compact = None
+        # journal_base() на заредената версия – None, докато няма файл
+        self.loaded_base = None
+        self.import_task = None
+        self.dedupe_task = None
+        self.renditions_task = None
+
+        # обърнат индекс за полето за търсене; поддържа се заедно с questions
+        self.search_index = SearchIndex()
+
         central = QWidget()
         self.setCentralWidget(central)
         main_layout = QVBoxLayout(central)
@@ -270,11 +559,23 @@ class QuestionEditor(QMainWindow):
 
         main_layout.addLayout(top_row)
 
-        # списък с въпроси
-        self.list_widget = QListWidget()
-        font = QFont("Helvetica", 11)
-        self.list_widget.setFont(font)
-        main_layout.addWidget(self.list_widget, 1)
+        # търсене по текст, отговор, варианти, тип и картинка
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Търсене...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.apply_search)
+        main_layout.addWidget(self.search_edit)
+
+        # списък с въпроси (model/view – редовете не са отделни обекти)
+        self.list_model = QuestionListModel(self.questions, self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.list_model)
+        self.list_view.setUniformItemSizes(True)
+        # подреждането на редовете е на порции, за да не блокира прозореца
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setBatchSize(2000)
+        self.list_view.setFont(QFont("Helvetica", 11))
+        main_layout.addWidget(self.list_view, 1)
 
         # ред с бутони за CRUD
         btn_row = QHBoxLayout()
@@ -283,17 +584,30 @@ class QuestionEditor(QMainWindow):
         add_btn = QPushButton("Добави")
         edit_btn = QPushButton("Редактирай")
         delete_btn = QPushButton("Изтрий")
+        import_btn = QPushButton("Импорт...")
+        dedupe_btn = QPushButton("Дубликати...")
+        renditions_btn = QPushButton("Картинки...")
         save_btn = QPushButton("Запази")
 
         add_btn.clicked.connect(self.add_question)
         edit_btn.clicked.connect(self.edit_question)
         delete_btn.clicked.connect(self.delete_question)
+        import_btn.clicked.connect(self.import_file)
+        dedupe_btn.clicked.connect(self.find_duplicates)
+        renditions_btn.clicked.connect(self.build_renditions)
         save_btn.clicked.connect(self.save_questions)
 
         btn_row.addWidget(add_btn)
         btn_row.addWidget(edit_btn)
         btn_row.addWidget(delete_btn)
+        btn_row.addWidget(import_btn)
+        btn_row.addWidget(dedupe_btn)
+        btn_row.addWidget(renditions_btn)
         btn_row.addStretch()
+
+        # без отстъпи – файлът е няколко пъти по-малък и се записва по-бързо
+        self.compact_check = QCheckBox("Компактен файл")
+        btn_row.addWidget(self.compact_check)
         btn_row.addWidget(save_btn)
 
         main_layout.addLayout(btn_row)
@@ -317,6 +631,12 @@ class QuestionEditor(QMainWindow):
         self.current_grade = self.grade_combo.currentData()
         self.current_category = self.cat_combo.currentData()
 
+        self.loaded_filename = filename
+        self.pending_ops = []
+        self.journal_ops = 0
+        self.written_compact = None
+        self.loaded_base = None
+
         if not os.path.exists(filename):
             # ако файлът не съществува – започваме с празен списък
             self.questions = []
@@ -324,17 +644,24 @@ class QuestionEditor(QMainWindow):
             return
 
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                self.questions = json.load(f)
+            before = os.stat(filename)
+            self.questions = load_bank(filename)
+            # load_bank помни отпечатъка на прочетеното – тук файлът не се
+            # чете пак; ако се е сменил по време на четенето, не знаем към
+            # коя версия са индексите на журнала
+            self.loaded_base = journal_base(filename)
+            if self.loaded_base["base"] != [before.st_size, before.st_mtime_ns]:
+                raise OSError("файлът се промени по време на четенето – заредете го отново")
+            self.journal_ops = len(read_journal(filename))
+            self.written_compact = is_compact_file(filename)
         except Exception as e:
             QMessageBox.critical(self, "Грешка", f"Не мога да прочета файла:\n{e}")
-            return
-
-        if not isinstance(self.questions, list):
-            QMessageBox.critical(self, "Грешка", "Файлът няма валиден формат (очаквам списък).")
             self.questions = []
+            self.loaded_filename = None
+            self.refresh_list()
             return
 
+        self.compact_check.setChecked(self.written_compact)
         self.refresh_list()
 
     def save_questions(self):
@@ -343,39 +670,91 @@ class QuestionEditor(QMainWindow):
             QMessageBox.warning(self, "Грешка", "Моля изберете клас и предмет.")
             return
 
-        os.makedirs(self.questions_path, exist_ok=True)
+        compact = self.compact_check.isChecked()
+
+        # малките промени само се добавят в журнала; целият файл се
+        # презаписва при нов файл, смяна на формата или когато журналът
+        # стане твърде дълъг
+        use_journal = (
+            self.pending_ops
+            and filename == self.loaded_filename
+            and self.loaded_base is not None
+            and compact == self.written_compact
+            and self.journal_ops + len(self.pending_ops) <= COMPACT_AFTER_OPS
+        )
 
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(self.questions, f, ensure_ascii=False, indent=4)
+            if use_journal:
+                try:
+                    append_journal(filename, self.pending_ops, self.loaded_base)
+                    self.journal_ops += len(self.pending_ops)
+                except BankChangedError:
+                    answer = QMessageBox.question(
+                        self, "Файлът е променен",
+                        "Файлът е променен извън редактора след зареждането.\n"
+                        "Да го презапиша ли с въпросите от редактора?",
+                        QMessageBox.Yes | QMessageBox.No
+                    )
+                    if answer != QMessageBox.Yes:
+                        return
+                    use_journal = False
+            if not use_journal:
+                write_bank(filename, self.questions, compact)
+                self.journal_ops = 0
+                self.written_compact = compact
+                self.loaded_base = journal_base(filename)
         except Exception as e:
             QMessageBox.critical(self, "Грешка", f"Не мога да запиша файла:\n{e}")
             return
 
+        self.loaded_filename = filename
+        self.pending_ops = []
+
         QMessageBox.information(self, "Готово", "Въпросите са записани успешно.")
 
     # -------------------------------------------------------
     #  Работа със списъка
     # -------------------------------------------------------
     def refresh_list(self):
-        self.list_widget.clear()
-        for i, q in enumerate(self.questions):
-            text = q.get("question", "").strip().replace("\n", " ")
-            if len(text) > 80:
-                text = text[:77] + "..."
-            item = QListWidgetItem(f"{i+1}. {text}")
-            self.list_widget.addItem(item)
+        # пълно презареждане – само при нов файл; промените са по редове
+        self.search_index = SearchIndex(self.questions)
+        self.list_model.set_questions(self.questions)
+        self.apply_search()
+
+    def apply_search(self):
+        rows = self.search_index.search(self.search_edit.text())
+        if rows is None and self.list_model.rows is None:
+            return
+        current = self.current_row()
+        self.list_model.set_filter(rows)
+        self.select_row(current)
+
+    def current_row(self) -> int:
+        """Индексът в self.questions на избрания въпрос или -1."""
+        index = self.list_view.currentIndex()
+        return self.list_model.source_row(index.row()) if index.isValid() else -1
+
+    def select_row(self, source_row: int):
+        if source_row < 0:
+            return
+        view_row = self.list_model.view_row(source_row)
+        if view_row >= 0:
+            self.list_view.setCurrentIndex(self.list_model.index(view_row))
 
     def add_question(self):
         dlg = QuestionDialog(self)
         if dlg.exec() == QDialog.Accepted:
             data = dlg.get_data()
             if data:
-                self.questions.append(data)
-                self.refresh_list()
+                self.list_model.append_question(data)
+                self.search_index.add(data)
+                self.pending_ops.append({"op": "add", "question": data})
+                if self.list_model.rows is not None:
+                    self.apply_search()
+                self.select_row(len(self.questions) - 1)
 
     def edit_question(self):
-        row = self.list_widget.currentRow()
+        row = self.current_row()
         if row < 0 or row >= len(self.questions):
             QMessageBox.warning(self, "Грешка", "Моля изберете въпрос за редакция.")
             return
@@ -385,11 +764,14 @@ class QuestionEditor(QMainWindow):
         if dlg.exec() == QDialog.Accepted:
             data = dlg.get_data()
             if data:
-                self.questions[row] = data
-                self.refresh_list()
+                self.list_model.replace_question(row, data)
+                self.search_index.replace(row, data)
+                self.pending_ops.append({"op": "set", "index": row, "question": data})
+                if self.list_model.rows is not None:
+                    self.apply_search()
 
     def delete_question(self):
-        row = self.list_widget.currentRow()
+        row = self.current_row()
         if row < 0 or row >= len(self.questions):
             QMessageBox.warning(self, "Грешка", "Моля изберете въпрос за изтриване.")
             return
@@ -401,8 +783,155 @@ class QuestionEditor(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            del self.questions[row]
-            self.refresh_list()
+            self.list_model.remove_question(row)
+            self.search_index.remove(row)
+            self.pending_ops.append({"op": "del", "index": row})
+
+
+    # -------------------------------------------------------
+    #  Масов импорт (CSV / JSON Lines)
+    # -------------------------------------------------------
+    def import_file(self):
+        if self.import_task is not None:
+            return
+
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Импорт на въпроси",
+            "",
+            "Таблици и JSON Lines (*.csv *.txt *.jsonl *.ndjson);;Всички файлове (*)",
+        )
+        if not path:
+            return
+        self.start_import(path)
+
+    def start_import(self, path: str):
+        task = ImportTask(path)
+        self.import_task = task
+
+        self.import_progress = QProgressDialog("Импорт на въпроси...", "Отказ", 0, 1000, self)
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.setMinimumDuration(300)
+        self.import_progress.setValue(0)
+        self.import_progress.canceled.connect(task.cancel)
+
+        task.signals.progress.connect(self._on_import_progress)
+        task.signals.finished.connect(self._on_import_finished)
+        task.signals.failed.connect(self._on_import_failed)
+        QThreadPool.globalInstance().start(task)
+
+    def _on_import_progress(self, done: int, total: int):
+        if total > 0:
+            self.import_progress.setValue(min(999, done * 1000 // total))
+
+    def _finish_import(self):
+        task = self.import_task
+        self.import_task = None
+        self.import_progress.reset()
+        return task
+
+    def _on_import_failed(self, error: str):
+        self._finish_import()
+        QMessageBox.critical(self, "Грешка", f"Не мога да прочета файла:\n{error}")
+
+    def _on_import_finished(self, questions: list, tokens: list, errors: list):
+        task = self._finish_import()
+        if task.cancelled:
+            return
+
+        # всички нови въпроси влизат наведнъж – един сигнал към изгледа
+        self.list_model.append_questions(questions)
+        self.search_index.extend(questions, tokens)
+        self.pending_ops.extend({"op": "add", "question": q} for q in questions)
+        if self.list_model.rows is not None:
+            self.apply_search()
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Импорт")
+        box.setIcon(QMessageBox.Warning if errors else QMessageBox.Information)
+        text = f"Добавени въпроси: {len(questions)}"
+        if errors:
+            text += f"\nРедове с грешки: {len(errors)} (виж подробностите)"
+            box.setDetailedText("\n".join(f"ред {line}: {msg}" for line, msg in errors))
+        box.setText(text + "\n\nНе забравяйте да запазите.")
+        box.exec()
+
+
+    # -------------------------------------------------------
+    #  Дубликати във всички банки
+    # -------------------------------------------------------
+    def current_bank_name(self):
+        if not self.loaded_filename:
+            return None
+        return os.path.basename(self.loaded_filename)
+
+    def find_duplicates(self):
+        if self.dedupe_task is not None:
+            return
+
+        task = DedupeTask(self.questions_path, self.current_bank_name(), self.questions)
+        self.dedupe_task = task
+        task.signals.finished.connect(self._on_dedupe_finished)
+        task.signals.failed.connect(self._on_dedupe_failed)
+        self.statusBar().showMessage("Търсене на дубликати...")
+        QThreadPool.globalInstance().start(task)
+
+    def _on_dedupe_failed(self, error: str):
+        self.dedupe_task = None
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Грешка", f"Търсенето на дубликати не успя:\n{error}")
+
+    def _on_dedupe_finished(self, clusters: list):
+        self.dedupe_task = None
+        self.statusBar().clearMessage()
+        if not clusters:
+            QMessageBox.information(self, "Дубликати", "Няма намерени дубликати.")
+            return
+        DuplicatesDialog(clusters, self, self).exec()
+
+    # -------------------------------------------------------
+    #  Готови версии на картинките
+    # -------------------------------------------------------
+    def build_renditions(self):
+        if self.renditions_task is not None:
+            return
+        if not os.path.isdir(self.images_path):
+            QMessageBox.warning(self, "Грешка", "Папката images/ липсва.")
+            return
+
+        task = RenditionsTask(self.images_path)
+        self.renditions_task = task
+        task.signals.progress.connect(self._on_renditions_progress)
+        task.signals.finished.connect(self._on_renditions_finished)
+        task.signals.failed.connect(self._on_renditions_failed)
+        self.statusBar().showMessage("Подготовка на картинките...")
+        QThreadPool.globalInstance().start(task)
+
+    def _on_renditions_progress(self, done: int, total: int):
+        self.statusBar().showMessage(f"Подготовка на картинките... {done}/{total}")
+
+    def _on_renditions_failed(self, error: str):
+        self.renditions_task = None
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Грешка", f"Картинките не могат да се подготвят:\n{error}")
+
+    def _on_renditions_finished(self, result: dict):
+        self.renditions_task = None
+        self.statusBar().clearMessage()
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Картинки")
+        text = (f"Картинки: {result['images']}\n"
+                f"Обработени: {result['rendered']}\n"
+                f"Без промяна: {result['unchanged']}")
+        if result["errors"]:
+            box.setIcon(QMessageBox.Warning)
+            text += f"\nС грешки: {len(result['errors'])}"
+            box.setDetailedText("\n".join(f"{name}: {error}" for name, error in result["errors"].items()))
+        else:
+            box.setIcon(QMessageBox.Information)
+        box.setText(text)
+        box.exec()
 
 
 if __name__ == "__main__":
@@ -415,4 +944,4 @@ if __name__ == "__main__":
 
     window = QuestionEditor()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
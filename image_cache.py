@@ -0,0 +1,309 @@
+import os
+from collections import OrderedDict
+
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
+
+from renditions import BOX_WIDTH, BOX_HEIGHT, lookup_for
+
+
+# размерът на рамката за картинка към въпрос (виж questions/primer.md)
+MAX_IMAGE_WIDTH = BOX_WIDTH
+MAX_IMAGE_HEIGHT = BOX_HEIGHT
+
+# тук се пазят готовите (смалени) версии на фона за всяка резолюция
+CACHE_DIR_NAME = ".cache"
+
+# колко нишки декодират картинки във фонов режим
+PREFETCH_THREADS = 2
+
+# колко памет (MB) могат да заемат готовите картинки; може да се смени
+# с променливата на средата QUIZ_IMAGE_CACHE_MB
+DEFAULT_CACHE_MB = 64
+
+
+def decode_scaled_image(path: str, max_w: int, max_h: int, dpr: float = 1.0) -> QImage:
+    """
+    Отваря картинката с Pillow, смалява я (LANCZOS) да влезе в max_w x max_h
+    логически пиксела и я връща директно като QImage – без временен файл.
+    При dpr > 1 картинката се пази в по-висока резолюция за HiDPI екрани.
+    """
+    # Pillow се зарежда чак при първата картинка – не забавя стартирането
+    from PIL import Image, ImageOps
+
+    # снимките от телефон често са завъртени само чрез EXIF (както в renditions)
+    img = ImageOps.exif_transpose(Image.open(path))
+    w, h = img.size
+    # логически мащаб (както на екран с dpr 1) и мащаб в реални пиксели
+    scale = min(max_w / w, max_h / h, 1.0)
+    px_scale = min(scale * dpr, 1.0)
+    if px_scale < 1.0:
+        img = img.resize((max(1, int(w * px_scale)), max(1, int(h * px_scale))), Image.LANCZOS)
+
+    img = img.convert("RGBA")
+    data = img.tobytes("raw", "RGBA")
+    qimg = QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888)
+    # copy() – QImage-ът да има собствен буфер, а не да сочи към data
+    qimg = qimg.copy()
+    qimg.setDevicePixelRatio(px_scale / scale)
+    return qimg
+
+
+def load_display_image(path: str, max_w: int, max_h: int, dpr: float = 1.0) -> QImage:
+    """
+    Картинката за въпрос, готова за показване. Ако build_renditions вече е
+    направил актуална версия за тази рамка, тя просто се прочита (1x или
+    2x според dpr); иначе картинката се смалява тук с decode_scaled_image.
+    """
+    if (max_w, max_h) == (BOX_WIDTH, BOX_HEIGHT):
+        found = lookup_for(os.path.dirname(os.path.abspath(path))).find(path, dpr)
+        if found is not None:
+            file, (logical_w, _) = found
+            img = QImage(file)
+            if not img.isNull():
+                img.setDevicePixelRatio(img.width() / logical_w)
+                return img
+    return decode_scaled_image(path, max_w, max_h, dpr)
+
+
+def load_background(path: str, width: int, height: int, dpr: float, cache_dir: str) -> QImage:
+    """
+    Връща фона, смален/изрязан (по центъра) точно до width x height логически
+    пиксела при дадения dpr. Готовият резултат се пази на диска в cache_dir
+    за всяка резолюция, така че при следващо пускане само се прочита.
+    """
+    st = os.stat(path)
+    px_w = max(1, round(width * dpr))
+    px_h = max(1, round(height * dpr))
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    cached_name = f"{name}_{st.st_size:x}_{st.st_mtime_ns:x}_{px_w}x{px_h}.png"
+    cached_path = os.path.join(cache_dir, cached_name)
+
+    img = QImage(cached_path)
+    if img.isNull():
+        img = QImage(path)
+        if img.isNull():
+            return img
+        img = img.scaled(px_w, px_h, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+        x = (img.width() - px_w) // 2
+        y = (img.height() - px_h) // 2
+        img = img.copy(x, y, px_w, px_h)
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cached_path + ".tmp.png"
+            if img.save(tmp_path):
+                os.replace(tmp_path, cached_path)
+        except OSError:
+            # папката е само за четене – просто няма да имаме кеш на диска
+            pass
+
+    img.setDevicePixelRatio(dpr)
+    return img
+
+
+class PixmapCache:
+    """
+    LRU кеш на готови QPixmap-и за картинките към въпросите.
+    Ключ: (път, mtime, размер на рамката, device pixel ratio) – ако файлът
+    бъде сменен, mtime-ът се променя и старият запис просто изпада.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._items = OrderedDict()   # key -> (QPixmap, cost)
+
+    @staticmethod
+    def make_key(path: str, max_w: int, max_h: int, dpr: float):
+        mtime = os.stat(path).st_mtime_ns
+        return (os.path.abspath(path), mtime, (max_w, max_h), round(dpr, 2))
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def insert(self, key, image: QImage) -> QPixmap:
+        pix = QPixmap.fromImage(image)
+        cost = image.sizeInBytes()
+
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.used_bytes -= old[1]
+
+        self._items[key] = (pix, cost)
+        self.used_bytes += cost
+        self._evict()
+        return pix
+
+    def pixmap(self, path: str, max_w: int = MAX_IMAGE_WIDTH,
+               max_h: int = MAX_IMAGE_HEIGHT, dpr: float = 1.0) -> QPixmap:
+        key = self.make_key(path, max_w, max_h, dpr)
+        pix = self.get(key)
+        if pix is None:
+            pix = self.insert(key, load_display_image(path, max_w, max_h, dpr))
+        return pix
+
+    def set_budget(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._evict()
+
+    def clear(self):
+        self._items.clear()
+        self.used_bytes = 0
+
+    def _evict(self):
+        # най-старите излизат първи; последно вкараният остава винаги,
+        # дори сам да е по-голям от бюджета
+        while self.used_bytes > self.budget_bytes and len(self._items) > 1:
+            _, (_, cost) = self._items.popitem(last=False)
+            self.used_bytes -= cost
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+
+class _DecodeSignals(QObject):
+    done = Signal(object, object)     # key, QImage
+    failed = Signal(object, str)      # key, грешка
+    background = Signal(object)       # QImage на фона
+
+
+class _DecodeTask(QRunnable):
+    """Декодира една картинка в работна нишка (само QImage – QPixmap не може извън GUI нишката)."""
+
+    def __init__(self, key, path: str, max_w: int, max_h: int, dpr: float, signals: _DecodeSignals):
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.max_w = max_w
+        self.max_h = max_h
+        self.dpr = dpr
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = load_display_image(self.path, self.max_w, self.max_h, self.dpr)
+        except Exception as e:
+            self.signals.failed.emit(self.key, str(e))
+            return
+        self.signals.done.emit(self.key, image)
+
+
+class _BackgroundTask(QRunnable):
+    """Зарежда (или смалява и кешира) фона в работна нишка."""
+
+    def __init__(self, path: str, width: int, height: int, dpr: float, cache_dir: str,
+                 signals: _DecodeSignals):
+        super().__init__()
+        self.path = path
+        self.width = width
+        self.height = height
+        self.dpr = dpr
+        self.cache_dir = cache_dir
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = load_background(self.path, self.width, self.height, self.dpr, self.cache_dir)
+        except Exception as e:
+            print(f"Фонът {self.path} не може да се зареди: {e}")
+            image = QImage()
+        # празен QImage = няма фон, но GUI-то пак разбира, че зареждането е свършило
+        self.signals.background.emit(image)
+
+
+class ImagePrefetcher(QObject):
+    """
+    Декодира и смалява картинки на QThreadPool, преди ученикът да стигне до
+    въпроса. Готовите QImage-и пристигат в GUI нишката (queued сигнал), там
+    се превръщат в QPixmap, влизат в кеша и се излъчва image_ready(key).
+    Картинка, която не може да се декодира, се помни (image_failed(key)) и
+    не се пробва пак, докато файлът не се смени (mtime е част от ключа).
+    """
+
+    image_ready = Signal(object)
+    image_failed = Signal(object)
+    background_ready = Signal(object)
+
+    def __init__(self, cache: PixmapCache, parent=None, max_threads: int = PREFETCH_THREADS):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._pending = {}     # key -> _DecodeTask, чакаща или в работа
+        self._failed = {}      # key -> грешка
+
+        self._signals = _DecodeSignals()
+        self._signals.done.connect(self._on_done)
+        self._signals.failed.connect(self._on_failed)
+        self._signals.background.connect(self.background_ready)
+
+    def request(self, path: str, max_w: int = MAX_IMAGE_WIDTH,
+                max_h: int = MAX_IMAGE_HEIGHT, dpr: float = 1.0, priority: int = 0):
+        """
+        Пуска декодиране във фонов режим, ако картинката не е вече в кеша.
+        Връща ключа в кеша или None, ако файлът липсва.
+        """
+        try:
+            key = self.cache.make_key(path, max_w, max_h, dpr)
+        except OSError:
+            return None
+
+        if key in self.cache or key in self._pending or key in self._failed:
+            return key
+
+        task = _DecodeTask(key, path, max_w, max_h, dpr, self._signals)
+        # задачата остава наша (за tryTake), а не се трие от пула след run()
+        task.setAutoDelete(False)
+        self._pending[key] = task
+        self.pool.start(task, priority)
+        return key
+
+    def load_background(self, path: str, width: int, height: int, dpr: float, cache_dir: str):
+        """Фонът се готви извън GUI нишката; резултатът идва с background_ready(QImage)."""
+        self.pool.start(_BackgroundTask(path, width, height, dpr, cache_dir, self._signals), 100)
+
+    def is_pending(self, key) -> bool:
+        return key in self._pending
+
+    def has_failed(self, key) -> bool:
+        return key in self._failed
+
+    def cancel_pending(self):
+        # махаме само чакащите декодирания (напр. при нов тест); вече
+        # започналите остават в _pending – довършват и пак влизат в кеша,
+        # без да се пускат втори път. Фонът не се пипа.
+        for key, task in list(self._pending.items()):
+            if self.pool.tryTake(task):
+                del self._pending[key]
+
+    def _on_done(self, key, image: QImage):
+        self._pending.pop(key, None)
+        self.cache.insert(key, image)
+        self.image_ready.emit(key)
+
+    def _on_failed(self, key, error: str):
+        self._pending.pop(key, None)
+        self._failed[key] = error
+        print(f"Картинката {key[0]} не може да се декодира: {error}")
+        self.image_failed.emit(key)
+
+
+def _budget_from_env() -> int:
+    try:
+        mb = float(os.environ.get("QUIZ_IMAGE_CACHE_MB", DEFAULT_CACHE_MB))
+    except ValueError:
+        mb = DEFAULT_CACHE_MB
+    return int(mb * 1024 * 1024)
+
+
+# един общ кеш за целия процес
+pixmap_cache = PixmapCache(_budget_from_env())
@@ -0,0 +1,420 @@
+import numpy as np
+
+from answer_matcher import normalize_answer
+from question_bank import question_hash
+
+
+# Анализ на въпросите по записаните резултати
+# --------------------------------------------
+# За всеки въпрос – (клас, предмет, отпечатък на съдържанието). id-то е само
+# мястото в банката: след изтриване или вмъкване в редактора под същото id е
+# друг въпрос, затова резултатите се групират по question_bank.question_hash
+# (записите отпреди версия 4 на базата, без отпечатък – по id):
+#   difficulty     – p-стойност: делът на верните отговори;
+#   discrimination – точково-бисериална корелация между верния отговор на
+#                    въпроса и резултата на ученика на ОСТАНАЛИТЕ въпроси от
+#                    теста (добрите въпроси се решават от по-силните ученици;
+#                    отрицателна стойност често значи грешен "answer");
+#   answers        – колко често е избран всеки вариант / даден всеки отговор
+#                    (свободните – нормализирани, „Коала.“ = „коала“; при
+#                    известни варианти и неизбираните, с 0);
+#   seconds        – средно време на въпроса, ако е записано.
+#
+# rest_score е (верни в теста − този) / (брой въпроси в теста − 1) – и за
+# add_sessions, и за update_from_db; неотговореният въпрос се брои за грешен.
+#
+# С bank_loader се броят само резултатите за въпросите, както са в банката
+# сега (по отпечатък, и ако са преместени); старите версии и записите без
+# отпечатък се пропускат, а id-то в отчета е текущото.
+#
+# Пазят се само суми (брой, Σx, Σy, Σy², Σxy, ...) по въпроси, затова нови
+# тестове се добавят без да се преизчислява всичко, а добавянето е с
+# np.bincount върху масиви – без цикъл по отговорите.
+
+MIN_RESPONSES = 30            # под толкова отговора не се правят изводи
+EASY_P = 0.9
+HARD_P = 0.2
+LOW_DISCRIMINATION = 0.1
+TOP_ANSWERS = 5               # за свободен отговор – толкова най-чести отговора
+
+# update_from_db чете само числата; броенето на отговорите е в SQLite.
+# Тестовете без оценка (scored = 0) не се броят – там всеки отговор е „грешен“.
+_SESSIONS_QUERY = "SELECT id, grade, category, correct, total FROM sessions WHERE id > ? AND scored = 1{filters}"
+_SESSION_IDS = "SELECT id FROM sessions WHERE id > ? AND id <= ? AND scored = 1{filters}"
+_ANSWERS_QUERY = (
+    "SELECT session_id, question_id, was_counted, IFNULL(seconds, -1), question_hash FROM answers"
+    " WHERE session_id IN ({sessions}) ORDER BY session_id"
+)
+_ANSWER_COUNTS_QUERY = (
+    "SELECT s.grade, s.category, a.question_id, a.question_hash, a.type, a.question, a.correct_answer,"
+    " a.user_answer, COUNT(*)"
+    " FROM answers a JOIN sessions s ON s.id = a.session_id"
+    " WHERE s.id IN ({sessions})"
+    " GROUP BY s.grade, s.category, a.question_hash, a.question_id, a.user_answer"
+)
+
+
+def _item_key(grade, category, qid, qhash) -> tuple:
+    """Ключът на въпроса; без отпечатък (стари записи) – по id."""
+    return (grade, category, qhash if qhash is not None else f"#{qid}")
+
+
+class ItemStats:
+    """Натрупани статистики за въпросите; add() добавя нови отговори."""
+
+    # n, Σx – всички отговори; ny, Σx, Σy, Σy², Σxy – само тези с rest_score
+    _SUMS = ("n", "sx", "ny", "sxr", "sy", "syy", "sxy", "t_n", "t_sum")
+
+    def __init__(self, bank_loader=None):
+        """
+        bank_loader(клас, предмет) -> текущите въпроси на банката или None
+        (по желание) – тогава се броят само резултатите за тези въпроси.
+        """
+        self.bank_loader = bank_loader
+        self._banks = {}             # (клас, предмет) -> {отпечатък: (id, въпрос)} или None
+        self.keys = []               # (клас, предмет, отпечатък)
+        self._key_index = {}
+        self.ids = []                # id в банката – текущото или последното видяно
+        self._bank_ids = set()       # въпросите, чието id е от банката
+        self.meta = []               # {"type", "question", "correct", "options"}
+        self.answer_values = []      # код -> текст на отговора
+        self._answer_index = {}
+        self.answer_counts = {}      # (въпрос, код на отговора) -> брой
+        self.last_session_id = 0     # за update_from_db
+        for name in self._SUMS:
+            setattr(self, name, np.zeros(0))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _bank(self, grade, category):
+        bank_key = (grade, category)
+        if bank_key not in self._banks:
+            questions = self.bank_loader(grade, category)
+            self._banks[bank_key] = None if questions is None else {
+                question_hash(q): (i, q) for i, q in reversed(list(enumerate(questions)))
+            }
+        return self._banks[bank_key]
+
+    # ---------------- кодиране ----------------
+    def _item_codes(self, keys) -> np.ndarray:
+        """
+        Кодовете на въпросите за ключове (клас, предмет, id, отпечатък);
+        -1 за пропуснатите (стара версия на въпроса, виж bank_loader).
+        """
+        index = self._key_index
+        codes = np.empty(len(keys), dtype=np.int64)
+        for i, (grade, category, qid, qhash) in enumerate(keys):
+            key = _item_key(grade, category, qid, qhash)
+            code = index.get(key)
+            if code is None:
+                bank = self._bank(grade, category) if self.bank_loader is not None else None
+                if bank is not None:
+                    found = bank.get(qhash)
+                    if found is None:
+                        codes[i] = -1
+                        continue
+                    # id и описанието (с всички варианти) – от банката
+                    qid, question = found
+                    self._bank_ids.add(len(self.keys))
+                    self.meta.append(_question_meta(question))
+                else:
+                    # няма банка – не можем да проверим
+                    self.meta.append({})
+                code = index[key] = len(self.keys)
+                self.keys.append(key)
+                self.ids.append(qid)
+            elif code not in self._bank_ids:
+                self.ids[code] = qid
+            codes[i] = code
+        return codes
+
+    def _answer_code(self, text: str) -> int:
+        code = self._answer_index.get(text)
+        if code is None:
+            code = self._answer_index[text] = len(self.answer_values)
+            self.answer_values.append(text)
+        return code
+
+    def _answer_codes(self, answers) -> np.ndarray:
+        return np.fromiter((self._answer_code(a) for a in answers), dtype=np.int64, count=len(answers))
+
+    def _grow(self):
+        size = len(self.keys)
+        for name in self._SUMS:
+            old = getattr(self, name)
+            if len(old) < size:
+                setattr(self, name, np.concatenate([old, np.zeros(size - len(old))]))
+
+    # ---------------- добавяне ----------------
+    def add(self, keys, correct, rest_score, answers=None, seconds=None, meta=None):
+        """
+        Добавя отговори (по един елемент на отговор във всички масиви):
+          keys       – (клас, предмет, id, отпечатък) на въпроса;
+          correct    – 1/0 верен ли е отговорът;
+          rest_score – делът верни отговори на ученика на останалите въпроси
+                       от теста (NaN, ако тестът е само с този въпрос);
+          answers    – написаното/избраното от ученика (по желание);
+          seconds    – време на въпроса (NaN, ако не е записано);
+          meta       – {ключ: {"type", "question", "correct", "options"}}
+                       (по желание).
+        Отговорите за стари версии на въпросите (виж bank_loader) се пропускат.
+        """
+        items = self._item_codes(keys)
+        keep = items >= 0
+        if not keep.all():
+            items = items[keep]
+            correct = np.asarray(correct)[keep]
+            rest_score = np.asarray(rest_score)[keep]
+            answers = None if answers is None else [a for a, ok in zip(answers, keep) if ok]
+            seconds = None if seconds is None else np.asarray(seconds, dtype=np.float64)[keep]
+        if not len(items):
+            return
+        self._add_coded(items, correct, rest_score, seconds)
+
+        if answers is not None:
+            pairs = items * (1 << 32) + self._answer_codes(answers)
+            unique, counts = np.unique(pairs, return_counts=True)
+            for pair, count in zip(unique.tolist(), counts.tolist()):
+                key = (pair >> 32, pair & 0xFFFFFFFF)
+                self.answer_counts[key] = self.answer_counts.get(key, 0) + count
+
+        if meta:
+            for key, info in meta.items():
+                item = self._key_index.get(_item_key(*key))
+                if item is not None and not self.meta[item]:
+                    self.meta[item] = info
+
+    def _add_coded(self, items: np.ndarray, correct, rest_score, seconds=None):
+        self._grow()
+        size = len(self.keys)
+
+        x = np.asarray(correct, dtype=np.float64)
+        y = np.asarray(rest_score, dtype=np.float64)
+        has_y = ~np.isnan(y)
+        y0 = np.where(has_y, y, 0.0)
+        x_y = np.where(has_y, x, 0.0)
+
+        def add_to(name, weights=None):
+            total = getattr(self, name)
+            total += np.bincount(items, weights=weights, minlength=size)
+
+        add_to("n")
+        add_to("sx", x)
+        # корелацията се смята само по отговорите с rest_score
+        add_to("ny", has_y.astype(np.float64))
+        add_to("sxr", x_y)
+        add_to("sy", y0)
+        add_to("syy", y0 * y0)
+        add_to("sxy", x_y * y0)
+
+        if seconds is not None:
+            t = np.asarray(seconds, dtype=np.float64)
+            has_t = ~np.isnan(t)
+            add_to("t_n", has_t.astype(np.float64))
+            add_to("t_sum", np.where(has_t, t, 0.0))
+
+    def add_sessions(self, sessions):
+        """
+        Добавя завършени тестове. Всеки е (клас, предмет, QuizSession) –
+        същото, което results_store записва в базата.
+        """
+        keys, correct, rest, answers, seconds, meta = [], [], [], [], [], {}
+        for grade, category, session in sessions:
+            if not session.scored:
+                continue
+            # като в базата: точките и броят въпроси на целия тест
+            total = session.total_questions
+            score = session.correct_answers
+            questions = dict(zip(session.question_ids, session.questions))
+            for e in session.answers_log:
+                x = 1 if e["was_counted"] else 0
+                question = questions[e["id"]]
+                key = (str(grade), str(category), e["id"], question_hash(question))
+                keys.append(key)
+                correct.append(x)
+                rest.append((score - x) / (total - 1) if total > 1 else np.nan)
+                answers.append(_answer_key(e.get("type"), e.get("user_answer")))
+                s = session.time_spent.get(e["id"])
+                seconds.append(np.nan if s is None else s)
+                meta[key] = _question_meta(question)
+        if keys:
+            self.add(keys, correct, rest, answers, seconds, meta)
+
+    def update_from_db(self, conn, grade: str = None, category: str = None) -> int:
+        """
+        Добавя отговорите от results_store, записани след последното
+        извикване. Връща броя на новите отговори.
+        """
+        filters = ""
+        values = []
+        if grade is not None:
+            filters += " AND grade = ?"
+            values.append(str(grade))
+        if category is not None:
+            filters += " AND category = ?"
+            values.append(str(category))
+
+        sessions = conn.execute(_SESSIONS_QUERY.format(filters=filters),
+                                [self.last_session_id] + values).fetchall()
+        if not sessions:
+            return 0
+        session_ids, grades, categories, scores, totals = zip(*sessions)
+
+        # само прочетените тестове – междувременно може да са записани нови
+        where = _SESSION_IDS.format(filters=filters)
+        params = [self.last_session_id, max(session_ids)] + values
+
+        rows = conn.execute(_ANSWERS_QUERY.format(sessions=where), params).fetchall()
+        answers = np.array([r[:4] for r in rows], dtype=np.float64).reshape(-1, 4)
+        if len(answers):
+            # данните за теста на всеки отговор
+            sid = np.array(session_ids, dtype=np.int64)
+            order = np.argsort(sid)
+            pos = order[np.searchsorted(sid, answers[:, 0].astype(np.int64), sorter=order)]
+
+            banks = {}
+            bank = np.array([banks.setdefault(b, len(banks)) for b in zip(grades, categories)], dtype=np.int64)
+            bank_names = list(banks)
+
+            # отпечатъците (без отпечатък – id-то) като числа, за да върви np.unique
+            qid = answers[:, 1].astype(np.int64)
+            hashes = {}
+            hcode = np.fromiter((hashes.setdefault(r[4] if r[4] is not None else -1 - r[1], len(hashes))
+                                 for r in rows), dtype=np.int64, count=len(rows))
+            hash_names = [h if isinstance(h, str) else None for h in hashes]
+
+            # въпрос = (тест от банка, отпечатък) -> код в self.keys само за различните;
+            # id-то е от последния отговор (тестовете са подредени по време)
+            unique, inverse = np.unique(bank[pos] * (1 << 32) + hcode, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            last = np.zeros(len(unique), dtype=np.int64)
+            np.maximum.at(last, inverse, np.arange(len(inverse)))
+            unique_keys = [bank_names[u >> 32] + (q, hash_names[u & 0xFFFFFFFF])
+                           for u, q in zip(unique.tolist(), qid[last].tolist())]
+            codes = self._item_codes(unique_keys)[inverse]
+            rows_kept = codes >= 0
+            items = codes[rows_kept]
+
+            x = answers[rows_kept, 2]
+            score = np.array(scores, dtype=np.float64)[pos][rows_kept]
+            total = np.array(totals, dtype=np.float64)[pos][rows_kept]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rest = np.where(total > 1, (score - x) / (total - 1), np.nan)
+            seconds = answers[rows_kept, 3]
+            seconds = np.where(seconds < 0, np.nan, seconds)
+            self._add_coded(items, x, rest, seconds)
+
+            for g, c, q, qhash, qtype, question, correct, answer, count in conn.execute(
+                    _ANSWER_COUNTS_QUERY.format(sessions=where), params):
+                item = self._key_index.get(_item_key(g, c, q, qhash))
+                if item is None:
+                    # стара версия на въпроса (виж bank_loader)
+                    continue
+                key = (item, self._answer_code(_answer_key(qtype, answer)))
+                self.answer_counts[key] = self.answer_counts.get(key, 0) + count
+                if not self.meta[item]:
+                    self.meta[item] = {"type": qtype, "question": question, "correct": correct}
+
+        self.last_session_id = max(self.last_session_id, max(session_ids))
+        return int(rows_kept.sum()) if len(answers) else 0
+
+    # ---------------- резултати ----------------
+    def arrays(self) -> dict:
+        """difficulty, discrimination и mean_seconds като масиви (NaN, ако няма данни)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            difficulty = self.sx / self.n
+
+            n, sx, sy, syy, sxy = self.ny, self.sxr, self.sy, self.syy, self.sxy
+            cov = n * sxy - sx * sy
+            var_x = n * sx - sx * sx        # x е 0/1 – Σx² = Σx
+            var_y = n * syy - sy * sy
+            discrimination = cov / np.sqrt(var_x * var_y)
+            discrimination[~np.isfinite(discrimination)] = np.nan
+
+            mean_seconds = self.t_sum / self.t_n
+        return {"difficulty": difficulty, "discrimination": discrimination, "mean_seconds": mean_seconds}
+
+    def report(self, min_responses: int = MIN_RESPONSES) -> list:
+        """Списък от dict за всеки въпрос, подреден по клас, предмет и id."""
+        stats = self.arrays()
+        by_item = {}
+        for (item, code), count in self.answer_counts.items():
+            counts = by_item.setdefault(item, {})
+            counts[self.answer_values[code]] = count
+
+        result = []
+        for i, key in enumerate(self.keys):
+            n = int(self.n[i])
+            meta = self.meta[i]
+            counts = by_item.get(i, {})
+            # и вариантите, които никой не е избрал
+            for option in meta.get("options") or ():
+                counts.setdefault(option, 0)
+            answers = sorted(((c, a) for a, c in counts.items()), key=lambda c: (-c[0], c[1]))
+            if meta.get("type") == "text":
+                answers = answers[:TOP_ANSWERS]
+
+            item = {
+                "grade": key[0],
+                "category": key[1],
+                "id": self.ids[i],
+                "hash": key[2],
+                "type": meta.get("type"),
+                "question": meta.get("question"),
+                "correct": meta.get("correct"),
+                "responses": n,
+                "difficulty": _round(stats["difficulty"][i]),
+                "discrimination": _round(stats["discrimination"][i]),
+                "mean_seconds": _round(stats["mean_seconds"][i], 1),
+                "answers": [{"answer": a, "rate": round(c / n, 3)} for c, a in answers] if n else [],
+            }
+            item["flags"] = _flags(item, min_responses)
+            result.append(item)
+
+        result.sort(key=lambda r: (r["grade"], r["category"], r["id"], r["hash"]))
+        return result
+
+
+def _question_meta(question: dict) -> dict:
+    options = question.get("options") if question.get("type") == "choice" else None
+    return {
+        "type": question.get("type"),
+        "question": question.get("question"),
+        "correct": question.get("answer"),
+        "options": [str(o) for o in options] if options else None,
+    }
+
+
+def _answer_key(qtype, answer) -> str:
+    if not answer:
+        return ""
+    return normalize_answer(answer) if qtype == "text" else answer
+
+
+def _round(value, digits: int = 3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _flags(item: dict, min_responses: int) -> list:
+    """Предупреждения за въпроса (само при достатъчно отговори)."""
+    if item["responses"] < min_responses:
+        return []
+    flags = []
+    p = item["difficulty"]
+    r = item["discrimination"]
+    if p is not None and p >= EASY_P:
+        flags.append("too_easy")
+    if p is not None and p <= HARD_P:
+        flags.append("too_hard")
+    if r is not None and r < 0:
+        flags.append("negative_discrimination")
+    elif r is not None and r < LOW_DISCRIMINATION:
+        flags.append("low_discrimination")
+    if item["type"] == "choice" and item["answers"] and item["correct"] is not None:
+        top = item["answers"][0]
+        if top["answer"] != item["correct"] and top["rate"] > (p or 0):
+            # друг вариант е избиран по-често от верния – проверете "answer"
+            flags.append("distractor_beats_key")
+    return flags
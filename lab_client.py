@@ -0,0 +1,130 @@
+import json
+import socket
+import random
+import http.client
+from urllib.parse import urlsplit
+
+from quiz_session import QuizSession, QUESTIONS_PER_TEST
+
+
+# Клиент за lab_server.py
+# ------------------------
+# RemoteSession има същия интерфейс като QuizSession, така че QuizApp не
+# различава локален от отдалечен тест: навигацията е локална, а всеки
+# отговор се проверява и записва от сървъра. Верните отговори и точките
+# идват чак с резултата от submit().
+
+TIMEOUT = 10     # секунди
+
+
+class LabServerError(OSError):
+    """
+    Сървърът не отговаря или върна грешка. Наследява OSError, за да може
+    main.py да я хваща, без да зарежда този модул при стартиране.
+    """
+
+
+class LabClient:
+    """Една keep-alive HTTP връзка към сървъра."""
+
+    def __init__(self, url: str, timeout: float = TIMEOUT):
+        parts = urlsplit(url if "//" in url else "http://" + url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Невалиден адрес на сървъра: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._conn = None
+
+    def request(self, method: str, path: str, body: dict = None, retry: bool = True):
+        """
+        JSON заявка към сървъра. retry=False за заявки, които не бива да се
+        повтарят (POST /sessions – повторението би направило втори тест).
+        """
+        data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+
+        # при затворена keep-alive връзка (рестарт на сървъра) – един нов опит
+        attempts = (0, 1) if retry else (1,)
+        for attempt in attempts:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=data, headers=headers)
+                response = self._conn.getresponse()
+                raw = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                if attempt == 1:
+                    raise LabServerError(f"Сървърът не отговаря: {e}") from e
+
+        try:
+            payload = json.loads(raw.decode("utf-8")) if raw else None
+        except ValueError:
+            raise LabServerError("Сървърът върна невалиден отговор.")
+        if response.status >= 400:
+            message = payload.get("error") if isinstance(payload, dict) else None
+            raise LabServerError(message or f"HTTP {response.status}")
+        return payload
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class RemoteSession(QuizSession):
+    """Тест, чиито въпроси и точки са на сървъра."""
+
+    def __init__(self, client: LabClient, session_id: str, questions: list, question_ids: list, rng=None):
+        super().__init__(questions, question_ids, rng)
+        self.client = client
+        self.session_id = session_id
+        # отговорите се оценяват на сървъра – до submit() оценка няма
+        self.scored = False
+
+    @classmethod
+    def start(cls, url: str, grade: str, subject: str, count: int = QUESTIONS_PER_TEST, rng=None) -> "RemoteSession":
+        """Нов тест от сървъра. Хвърля LabServerError, ако не може."""
+        # нова връзка – няма стара keep-alive връзка, заради която да се пробва пак
+        client = LabClient(url)
+        data = client.request("POST", "/sessions", {"grade": grade, "subject": subject, "count": count,
+                                                    "client": socket.gethostname()}, retry=False)
+        return cls(client, data["session"], data["questions"], data["question_ids"], rng or random.Random())
+
+    def answer_choice(self, selected: str) -> dict:
+        return self._send_answer(selected)
+
+    def answer_text(self, user_raw: str) -> dict:
+        return self._send_answer(user_raw)
+
+    def _send_answer(self, answer: str) -> dict:
+        # повторен отговор на същия въпрос само го заменя – безопасно е да се повтори
+        self.client.request("POST", f"/sessions/{self.session_id}/answers",
+                            {"index": self.current_index, "answer": answer})
+        question = self.current_question
+        # дали е верен – разбираме чак от резултата след submit()
+        return self._record_answer(self.current_question_id, {
+            "id": self.current_question_id,
+            "type": question["type"],
+            "question": question["question"],
+            "correct": None,
+            "user_answer": answer.strip() if question["type"] == "text" else answer,
+            "image": question.get("image"),
+            "was_counted": False,
+        })
+
+    def submit(self):
+        """
+        Сървърът записва резултата от теста (вика се след finish()) и връща
+        верните отговори и точките – с тях се показват резултатът и прегледът.
+        """
+        result = self.client.request("POST", f"/sessions/{self.session_id}/finish",
+                                     {"finished_at": self.finished_at, "client": socket.gethostname(),
+                                      # JSON ключовете са низове
+                                      "time_spent": {str(k): v for k, v in self.time_spent.items()}})
+        self.correct_answers = result["correct_answers"]
+        self.answers = {entry["id"]: entry for entry in result["answers"]}
+        self.review_order = [entry["id"] for entry in result["answers"]]
+        self.scored = True
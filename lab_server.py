@@ -0,0 +1,408 @@
+"""
+Сървър за компютърния кабинет: един процес зарежда всяка банка веднъж и
+обслужва тестовете на всички компютри през локалната мрежа.
+
+    python lab_server.py [--host 0.0.0.0] [--port 8765]
+    python main.py --server http://<адрес на сървъра>:8765
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import OrderedDict
+
+from question_bank import load_bank, bank_path, bank_stamp
+from quiz_session import QuizSession, QUESTIONS_PER_TEST
+from results_store import store_for, close_all, default_path, recent_question_hashes
+from selection import Selector, load_spec
+
+
+# Протокол
+# --------
+# HTTP/1.1 с JSON (keep-alive – един компютър държи една връзка):
+#   GET    /health                      -> {"ok", "sessions", "banks"}
+#   POST   /sessions                    {"grade": "4", "subject": "math", "count": 10}
+#                                       -> {"session", "question_ids", "questions"}
+#   POST   /sessions/<id>/answers       {"index": номер в теста, "answer": "..."}
+#                                       -> {"index", "id", "accepted"}
+#   GET    /sessions/<id>               -> {"finished", "total_questions", "answered"} и след
+#                                           /finish – "correct_answers", "percent", "answers"
+#   POST   /sessions/<id>/finish        {"finished_at", "client", "time_spent"} -> резултатът се
+#                                       записва в results_store (веднъж); отговорът е като
+#                                       GET /sessions/<id>
+# Верните отговори и точките се виждат чак след /finish – докато тестът
+# върви, клиентът получава само потвърждение за записания отговор.
+#   DELETE /sessions/<id>
+# Грешките са {"error": "..."} със съответния HTTP код.
+#
+# Въпросите на една банка са общи за всички сесии (не се копират); сесиите
+# са най-много MAX_SESSIONS и изтичат след SESSION_TTL секунди без заявка.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MAX_SESSIONS = 2000
+SESSION_TTL = 4 * 60 * 60
+MAX_QUESTIONS_PER_TEST = 100
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT = 60            # секунди без заявка по отворена връзка
+
+_BANK_RE = re.compile(r"^\d+$"), re.compile(r"^[a-z]+$")
+
+_REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# -------------------------------------------------------
+#  Банки (заредени веднъж, общи за всички сесии)
+# -------------------------------------------------------
+def _load_for_selection(path: str):
+    """Банката и alias таблиците ѝ – правят се заедно, извън event loop-а."""
+    questions = load_bank(path)
+    return questions, Selector.from_questions(questions)
+
+
+class BankStore:
+    def __init__(self, questions_path: str):
+        self.questions_path = questions_path
+        self._banks = {}         # име на файла -> (stamp, (въпроси, Selector))
+        self._loading = {}       # име на файла -> asyncio.Task
+
+    def names(self) -> list:
+        return sorted(self._banks)
+
+    async def get(self, grade: str, subject: str) -> tuple:
+        """(въпроси, Selector) за банката; чете я наново само ако е сменена."""
+        if not (_BANK_RE[0].match(grade) and _BANK_RE[1].match(subject)):
+            raise HttpError(400, "Невалиден клас или предмет.")
+        path = bank_path(self.questions_path, grade, subject)
+        name = os.path.basename(path)
+
+        stamp = bank_stamp(path)
+        if stamp[0] is None:
+            raise HttpError(404, f"Файлът {name} липсва!")
+        cached = self._banks.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        # едновременните заявки за една банка чакат едно и също зареждане
+        task = self._loading.get(name)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(None, _load_for_selection, path))
+            self._loading[name] = task
+            try:
+                bank = await task
+            except ValueError:
+                raise HttpError(500, f"{name} е с грешен JSON!")
+            finally:
+                self._loading.pop(name, None)
+            self._banks[name] = (stamp, bank)
+            return bank
+
+        try:
+            return await asyncio.shield(task)
+        except ValueError:
+            raise HttpError(500, f"{name} е с грешен JSON!")
+
+
+# -------------------------------------------------------
+#  Сесии
+# -------------------------------------------------------
+def public_question(question: dict) -> dict:
+    """Въпросът без верния отговор – така го получава клиентът."""
+    return {k: v for k, v in question.items() if k not in ("answer", "accepted")}
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()     # id -> (последна заявка, QuizSession, данни)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            sid, (seen, _, _) = next(iter(self._sessions.items()))
+            if now - seen < self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[sid]
+
+    def add(self, session: QuizSession, info: dict = None) -> str:
+        sid = uuid.uuid4().hex
+        now = time.monotonic()
+        self._sessions[sid] = (now, session, info or {})
+        self._expire(now)
+        return sid
+
+    def get(self, sid: str) -> QuizSession:
+        return self._touch(sid)[1]
+
+    def info(self, sid: str) -> dict:
+        """Данните, подадени на add() (клас, предмет)."""
+        return self._touch(sid)[2]
+
+    def _touch(self, sid: str):
+        item = self._sessions.get(sid)
+        if item is None:
+            raise HttpError(404, "Няма такъв тест (или е изтекъл).")
+        item = (time.monotonic(),) + item[1:]
+        self._sessions[sid] = item
+        self._sessions.move_to_end(sid)
+        return item
+
+    def remove(self, sid: str):
+        self._sessions.pop(sid, None)
+
+
+class LabServer:
+    def __init__(self, questions_path: str, results_path: str = None,
+                 max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.banks = BankStore(questions_path)
+        self.sessions = SessionStore(max_sessions, ttl)
+        # None – резултатите не се записват (напр. при тестове на сървъра)
+        self.results = store_for(results_path) if results_path else None
+        self.rng = random.Random()
+
+    # ---------------- обработка на заявките ----------------
+    async def handle(self, method: str, path: str, body):
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"ok": True, "sessions": len(self.sessions), "banks": self.banks.names()}
+
+        if parts == ["sessions"] and method == "POST":
+            return await self.create_session(body or {})
+
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if len(parts) == 2 and method == "GET":
+                return 200, self.session_result(session)
+            if len(parts) == 2 and method == "DELETE":
+                self.sessions.remove(parts[1])
+                return 204, None
+            if parts[2:] == ["answers"] and method == "POST":
+                return 200, self.record_answer(session, body or {})
+            if parts[2:] == ["finish"] and method == "POST":
+                return 200, self.finish_session(parts[1], session, body or {})
+            raise HttpError(405, "Методът не се поддържа.")
+
+        raise HttpError(404, "Няма такъв адрес.")
+
+    async def create_session(self, body: dict):
+        grade, subject = str(body.get("grade", "")), str(body.get("subject", ""))
+        questions, selector = await self.banks.get(grade, subject)
+        if not questions:
+            raise HttpError(404, "Файлът е празен!")
+        try:
+            count = int(body.get("count", QUESTIONS_PER_TEST))
+        except (TypeError, ValueError):
+            raise HttpError(400, "Невалиден брой въпроси.")
+
+        # правилата от selection.json на сървъра са с предимство пред count
+        spec = load_spec(self.banks.questions_path, f"{grade}_{subject}.json", count)
+        spec.count = max(1, min(spec.count, MAX_QUESTIONS_PER_TEST, len(questions)))
+
+        exclude = ()
+        client = body.get("client")
+        if spec.exclude_recent and client and self.results is not None:
+            loop = asyncio.get_running_loop()
+            recent = await loop.run_in_executor(None, recent_question_hashes, self.results.path,
+                                                grade, subject, str(client), spec.exclude_recent)
+            exclude = selector.ids_for_hashes(recent)
+
+        if spec.is_uniform and not exclude and not selector.weighted:
+            # същият избор като sample_questions_with_ids – id е индексът в банката
+            picked = self.rng.sample(range(len(questions)), spec.count)
+        else:
+            picked = selector.pick(spec, self.rng, exclude)
+        session = QuizSession([questions[i] for i in picked], picked)
+        sid = self.sessions.add(session, {"grade": body["grade"], "subject": body["subject"]})
+        return 201, {
+            "session": sid,
+            "question_ids": picked,
+            "questions": [public_question(q) for q in session.questions],
+        }
+
+    def record_answer(self, session: QuizSession, body: dict) -> dict:
+        index = body.get("index")
+        answer = body.get("answer")
+        if not isinstance(index, int) or not 0 <= index < session.total_questions:
+            raise HttpError(400, "Невалиден номер на въпрос.")
+        if not isinstance(answer, str):
+            raise HttpError(400, "Отговорът трябва да е текст.")
+
+        if session.finished_at is not None:
+            raise HttpError(400, "Тестът вече е предаден.")
+
+        # точките се смятат точно както в QuizApp – през QuizSession
+        session.current_index = index
+        if session.current_question["type"] == "choice":
+            entry = session.answer_choice(answer)
+        else:
+            entry = session.answer_text(answer)
+        return {"index": index, "id": entry["id"], "accepted": True}
+
+    def finish_session(self, sid: str, session: QuizSession, body: dict) -> dict:
+        finished_at = body.get("finished_at")
+        if session.finish() and self.results is not None:
+            if isinstance(finished_at, (int, float)):
+                # времето на предаване е от компютъра на ученика
+                session.finished_at = float(finished_at)
+            time_spent = body.get("time_spent")
+            if isinstance(time_spent, dict):
+                # навигацията е на клиента – и времето на въпросите е оттам
+                for qid in session.question_ids:
+                    seconds = time_spent.get(str(qid))
+                    if isinstance(seconds, (int, float)):
+                        session.time_spent[qid] = float(seconds)
+            info = self.sessions.info(sid)
+            client = body.get("client")
+            # uid = id на сесията – повторена заявка не дублира резултата
+            self.results.record(session, info["grade"], info["subject"], uid=sid,
+                                client=str(client) if client else None)
+        return self.session_result(session)
+
+    def session_result(self, session: QuizSession) -> dict:
+        result = {
+            "finished": session.finished_at is not None,
+            "total_questions": session.total_questions,
+            "answered": len(session.answers),
+        }
+        if result["finished"]:
+            result.update({
+                "correct_answers": session.correct_answers,
+                "percent": session.percent,
+                "answers": session.answers_log,
+            })
+        return result
+
+    # ---------------- HTTP ----------------
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, {"error": "Заглавията са твърде дълги."}, False)
+                    break
+
+                keep_alive = await self._serve_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        except asyncio.CancelledError:
+            # спиране на сървъра при отворени връзки
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _serve_request(self, head: bytes, reader, writer) -> bool:
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            method, path, version = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    key, value = line.split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+        except ValueError:
+            await self._respond(writer, 400, {"error": "Невалидна заявка."}, False)
+            return False
+
+        keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+        try:
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                raise HttpError(413, "Заявката е твърде голяма.")
+            raw = await reader.readexactly(length) if length else b""
+            body = json.loads(raw.decode("utf-8")) if raw else None
+            if body is not None and not isinstance(body, dict):
+                raise HttpError(400, "Очаквам JSON обект.")
+
+            status, payload = await self.handle(method, path, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+            if e.status == 413:
+                keep_alive = False
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload, keep_alive = 400, {"error": "Невалидно тяло на заявката."}, False
+        except Exception as e:
+            print(f"lab_server: {method} {path}: {e!r}", file=sys.stderr)
+            status, payload = 500, {"error": "Вътрешна грешка на сървъра."}
+
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _respond(self, writer, status: int, payload, keep_alive: bool):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.serve_connection, host, port, limit=MAX_HEADER_BYTES)
+
+
+async def serve(questions_path: str, results_path: str, host: str, port: int):
+    server = await LabServer(questions_path, results_path).start(host, port)
+    addresses = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+    print(f"Сървърът слуша на {addresses} (въпроси от {questions_path}, резултати в {results_path})")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None) -> int:
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="адрес (0.0.0.0 – за всички компютри в кабинета)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--questions", default=os.path.join(root, "questions"),
+                        help="папка с банките (по подразбиране questions/)")
+    parser.add_argument("--results", default=default_path(root),
+                        help="база с резултатите (по подразбиране results/results.sqlite3)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.questions, args.results, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # изчакваме записа на последните резултати
+        close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,16 @@
 import sys
+import time
+
+# --profile-startup: (име, секунди от началото на main.py)
+STARTUP_T0 = time.perf_counter()
+startup_marks = []
+
+
+def mark_startup(name: str):
+    startup_marks.append((name, time.perf_counter() - STARTUP_T0))
+
+
 import os
-import json
-import random
 
 from PySide6.QtWidgets import (
     QApplication,
@@ -17,10 +26,22 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QScrollArea,
 )
-from PySide6.QtGui import QFont, QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QPainter, QColor, QPixmap
+from PySide6.QtCore import Qt, QTimer
+
+mark_startup("import PySide6")
+
+from quiz_session import QuizSession
+from bank_cache import bank_cache, BankWatcher
+from image_cache import (
+    pixmap_cache,
+    ImagePrefetcher,
+    MAX_IMAGE_WIDTH,
+    MAX_IMAGE_HEIGHT,
+    CACHE_DIR_NAME,
+)
 
-from PIL import Image
+mark_startup("import quiz_session, image_cache")
 
 
 GRADE_DISPLAY = {
@@ -35,6 +56,37 @@ GRADE_DISPLAY = {
     "12": "XII"
 }
 
+BACKGROUND_COLOR = "#3a4046"
+
+# за колко въпроса напред да се декодират картинките във фонов режим
+PREFETCH_AHEAD = 2
+
+
+class QuestionScreen:
+    """
+    Widgets на екрана с въпрос. Създават се веднъж от
+    QuizApp.build_question_screen и се преизползват при всяка навигация.
+    """
+
+    def __init__(self):
+        self.header = None
+        self.question_panel = None
+        self.scroll = None
+        self.q_label = None
+        self.img_label = None
+        self.choice_panel = None
+        self.option_buttons = []
+        self.text_panel = None
+        self.answer_input = None
+        self.feedback_label = None
+        self.btn_container = None
+        self.next_button = None
+
+        # (widget, stretch, alignment) в реда, в който влизат в main_layout
+        self.choice_layout = []
+        self.text_layout = []
+        self.widgets = []
+
 
 class QuizApp(QMainWindow):
     def __init__(self):
@@ -46,19 +98,22 @@ class QuizApp(QMainWindow):
         self.base_path = os.path.dirname(os.path.abspath(__file__))
         self.questions_path = os.path.join(self.base_path, "questions")
         self.images_path = os.path.join(self.base_path, "images")
+        # адрес на lab_server.py (--server); None – въпросите се четат локално
+        self.server_url = None
 
         # състояние
         self.grade = None
         self.category = None
-        self.questions = []          # избраните въпроси за теста
-        self.current_question = None
-        self.current_index = -1      # индекс на текущия въпрос
-        self.correct_answers = 0
-        self.total_questions = 0
-
-        # лог на отговорите за преглед след края
-        self.answers_log = []        # тук пазим всеки въпрос + отговорите
+        # въпросите, навигацията, отговорите и точките са в QuizSession;
+        # QuizApp само ги показва
+        self.session = QuizSession([])
         self.review_index = 0        # текущ индекс в режим преглед
+        # файлът за продължаване след срив (само за локален тест)
+        self.snapshot = None
+        # следи questions/ и държи bank_cache актуален (при първия локален тест)
+        self.bank_watcher = None
+        # правилата от selection.json по банка – до следващата промяна в папката
+        self._selection_specs = {}
 
         # флаг за текстов въпрос – дали вече е проверен (за текущия престой на екрана)
         self._text_already_checked = False
@@ -77,9 +132,9 @@ class QuizApp(QMainWindow):
         self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
 
         # прозрачен фон, за да се вижда background-а
-        self.main_widget.setStyleSheet("background-color: transparent;")
-        self.scroll_area.setStyleSheet("background: transparent; border: none;")
-        self.scroll_area.viewport().setStyleSheet("background: transparent;")
+        self.main_widget.setProperty("transparent", True)
+        self.scroll_area.setProperty("transparent", True)
+        self.scroll_area.viewport().setProperty("transparent", True)
 
         self.setCentralWidget(self.scroll_area)
 
@@ -90,83 +145,141 @@ class QuizApp(QMainWindow):
         self.check_button = None
         self.option_buttons = []
 
-        # background
+        # екранът с въпрос се строи веднъж (build_question_screen) и после
+        # само се обновява; тук помним кой вариант (choice/text) е показан
+        self.question_screen = None
+        self._shown_question_type = None
+
+        # картинки, които още се декодират: key -> QLabel
+        self._pending_images = {}
+        self.image_prefetcher = ImagePrefetcher(pixmap_cache, self)
+        self.image_prefetcher.image_ready.connect(self._on_image_ready)
+        self.image_prefetcher.image_failed.connect(self._on_image_failed)
+        self.image_prefetcher.background_ready.connect(self._on_background_ready)
+
+        # background – готов pixmap, рисуван в paintEvent; зарежда се във
+        # фонов режим, за да се покаже първият екран веднага
+        self._bg_pixmap = None
+        self.background_pending = False
         self.apply_background()
 
         # стил на рамки и бутони
         self.panel_color = "rgba(69, 90, 100, 200)"   # рамка
         self.header_color = "rgba(69, 90, 100, 200)"  # header
 
-        self.button_style = """
-            QPushButton {
+        # целият стил е в един общ stylesheet на приложението; widgets само
+        # получават свойства (role, variant, selected...), по които се избира
+        QApplication.instance().setStyleSheet(self.build_stylesheet())
+
+        self.show_grade_screen()
+
+    # -------------------------------------------------------
+    #  стил
+    # -------------------------------------------------------
+    def build_stylesheet(self) -> str:
+        return f"""
+            *[transparent="true"] {{
+                background-color: transparent;
+                border: none;
+            }}
+
+            QFrame[role="panel"] {{
+                background-color: {self.panel_color};
+                border-radius: 26px;
+            }}
+            QFrame[role="header"] {{
+                background-color: {self.header_color};
+                border-radius: 26px;
+            }}
+            QLabel[role="light"] {{
+                color: white;
+                background-color: transparent;
+            }}
+
+            QPushButton[variant="default"] {{
                 background-color: rgba(241, 245, 249, 190);
                 color: #1f2933;
                 border-radius: 18px;
                 padding: 8px 16px;
-            }
-            QPushButton:hover {
+            }}
+            QPushButton[variant="default"]:hover {{
                 background-color: rgba(222, 231, 241, 210);
-            }
+            }}
             /* да не посивява текста, когато е disabled */
-            QPushButton:disabled {
+            QPushButton[variant="default"]:disabled {{
                 background-color: rgba(241, 245, 249, 190);
                 color: #1f2933;
-            }
-        """
+            }}
+            /* избран отговор – само се сменя свойството selected */
+            QPushButton[variant="default"][selected="true"] {{
+                background-color: rgba(59, 130, 246, 230);
+                color: white;
+            }}
+            QPushButton[variant="default"][selected="true"]:hover {{
+                background-color: rgba(37, 99, 235, 240);
+            }}
 
-        self.primary_button_style = """
-            QPushButton {
+            QPushButton[variant="primary"] {{
                 background-color: rgba(52, 152, 219, 200);
                 color: white;
                 border-radius: 18px;
                 padding: 10px 22px;
-            }
-            QPushButton:hover {
+            }}
+            QPushButton[variant="primary"]:hover {{
                 background-color: rgba(41, 128, 185, 210);
-            }
-            QPushButton:disabled {
+            }}
+            QPushButton[variant="primary"]:disabled {{
                 background-color: rgba(52, 152, 219, 120);
                 color: rgba(255, 255, 255, 220);
-            }
-        """
+            }}
 
-        self.danger_button_style = """
-            QPushButton {
+            QPushButton[variant="danger"] {{
                 background-color: rgba(231, 76, 60, 200);
                 color: white;
                 border-radius: 18px;
                 padding: 10px 22px;
-            }
-            QPushButton:hover {
+            }}
+            QPushButton[variant="danger"]:hover {{
                 background-color: rgba(192, 57, 43, 210);
-            }
-        """
+            }}
 
-        self.success_button_style = """
-            QPushButton {
+            QPushButton[variant="success"] {{
                 background-color: rgba(39, 174, 96, 200);
                 color: white;
                 border-radius: 18px;
                 padding: 10px 22px;
-            }
-            QPushButton:hover {
+            }}
+            QPushButton[variant="success"]:hover {{
                 background-color: rgba(30, 132, 73, 210);
-            }
-        """
-        
-        self.selected_button_style = """
-            QPushButton {
-                background-color: rgba(59, 130, 246, 230);
+            }}
+
+            QLineEdit[role="answer"] {{
+                background-color: rgba(241, 245, 249, 190);
+                border-radius: 12px;
+                padding: 6px 10px;
+                border: 1px solid rgba(255, 255, 255, 80);
+                color: black;
+            }}
+
+            /* "Вашият отговор" в режим преглед */
+            QLabel[role="verdict"] {{
+                background-color: rgba(192, 57, 43, 200);
                 color: white;
-                border-radius: 18px;
-                padding: 8px 16px;
-            }
-            QPushButton:hover {
-                background-color: rgba(37, 99, 235, 240);
-            }
+                border-radius: 14px;
+                padding: 8px 12px;
+            }}
+            QLabel[role="verdict"][correct="true"] {{
+                background-color: rgba(39, 174, 96, 200);
+            }}
         """
 
-        self.show_grade_screen()
+    def set_selected(self, btn: QPushButton, selected: bool):
+        # сменяме свойството и преизчисляваме стила само на този бутон
+        if btn.property("selected") == selected:
+            return
+        btn.setProperty("selected", selected)
+        btn.style().unpolish(btn)
+        btn.style().polish(btn)
 
     # -------------------------------------------------------
     #  background
@@ -175,20 +288,37 @@ class QuizApp(QMainWindow):
         bg_path = os.path.join(self.images_path, "background.jpg")
         if not os.path.exists(bg_path):
             print("background.jpg не е намерен!")
-            self.setStyleSheet("QMainWindow { background-color: #3a4046; }")
+            self._bg_pixmap = None
+            self.update()
             return
 
-        bg_path_css = bg_path.replace("\\", "/")
-        print("BG PATH CSS:", bg_path_css)
+        # декодираме веднъж, смалено точно до екрана (с кеш на диска за тази
+        # резолюция), в работна нишка; после paintEvent само копира pixmap-а
+        screen = self.screen()
+        size = screen.geometry().size()
+        cache_dir = os.path.join(self.images_path, CACHE_DIR_NAME)
 
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-image: url("{bg_path_css}");
-                background-position: center;
-                background-repeat: no-repeat;
-                background-color: #3a4046;
-            }}
-        """)
+        self.background_pending = True
+        self.image_prefetcher.load_background(
+            bg_path, size.width(), size.height(), screen.devicePixelRatio(), cache_dir
+        )
+
+    def _on_background_ready(self, img):
+        self.background_pending = False
+        self._bg_pixmap = QPixmap.fromImage(img) if not img.isNull() else None
+        self.update()
+        mark_startup("фонът е зареден")
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), QColor(BACKGROUND_COLOR))
+        if self._bg_pixmap is not None:
+            # центрирано, както беше background-position: center
+            pix_size = self._bg_pixmap.deviceIndependentSize()
+            x = (self.width() - pix_size.width()) / 2
+            y = (self.height() - pix_size.height()) / 2
+            painter.drawPixmap(round(x), round(y), self._bg_pixmap)
+        painter.end()
 
     # -------------------------------------------------------
     #  UI
@@ -197,7 +327,12 @@ class QuizApp(QMainWindow):
         while self.main_layout.count():
             item = self.main_layout.takeAt(0)
             widget = item.widget()
-            if widget is not None:
+            if widget is None:
+                continue
+            if self.question_screen is not None and widget in self.question_screen.widgets:
+                # екранът с въпрос се преизползва – само го скриваме
+                widget.hide()
+            else:
                 widget.deleteLater()
 
         self.answer_input = None
@@ -206,36 +341,31 @@ class QuizApp(QMainWindow):
         self.check_button = None
         self.option_buttons = []
         self._text_already_checked = False
+        self._pending_images = {}
+        self._shown_question_type = None
 
     def create_header(self, text: str):
+        header = self.make_header(text)
+        self.main_layout.addWidget(header, 0, Qt.AlignHCenter | Qt.AlignTop)
+
+    def make_header(self, text: str) -> QFrame:
         header = QFrame()
-        header.setStyleSheet(f"""
-            QFrame {{
-                background-color: {self.header_color};
-                border-radius: 26px;
-            }}
-        """)
+        header.setProperty("role", "header")
         header_layout = QHBoxLayout(header)
         header_layout.setContentsMargins(30, 10, 30, 10)
 
         label = QLabel(text)
-        label.setStyleSheet("color: white; background-color: transparent;")
+        label.setProperty("role", "light")
         label.setFont(QFont("Helvetica", 26, QFont.Bold))
 
         header_layout.addStretch()
         header_layout.addWidget(label)
         header_layout.addStretch()
-
-        self.main_layout.addWidget(header, 0, Qt.AlignHCenter | Qt.AlignTop)
+        return header
 
     def create_panel(self, fixed_width: int = None, fixed_height: int = None) -> QFrame:
         panel = QFrame()
-        panel.setStyleSheet(f"""
-            QFrame {{
-                background-color: {self.panel_color};
-                border-radius: 26px;
-            }}
-        """)
+        panel.setProperty("role", "panel")
         if fixed_width is not None:
             panel.setFixedWidth(fixed_width)
         if fixed_height is not None:
@@ -258,13 +388,14 @@ class QuizApp(QMainWindow):
     ) -> QPushButton:
         btn = QPushButton(text)
         if danger:
-            btn.setStyleSheet(self.danger_button_style)
+            btn.setProperty("variant", "danger")
         elif primary:
-            btn.setStyleSheet(self.primary_button_style)
+            btn.setProperty("variant", "primary")
         elif success:
-            btn.setStyleSheet(self.success_button_style)
+            btn.setProperty("variant", "success")
         else:
-            btn.setStyleSheet(self.button_style)
+            btn.setProperty("variant", "default")
+            btn.setProperty("selected", False)
 
         font = QFont("Helvetica", font_size, QFont.Bold)
         btn.setFont(font)
@@ -357,35 +488,86 @@ class QuizApp(QMainWindow):
     # -------------------------------------------------------
     def load_questions(self, category: str):
         self.category = category
-        filename = f"{self.grade}_{self.category}.json"
-        filepath = os.path.join(self.questions_path, filename)
+        if self.server_url:
+            self.load_remote_questions()
+            return
 
-        if not os.path.exists(filepath):
+        self.watch_banks()
+        # вече зареденият предмет идва от кеша, без четене от диска
+        filepath, bank = bank_cache.find(self.questions_path, self.grade, self.category)
+        filename = os.path.basename(filepath)
+
+        if bank is None and not os.path.exists(filepath):
             QMessageBox.critical(self, "Грешка", f"Файлът {filename} липсва!")
             return
 
+        spec = self.selection_spec(filename)
+
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                all_questions = json.load(f)
-        except json.JSONDecodeError:
+            exclude = ()
+            if spec.exclude_recent:
+                from results_store import recent_question_hashes, default_path
+                from selection import selector_for
+
+                recent = recent_question_hashes(default_path(self.base_path), self.grade, self.category,
+                                                sessions=spec.exclude_recent)
+                if recent:
+                    # отпечатъците -> сегашните id-та в банката
+                    selector = bank.selector if bank is not None else selector_for(filepath)
+                    exclude = selector.ids_for_hashes(recent)
+
+            if bank is not None:
+                session = QuizSession.from_cached(bank, spec=spec, exclude=exclude)
+            else:
+                # индексът над JSON-а дава достъп до отделни въпроси – четем
+                # само избраните (до 10), а не цялата банка; за следващия
+                # тест банката се зарежда в кеша във фонов режим
+                session = QuizSession.from_bank(filepath, spec=spec, exclude=exclude)
+                self.bank_watcher.preload(filepath)
+        except ValueError:
             QMessageBox.critical(self, "Грешка", f"{filename} е с грешен JSON!")
             return
 
-        if not all_questions:
+        if session.total_questions == 0:
             QMessageBox.critical(self, "Грешка", "Файлът е празен!")
             return
 
-        # нов тест -> чистим старите отговори
-        self.answers_log = []
-        self.current_question = None
-        self.current_index = -1
+        self.start_session(session)
+        self.open_snapshot()
+
+    def watch_banks(self):
+        if self.bank_watcher is not None:
+            return
+        self.bank_watcher = BankWatcher(bank_cache, self.questions_path, self)
+        self.bank_watcher.folder_changed.connect(lambda _folder: self._selection_specs.clear())
+
+    def selection_spec(self, filename: str):
+        spec = self._selection_specs.get(filename)
+        if spec is None:
+            from selection import load_spec
 
-        # взимаме до 10 въпроса
-        self.questions = random.sample(all_questions, min(10, len(all_questions)))
-        random.shuffle(self.questions)
-        self.correct_answers = 0
-        self.total_questions = len(self.questions)
+            spec = load_spec(self.questions_path, filename)
+            # без следене на папката не бихме разбрали за промяна в selection.json
+            if self.bank_watcher.watching:
+                self._selection_specs[filename] = spec
+        return spec
 
+    def load_remote_questions(self):
+        from lab_client import RemoteSession
+
+        try:
+            session = RemoteSession.start(self.server_url, self.grade, self.category)
+        except OSError as e:
+            QMessageBox.critical(self, "Грешка", f"Няма връзка със сървъра:\n{e}")
+            return
+        self.start_session(session)
+
+    def start_session(self, session: QuizSession):
+        # нов тест -> нова сесия, старите отговори отпадат
+        self.session = session
+        self.close_snapshot()
+
+        self.image_prefetcher.cancel_pending()
         self.next_question()
         
     # -----------------------------------------------------
@@ -394,70 +576,168 @@ class QuizApp(QMainWindow):
     
     def update_next_button_label(self):
         if self.next_button:
-            if self.current_index == len(self.questions) - 1:
+            if self.session.is_last:
                 self.next_button.setText("ПРЕДАЙ")
             else:
                 self.next_button.setText("НАПРЕД")
 
 
     # -------------------------------------------------------
-    #  Показване на текущия въпрос
+    #  Екран с въпрос – строи се веднъж и после само се обновява
     # -------------------------------------------------------
-    def show_current_question(self):
-        self.clear_central()
-
-        if self.current_index < 0 or self.current_index >= len(self.questions):
-            self.show_final_screen()
-            return
-
-        self.current_question = self.questions[self.current_index]
+    def build_question_screen(self) -> QuestionScreen:
+        screen = QuestionScreen()
 
-        self.create_header("Въпрос")
+        screen.header = self.make_header("Въпрос")
 
-        text = self.current_question["question"]
-        has_image = bool(self.current_question.get("image"))
-
-        question_panel = self.create_panel(fixed_width=1000)
-        q_layout = question_panel.layout()
+        screen.question_panel = self.create_panel(fixed_width=1000)
+        q_layout = screen.question_panel.layout()
 
         # scroll за въпроса + картинката
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         scroll.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        scroll.setStyleSheet("""
-            QScrollArea {
-                background-color: transparent;
-                border: none;
-            }
-        """)
-        scroll.viewport().setStyleSheet("background-color: transparent;")
+        scroll.setProperty("transparent", True)
+        scroll.viewport().setProperty("transparent", True)
 
         inner = QWidget()
-        inner.setStyleSheet("background-color: transparent;")
+        inner.setProperty("transparent", True)
         inner_layout = QVBoxLayout(inner)
         inner_layout.setContentsMargins(0, 0, 0, 0)
         inner_layout.setSpacing(10)
 
-        q_label = QLabel(text)
-        q_label.setStyleSheet("color: white; background-color: transparent;")
-        q_label.setWordWrap(True)
-        q_label.setAlignment(Qt.AlignCenter)
-        q_label.setFont(QFont("Helvetica", 20, QFont.Bold))
-        inner_layout.addWidget(q_label)
+        screen.q_label = QLabel()
+        screen.q_label.setProperty("role", "light")
+        screen.q_label.setWordWrap(True)
+        screen.q_label.setAlignment(Qt.AlignCenter)
+        screen.q_label.setFont(QFont("Helvetica", 20, QFont.Bold))
+        inner_layout.addWidget(screen.q_label)
 
-        if has_image:
-            img_label = self.create_image_label(self.current_question["image"])
-            if img_label is not None:
-                inner_layout.addWidget(img_label, 0, Qt.AlignCenter)
+        screen.img_label = QLabel()
+        screen.img_label.setAlignment(Qt.AlignCenter)
+        screen.img_label.setProperty("transparent", True)
+        inner_layout.addWidget(screen.img_label, 0, Qt.AlignCenter)
 
         scroll.setWidget(inner)
-        scroll.setFixedHeight(150 if not has_image else 245) # когато имаме картинка рамката се разширява, за да поберем 800х200
-
+        screen.scroll = scroll
         q_layout.addWidget(scroll)
-        self.main_layout.addWidget(question_panel, 0, Qt.AlignHCenter | Qt.AlignTop)
 
-        if self.current_question["type"] == "choice":
+        # панел с 4 отговора (за choice)
+        screen.choice_panel = self.create_panel(fixed_width=950, fixed_height=150)
+        grid = QGridLayout()
+        grid.setHorizontalSpacing(18)
+        grid.setVerticalSpacing(10)
+        screen.choice_panel.layout().addLayout(grid)
+
+        for i in range(4):
+            def handler(i=i):
+                self.mark_answer(screen.option_buttons[i].text())
+
+            btn = self.create_button_widget("", handler, font_size=16)
+            btn.setMinimumHeight(40)
+            grid.addWidget(btn, i // 2, i % 2)
+            screen.option_buttons.append(btn)
+
+        # панел с поле за отговор (за text)
+        screen.text_panel = self.create_panel(fixed_width=950, fixed_height=150)
+
+        screen.answer_input = QLineEdit()
+        screen.answer_input.setPlaceholderText("Моля въведете верният отговор")
+        screen.answer_input.setFont(QFont("Helvetica", 18))
+        screen.answer_input.setProperty("role", "answer")
+        screen.text_panel.layout().addWidget(screen.answer_input)
+
+        # feedback рамка – не я ползваме за верния отговор, но е оставена за бъдещи съобщения
+        screen.feedback_label = QLabel()
+        screen.feedback_label.setWordWrap(True)
+        screen.feedback_label.setAlignment(Qt.AlignCenter)
+        screen.feedback_label.setFont(QFont("Helvetica", 16, QFont.Bold))
+        screen.feedback_label.setFixedHeight(70)
+        screen.feedback_label.setProperty("transparent", True)
+
+        # ред с бутони НАЗАД / НАПРЕД
+        btn_row = QHBoxLayout()
+        btn_row.setSpacing(20)
+
+        back_btn = self.create_button_widget(
+            "НАЗАД", self.prev_question, danger=True, font_size=16
+        )
+        screen.next_button = self.create_button_widget(
+            "НАПРЕД", self.on_next_clicked, primary=True, font_size=16
+        )
+
+        btn_row.addWidget(back_btn)
+        btn_row.addWidget(screen.next_button)
+
+        screen.btn_container = QWidget()
+        screen.btn_container.setLayout(btn_row)
+
+        # отделни готови подредби за двата вида въпроси
+        screen.choice_layout = [
+            (screen.header, 0, Qt.AlignHCenter | Qt.AlignTop),
+            (screen.question_panel, 0, Qt.AlignHCenter | Qt.AlignTop),
+            (screen.choice_panel, 0, Qt.AlignHCenter | Qt.AlignVCenter),
+            (screen.btn_container, 0, Qt.AlignHCenter | Qt.AlignBottom),
+        ]
+        screen.text_layout = [
+            (screen.header, 0, Qt.AlignHCenter | Qt.AlignTop),
+            (screen.question_panel, 0, Qt.AlignHCenter | Qt.AlignTop),
+            (screen.text_panel, 0, Qt.AlignHCenter | Qt.AlignVCenter),
+            (screen.feedback_label, 0, Qt.AlignHCenter),
+            (screen.btn_container, 0, Qt.AlignHCenter | Qt.AlignBottom),
+        ]
+        screen.widgets = [
+            screen.header, screen.question_panel, screen.choice_panel,
+            screen.text_panel, screen.feedback_label, screen.btn_container,
+        ]
+        for widget in screen.widgets:
+            widget.hide()
+
+        return screen
+
+    # -------------------------------------------------------
+    #  Показване на текущия въпрос
+    # -------------------------------------------------------
+    def show_current_question(self):
+        question = self.session.current_question
+        if question is None:
+            self.show_final_screen()
+            return
+
+        self.prefetch_images()
+
+        if self.question_screen is None:
+            self.question_screen = self.build_question_screen()
+        screen = self.question_screen
+
+        qtype = "choice" if question["type"] == "choice" else "text"
+        if self._shown_question_type != qtype:
+            # друг екран или друг вид въпрос – подреждаме готовите widgets
+            self.clear_central()
+            layout = screen.choice_layout if qtype == "choice" else screen.text_layout
+            for widget, stretch, alignment in layout:
+                self.main_layout.addWidget(widget, stretch, alignment)
+                widget.show()
+            self._shown_question_type = qtype
+
+        self._pending_images = {}
+        self.next_button = screen.next_button
+
+        screen.q_label.setText(question["question"])
+
+        has_image = bool(question.get("image"))
+        screen.img_label.clear()
+        screen.img_label.setMinimumSize(0, 0)
+        if has_image and self.set_label_image(screen.img_label, question["image"]):
+            screen.img_label.show()
+        else:
+            screen.img_label.hide()
+
+        screen.scroll.setFixedHeight(150 if not has_image else 245) # когато имаме картинка рамката се разширява, за да поберем 800х200
+        screen.scroll.verticalScrollBar().setValue(0)
+
+        if qtype == "choice":
             self.show_choice_question()
         else:
             self.show_text_question()
@@ -468,155 +748,132 @@ class QuizApp(QMainWindow):
     #  Навигация: Напред / Назад
     # -------------------------------------------------------
     def next_question(self):
-        next_index = self.current_index + 1
-        if next_index >= len(self.questions):
+        if not self.session.next():
             self.show_final_screen()
             return
-        self.current_index = next_index
         self.show_current_question()
 
     def prev_question(self):
-        prev_index = self.current_index - 1
-        if prev_index < 0:
+        if not self.session.prev():
             return
-        self.current_index = prev_index
         self.show_current_question()
 
+    def on_next_clicked(self):
+        if self.session.current_question["type"] == "choice":
+            self.next_question()
+        else:
+            self.submit_text_and_next()
+
     # -------------------------------------------------------
     #  Картинка към въпрос
     # -------------------------------------------------------
     def create_image_label(self, img_name: str):
+        lbl = QLabel()
+        lbl.setAlignment(Qt.AlignCenter)
+        lbl.setProperty("transparent", True)
+        if not self.set_label_image(lbl, img_name):
+            return None
+        return lbl
+
+    def set_label_image(self, lbl: QLabel, img_name: str) -> bool:
         img_path = os.path.join(self.images_path, img_name)
         if not os.path.exists(img_path):
             QMessageBox.critical(self, "Грешка", f"Картинката '{img_name}' липсва!")
-            return None
+            return False
 
-        img = Image.open(img_path)
-        max_w = 800
-        max_h = 200
-        w, h = img.size
-        scale = min(max_w / w, max_h / h, 1.0)
-        if scale < 1.0:
-            img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-
-        tmp_path = os.path.join(self.images_path, "_temp_render.png")
-        img.save(tmp_path)
-        pix = QPixmap(tmp_path)
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+        # готовият (смален) pixmap идва от общия кеш; ако още не е декодиран,
+        # показваме празно място и го попълваме, когато фоновата нишка свърши
+        dpr = self.devicePixelRatioF()
+        key = self.image_prefetcher.request(
+            img_path, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, dpr, priority=10
+        )
+        pix = pixmap_cache.get(key) if key is not None else None
+
+        if pix is not None:
+            lbl.setPixmap(pix)
+        elif key is not None and not self.image_prefetcher.has_failed(key):
+            lbl.setMinimumSize(MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT)
+            self._pending_images[key] = lbl
+        return True
+
+    def _on_image_ready(self, key):
+        lbl = self._pending_images.pop(key, None)
+        if lbl is None:
+            return
+        pix = pixmap_cache.get(key)
+        if pix is not None:
+            lbl.setMinimumSize(0, 0)
+            lbl.setPixmap(pix)
+
+    def _on_image_failed(self, key):
+        # развалена картинка – махаме празното място, въпросът остава без нея
+        lbl = self._pending_images.pop(key, None)
+        if lbl is not None:
+            lbl.setMinimumSize(0, 0)
+
+    def prefetch_images(self):
+        """
+        Декодира във фонов режим картинките на следващите PREFETCH_AHEAD
+        въпроса (на първия въпрос – за целия тест), за да не чака навигацията.
+        """
+        index = self.session.current_index
+        questions = self.session.questions
+        if index <= 0:
+            upcoming = questions[index + 1:]
+        else:
+            upcoming = questions[index + 1:index + 1 + PREFETCH_AHEAD]
+
+        dpr = self.devicePixelRatioF()
+        for distance, q in enumerate(upcoming):
+            img_name = q.get("image")
+            if not img_name:
+                continue
+            img_path = os.path.join(self.images_path, img_name)
+            # по-близките въпроси са с по-висок приоритет
+            self.image_prefetcher.request(
+                img_path, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, dpr, priority=-distance
+            )
 
-        lbl = QLabel()
-        lbl.setPixmap(pix)
-        lbl.setAlignment(Qt.AlignCenter)
-        lbl.setStyleSheet("background-color: transparent;")
-        return lbl
-    
     # -------------------------------------------------------
     #  Въпрос с 4 отговора
     # -------------------------------------------------------
     def show_choice_question(self):
-        self.option_buttons = []
-
-        options = list(self.current_question["options"])
-        random.shuffle(options)
-
-        answers_panel = self.create_panel(fixed_width=950, fixed_height=150)
-        grid = QGridLayout()
-        grid.setHorizontalSpacing(18)
-        grid.setVerticalSpacing(10)
-        answers_panel.layout().addLayout(grid)
-
-        idx = 0
-        for r in range(2):
-            for c in range(2):
-                if idx >= len(options):
-                    break
-                opt_text = options[idx]
+        screen = self.question_screen
 
-                def handler(o=opt_text):
-                    self.mark_answer(o)
+        options = self.session.current_options()
 
-                btn = self.create_button_widget(opt_text, handler, font_size=16)
-                btn.setMinimumHeight(40)
-                grid.addWidget(btn, r, c)
-                self.option_buttons.append(btn)
-                idx += 1
-
-        self.main_layout.addWidget(answers_panel, 0, Qt.AlignHCenter | Qt.AlignVCenter)
-
-        # ред с бутони Назад / Напред
-        btn_row = QHBoxLayout()
-        btn_row.setSpacing(20)
+        self.option_buttons = []
+        for i, btn in enumerate(screen.option_buttons):
+            if i >= len(options):
+                btn.hide()
+                continue
+            btn.setText(options[i])
+            self.set_selected(btn, False)
+            btn.show()
+            self.option_buttons.append(btn)
 
-        back_btn = self.create_button_widget(
-            "НАЗАД", self.prev_question, danger=True, font_size=16
-        )
-        self.next_button = self.create_button_widget(
-            "НАПРЕД", self.next_question, primary=True, font_size=16
-        )
         self.next_button.setEnabled(False)
-        self.update_next_button_label()
-
-        btn_row.addWidget(back_btn)
-        btn_row.addWidget(self.next_button)
-
-        btn_container = QWidget()
-        btn_container.setLayout(btn_row)
-        self.main_layout.addWidget(btn_container, 0, Qt.AlignHCenter | Qt.AlignBottom)
 
         # ако вече имаме запис за този въпрос – възстановяваме избора
-        for entry in self.answers_log:
-            if entry["type"] == "choice" and entry["question"] == self.current_question["question"]:
-                saved_answer = entry["user_answer"]
-                for btn in self.option_buttons:
-                    if btn.text() == saved_answer:
-                        btn.setStyleSheet(self.selected_button_style)
-                    else:
-                        btn.setStyleSheet(self.button_style)
-                self.next_button.setEnabled(True)
-                break
+        entry = self.session.current_answer()
+        if entry is not None:
+            saved_answer = entry["user_answer"]
+            for btn in self.option_buttons:
+                self.set_selected(btn, btn.text() == saved_answer)
+            self.next_button.setEnabled(True)
 
     def mark_answer(self, selected: str):
-        correct = self.current_question["answer"]
-
-        # търсим стар запис за този въпрос
-        existing_index = None
-        for i, entry in enumerate(self.answers_log):
-            if entry["type"] == "choice" and entry["question"] == self.current_question["question"]:
-                existing_index = i
-                break
-
-        # ако има стар запис – коригираме точките
-        if existing_index is not None:
-            prev_entry = self.answers_log.pop(existing_index)
-            if prev_entry.get("was_counted"):
-                self.correct_answers -= 1
+        try:
+            self.session.answer_choice(selected)
+        except OSError as e:
+            # само при тест от сървъра (--server)
+            QMessageBox.critical(self, "Грешка", f"Отговорът не е записан:\n{e}")
+            return
+        self.snapshot_answer(selected)
 
         # визуално: само избраният отговор е син, останалите е по default
         for btn in self.option_buttons:
-            if btn.text() == selected:
-                btn.setStyleSheet(self.selected_button_style)
-            else:
-                btn.setStyleSheet(self.button_style)
-
-        is_correct = (selected.strip().lower() == correct.strip().lower())
-
-        entry = {
-            "type": "choice",
-            "question": self.current_question["question"],
-            "correct": correct,
-            "user_answer": selected,
-            "image": self.current_question.get("image"),
-            "was_counted": False
-        }
-
-        if is_correct:
-            self.correct_answers += 1
-            entry["was_counted"] = True
-
-        self.answers_log.append(entry)
+            self.set_selected(btn, btn.text() == selected)
 
         if self.next_button:
             self.next_button.setEnabled(True)
@@ -625,119 +882,131 @@ class QuizApp(QMainWindow):
     #  Въпрос със свободен текст
     # -------------------------------------------------------
     def show_text_question(self):
-        panel = self.create_panel(fixed_width=950, fixed_height=150)
-        layout = panel.layout()
+        screen = self.question_screen
 
-        self.answer_input = QLineEdit()
-        self.answer_input.setPlaceholderText("Моля въведете верният отговор")
-        self.answer_input.setFont(QFont("Helvetica", 18))
-        self.answer_input.setStyleSheet("""
-            QLineEdit {
-                background-color: rgba(241, 245, 249, 190);
-                border-radius: 12px;
-                padding: 6px 10px;
-                border: 1px solid rgba(255, 255, 255, 80);
-                color: black;
-            }
-        """)
-        layout.addWidget(self.answer_input)
+        self.answer_input = screen.answer_input
+        self.answer_input.clear()
+        self.answer_input.setEnabled(True)
 
-        self.main_layout.addWidget(panel, 0, Qt.AlignHCenter | Qt.AlignVCenter)
-
-        # feedback рамка – не я ползваме за верния отговор, но е оставена за бъдещи съобщения
-        self.feedback_label = QLabel()
+        self.feedback_label = screen.feedback_label
         self.feedback_label.setVisible(False)
-        self.feedback_label.setWordWrap(True)
-        self.feedback_label.setAlignment(Qt.AlignCenter)
-        self.feedback_label.setFont(QFont("Helvetica", 16, QFont.Bold))
-        self.feedback_label.setFixedHeight(70)
-        self.feedback_label.setStyleSheet("background-color: transparent;")
-        self.main_layout.addWidget(self.feedback_label, 0, Qt.AlignHCenter)
-
-        # ред с бутони НАЗАД / НАПРЕД
-        btn_row = QHBoxLayout()
-        btn_row.setSpacing(20)
-
-        back_btn = self.create_button_widget(
-            "НАЗАД", self.prev_question, danger=True, font_size=16
-        )
-        self.next_button = self.create_button_widget(
-            "НАПРЕД", self.submit_text_and_next, primary=True, font_size=16
-        )
-        
-        self.update_next_button_label()
-
-        btn_row.addWidget(back_btn)
-        btn_row.addWidget(self.next_button)
-
-        btn_container = QWidget()
-        btn_container.setLayout(btn_row)
-        self.main_layout.addWidget(btn_container, 0, Qt.AlignHCenter | Qt.AlignBottom)
 
+        self.next_button.setEnabled(True)
         self._text_already_checked = False
 
         # ако вече има отговор за този въпрос – попълваме полето
-        for entry in self.answers_log:
-            if entry["type"] == "text" and entry["question"] == self.current_question["question"]:
-                self.answer_input.setText(entry["user_answer"])
-                break
+        entry = self.session.current_answer()
+        if entry is not None:
+            self.answer_input.setText(entry["user_answer"])
 
     def submit_text_and_next(self):
         if not self._text_already_checked:
-            self.check_text_answer()
+            if not self.check_text_answer():
+                return
             self._text_already_checked = True
         self.next_question()
 
-    def check_text_answer(self):
+    def check_text_answer(self) -> bool:
         if not self.answer_input:
-            return
-
-        user_raw = self.answer_input.text().strip()
-        user = user_raw.lower()
-        placeholder = "моля въведете верният отговор"
-        if user == placeholder:
-            user = ""
+            return False
 
-        correct_raw = self.current_question["answer"].strip()
-        correct = correct_raw.lower()
+        try:
+            self.session.answer_text(self.answer_input.text())
+        except OSError as e:
+            # само при тест от сървъра (--server) – ученикът може да опита пак
+            QMessageBox.critical(self, "Грешка", f"Отговорът не е записан:\n{e}")
+            return False
+        self.snapshot_answer(self.answer_input.text())
 
         self.answer_input.setEnabled(False)
 
         if getattr(self, "check_button", None):
             self.check_button.setEnabled(False)
+        return True
 
-        is_correct = (user == correct)
-
-        # търсим стар запис за този въпрос
-        existing_index = None
-        for i, entry in enumerate(self.answers_log):
-            if entry["type"] == "text" and entry["question"] == self.current_question["question"]:
-                existing_index = i
-                break
+    # -------------------------------------------------------
+    #  Продължаване след срив
+    # -------------------------------------------------------
+    def open_snapshot(self):
+        """Записва плана на новия тест – отговорите се добавят след всеки избор."""
+        from session_snapshot import SessionSnapshot, snapshot_path
 
-        # ако има стар запис – коригираме точките
-        if existing_index is not None:
-            prev_entry = self.answers_log.pop(existing_index)
-            prev_correct = prev_entry["correct"].strip().lower()
-            prev_user = prev_entry["user_answer"].strip().lower()
-            if prev_user == prev_correct:
-                self.correct_answers -= 1
+        try:
+            self.snapshot = SessionSnapshot.create(snapshot_path(self.base_path), self.session,
+                                                   self.grade, self.category)
+        except OSError as e:
+            # тестът върви и без файла – само не може да се продължи след срив
+            print(f"Тестът няма да може да се продължи след срив: {e}", file=sys.stderr)
+
+    def snapshot_answer(self, answer: str):
+        if self.snapshot is None:
+            return
+        try:
+            self.snapshot.answer(self.session, answer)
+        except OSError as e:
+            print(f"Отговорът не е записан за продължаване: {e}", file=sys.stderr)
+            self.close_snapshot()
 
-        if is_correct:
-            self.correct_answers += 1
+    def close_snapshot(self, discard: bool = False):
+        if self.snapshot is None:
+            return
+        try:
+            if discard:
+                self.snapshot.discard()
+            else:
+                self.snapshot.close()
+        except OSError as e:
+            print(f"session.snapshot: {e}", file=sys.stderr)
+        self.snapshot = None
+
+    def resume_snapshot(self) -> bool:
+        """Ако предишният тест не е предаден – продължава го оттам, докъдето е стигнал."""
+        from session_snapshot import SessionSnapshot, load_snapshot, snapshot_path
+
+        path = snapshot_path(self.base_path)
+        if not os.path.exists(path):
+            return False
+        restored = load_snapshot(path)
+        if restored is None:
+            return False
+
+        session, self.grade, self.category = restored
+        self.start_session(session)
+        try:
+            self.snapshot = SessionSnapshot.reopen(path)
+        except OSError as e:
+            print(f"session.snapshot: {e}", file=sys.stderr)
+        return True
 
-        self.answers_log.append({
-            "type": "text",
-            "question": self.current_question["question"],
-            "correct": correct_raw,
-            "user_answer": user_raw,
-            "image": self.current_question.get("image")
-        })
+    # -------------------------------------------------------
+    #  Запис на резултата
+    # -------------------------------------------------------
+    def save_results(self):
+        """Записва предадения тест на заден план – екранът не чака диска."""
+        uid = None
+        if self.server_url:
+            try:
+                self.session.submit()
+                return
+            except OSError as e:
+                # верните отговори са само на сървъра – локално остават отговорите без оценка
+                print(f"Резултатът не е изпратен към сървъра ({e}) – записва се локално.", file=sys.stderr)
+            # същият uid – ако после се обединят базите, тестът не се дублира
+            uid = self.session.session_id
+
+        from results_store import store_for, default_path
+
+        store_for(default_path(self.base_path)).record(self.session, self.grade, self.category, uid=uid)
 
     # -------------------------------------------------------
     #  Финален екран
     # -------------------------------------------------------
     def show_final_screen(self):
+        # финалният екран се показва и след преглед – записваме само веднъж
+        if self.session.finish():
+            self.save_results()
+            self.close_snapshot(discard=True)
+
         self.clear_central()
 
         self.create_header("Резултат")
@@ -745,19 +1014,14 @@ class QuizApp(QMainWindow):
         panel = self.create_panel(fixed_width=600, fixed_height=180)
         layout = panel.layout()
 
-        label = QLabel(f"Верни отговори: {self.correct_answers} / {self.total_questions}")
-        label.setStyleSheet("color: white; background-color: transparent;")
+        label = QLabel(f"Верни отговори: {self.session.correct_answers} / {self.session.total_questions}")
+        label.setProperty("role", "light")
         label.setFont(QFont("Helvetica", 26, QFont.Bold))
         label.setAlignment(Qt.AlignCenter)
         layout.addWidget(label)
 
-        if self.total_questions > 0:
-            percent = round((self.correct_answers / self.total_questions) * 100)
-        else:
-            percent = 0
-
-        percent_label = QLabel(f"Успеваемост: {percent}%")
-        percent_label.setStyleSheet("color: white; background-color: transparent;")
+        percent_label = QLabel(f"Успеваемост: {self.session.percent}%")
+        percent_label.setProperty("role", "light")
         percent_label.setFont(QFont("Helvetica", 22, QFont.Bold))
         percent_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(percent_label)
@@ -792,7 +1056,7 @@ class QuizApp(QMainWindow):
     #  Режим: преглед на въпросите
     # -------------------------------------------------------
     def start_review_mode(self):
-        if not self.answers_log:
+        if not self.session.review_order:
             QMessageBox.information(self, "Преглед", "Няма запазени въпроси за преглед.")
             return
 
@@ -802,8 +1066,9 @@ class QuizApp(QMainWindow):
     def show_review_question(self):
         self.clear_central()
 
-        total = len(self.answers_log)
-        item = self.answers_log[self.review_index]
+        review_order = self.session.review_order
+        total = len(review_order)
+        item = self.session.answers[review_order[self.review_index]]
 
         self.create_header(f"Преглед на въпросите ({self.review_index + 1} / {total})")
 
@@ -815,22 +1080,17 @@ class QuizApp(QMainWindow):
         scroll.setWidgetResizable(True)
         scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         scroll.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        scroll.setStyleSheet("""
-            QScrollArea {
-                background-color: transparent;
-                border: none;
-            }
-        """)
-        scroll.viewport().setStyleSheet("background-color: transparent;")
+        scroll.setProperty("transparent", True)
+        scroll.viewport().setProperty("transparent", True)
 
         inner = QWidget()
-        inner.setStyleSheet("background-color: transparent;")
+        inner.setProperty("transparent", True)
         inner_layout = QVBoxLayout(inner)
         inner_layout.setContentsMargins(0, 0, 0, 0)
         inner_layout.setSpacing(10)
 
         q_label = QLabel(item["question"])
-        q_label.setStyleSheet("color: white; background-color: transparent;")
+        q_label.setProperty("role", "light")
         q_label.setWordWrap(True)
         q_label.setAlignment(Qt.AlignCenter)
         q_label.setFont(QFont("Helvetica", 20, QFont.Bold))
@@ -848,33 +1108,21 @@ class QuizApp(QMainWindow):
 
         # вашият отговор
         user_answer = item.get("user_answer", "").strip()
-        correct = item.get("correct", "").strip()
+        # None – тест от сървъра, чийто резултат не е получен
+        correct = (item.get("correct") or "").strip()
 
-        if item["type"] == "choice":
-            is_correct = item.get("was_counted", False)
-        else:
-            is_correct = (user_answer.lower() == correct.lower())
-
-        if is_correct:
-            bg = "rgba(39, 174, 96, 200)"
-        else:
-            bg = "rgba(192, 57, 43, 200)"
+        is_correct = item.get("was_counted", False)
 
+        # зелено/червено идва от общия stylesheet според свойството correct
         user_label = QLabel(f"Вашият отговор: {user_answer or '—'}")
-        user_label.setStyleSheet(f"""
-            QLabel {{
-                background-color: {bg};
-                color: white;
-                border-radius: 14px;
-                padding: 8px 12px;
-            }}
-        """)
+        user_label.setProperty("role", "verdict")
+        user_label.setProperty("correct", bool(is_correct))
         user_label.setAlignment(Qt.AlignCenter)
         user_label.setWordWrap(True)
         layout.addWidget(user_label)
 
         correct_label = QLabel(f"Верен отговор: {correct}")
-        correct_label.setStyleSheet("color: white; background-color: transparent;")
+        correct_label.setProperty("role", "light")
         correct_label.setFont(QFont("Helvetica", 18, QFont.Bold))
         correct_label.setAlignment(Qt.AlignCenter)
         correct_label.setWordWrap(True)
@@ -923,13 +1171,63 @@ class QuizApp(QMainWindow):
             self.show_review_question()
 
     def next_review_question(self):
-        if self.review_index < len(self.answers_log) - 1:
+        if self.review_index < len(self.session.review_order) - 1:
             self.review_index += 1
             self.show_review_question()
 
 
+def print_startup_profile():
+    print("Профил на стартирането (секунди от началото на main.py):")
+    prev = 0.0
+    for name, t in startup_marks:
+        print(f"  {t:7.3f} s  (+{(t - prev) * 1000:7.1f} ms)  {name}")
+        prev = t
+
+
 if __name__ == "__main__":
+    profile_startup = "--profile-startup" in sys.argv
+    if profile_startup:
+        sys.argv.remove("--profile-startup")
+
+    # --server http://адрес:порт – тестовете идват от lab_server.py
+    server_url = None
+    if "--server" in sys.argv:
+        i = sys.argv.index("--server")
+        server_url = sys.argv[i + 1] if i + 1 < len(sys.argv) else None
+        del sys.argv[i:i + 2]
+
     app = QApplication(sys.argv)
+    mark_startup("QApplication")
     window = QuizApp()
+    window.server_url = server_url
+    if not server_url and window.resume_snapshot():
+        mark_startup("незавършеният тест е възстановен")
+
+    def flush_results():
+        window.close_snapshot()
+        if window.bank_watcher is not None:
+            window.bank_watcher.stop()
+        # резултатите се записват в отделна нишка – изчакваме я преди изход
+        results_store = sys.modules.get("results_store")
+        if results_store is not None:
+            results_store.close_all(timeout=10)
+
+    app.aboutToQuit.connect(flush_results)
+    mark_startup("QuizApp() – екранът за избор на клас е построен")
     window.show()
+
+    if profile_startup:
+        def report_when_ready():
+            # чакаме и фона, за да се види колко закъснява след първия екран
+            if window.background_pending:
+                QTimer.singleShot(10, report_when_ready)
+            else:
+                print_startup_profile()
+
+        def on_first_screen():
+            mark_startup("първият екран е показан")
+            report_when_ready()
+
+        QTimer.singleShot(0, on_first_screen)
+
     sys.exit(app.exec())
\ No newline at end of file
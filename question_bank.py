@@ -0,0 +1,725 @@
+import os
+import re
+import json
+import math
+import array
+import codecs
+import hashlib
+import random
+import itertools
+import struct
+
+
+# Компилиран индекс над questions/*.json
+# ---------------------------------------
+# Индексът е отделен файл questions/.index/<име>.json.idx с фиксиран размер
+# на записите – за всеки въпрос (offset, length) в байтове в JSON файла.
+# Така за теста четем само k-те избрани въпроса, без да парсваме целия файл.
+# Индексът се прави наново автоматично, ако размерът или mtime на JSON-а се
+# сменят.
+
+INDEX_DIR = ".index"
+INDEX_MAGIC = b"QIDX0001"
+_HEADER = struct.Struct("<8sQqQ")     # magic, размер на JSON, mtime_ns, брой въпроси
+_RECORD = struct.Struct("<QQ")        # offset, length
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+# Банката се чете на парчета по STREAM_CHUNK байта (виж iter_records).
+# Въпрос, по-дълъг от MAX_RECORD_CHARS символа, се смята за грешен JSON –
+# иначе повреден файл би се чел в паметта докрай.
+STREAM_CHUNK = 1 << 20
+MAX_RECORD_CHARS = 16 << 20
+
+# Банките са questions/<клас>_<предмет>.json; може и .jsonl (JSON Lines –
+# по един въпрос на ред), напр. изнесени от друга система.
+BANK_EXTENSIONS = (".json", ".jsonl")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+# Журнал на промените
+# -------------------
+# Редакторът не презаписва цялата банка при всяка малка промяна, а добавя
+# редове в <име>.json.journal (JSON Lines). Първият ред е {"base": [размер,
+# mtime_ns], "hash": ...} на основния файл – промените са по индекси, затова
+# ако основният файл е сменен след това (git pull, копиране), журналът е
+# остарял и се пренебрегва. Следващите редове са промените:
+#   {"op": "add", "question": {...}}
+#   {"op": "set", "index": 3, "question": {...}}
+#   {"op": "del", "index": 3}
+# След COMPACT_AFTER_OPS промени журналът се слива обратно в основния файл.
+JOURNAL_SUFFIX = ".journal"
+COMPACT_AFTER_OPS = 500
+
+
+def index_path_for(json_path: str) -> str:
+    folder, name = os.path.split(os.path.abspath(json_path))
+    return os.path.join(folder, INDEX_DIR, name + ".idx")
+
+
+class _Stream:
+    """
+    Текстът на файла на парчета: в buf е само непрочетената част (плюс
+    текущото парче). byte_pos е позицията на buf[pos] във файла в байтове.
+    """
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.byte_pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Добавя още едно парче; False, ако файлът е свършил."""
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """Първият символ след интервалите ("" в края на файла)."""
+        while True:
+            pos = _WHITESPACE_RE.match(self.buf, self.pos).end()
+            # интервалите и разделителите са ASCII – символ = байт
+            self.byte_pos += pos - self.pos
+            self.pos = pos
+            if pos < len(self.buf):
+                return self.buf[pos]
+            if not self.fill():
+                return ""
+
+    def take(self):
+        """Пропуска един (ASCII) разделител."""
+        self.pos += 1
+        self.byte_pos += 1
+
+    def decode_object(self, decoder: json.JSONDecoder):
+        """(offset, length, обект) за JSON стойността от текущата позиция."""
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+                break
+            except json.JSONDecodeError:
+                # недочетен обект – още едно парче; ако и така не става,
+                # JSON-ът наистина е грешен
+                if len(self.buf) - self.pos > MAX_RECORD_CHARS or not self.fill():
+                    raise
+        length = len(self.buf[self.pos:end].encode("utf-8"))
+        offset = self.byte_pos
+        self.byte_pos += length
+        self.pos = end
+        return offset, length, obj
+
+
+def iter_records(json_path: str, chunk_size: int = STREAM_CHUNK):
+    """
+    Минава веднъж през банката и дава (offset, length, въпрос) за всеки
+    въпрос (offset/length са в байтове във файла). Чете парче по парче –
+    в паметта е само текущото парче, колкото и голям да е файлът.
+    Разпознава JSON масив и JSON Lines (по един въпрос на ред).
+    Хвърля ValueError (json.JSONDecodeError) при грешен JSON.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_path, "rb") as f:
+        stream = _Stream(f, chunk_size)
+        first = stream.peek()
+        if first == "{":
+            lines = True
+        elif first == "[":
+            lines = False
+            stream.take()
+        elif first == "" and json_path.endswith(JSONL_EXTENSIONS):
+            return
+        else:
+            raise ValueError("Файлът няма валиден формат (очаквам списък).")
+
+        count = 0
+        if not lines and stream.peek() == "]":
+            stream.take()
+        else:
+            while True:
+                offset, length, obj = stream.decode_object(decoder)
+                count += 1
+                if not isinstance(obj, dict):
+                    raise ValueError(f"Елемент {count} не е обект.")
+                yield offset, length, obj
+
+                c = stream.peek()
+                if lines:
+                    if c == "":
+                        return
+                    continue
+                if c == ",":
+                    stream.take()
+                    stream.peek()
+                    continue
+                if c == "]":
+                    stream.take()
+                    break
+                raise json.JSONDecodeError("Очаквам ',' или ']'", stream.buf, stream.pos)
+
+        if stream.peek() != "":
+            raise json.JSONDecodeError("Излишни данни след края на масива", stream.buf, stream.pos)
+
+
+def iter_questions(json_path: str):
+    """Въпросите от банката един по един (без журнала) – виж iter_records."""
+    for _, _, question in iter_records(json_path):
+        yield question
+
+
+def sample_stream(json_path: str, k: int, rng=random) -> list:
+    """
+    k случайни въпроса [(индекс, въпрос), ...] с един проход през файла
+    (reservoir sampling, алгоритъм L) – без индекс и без цялата банка в
+    паметта. За папки, в които индексът не може да се запише.
+    """
+    reservoir = []
+    if k <= 0:
+        return reservoir
+    records = iter_records(json_path)
+    for i, (_, _, question) in enumerate(records):
+        reservoir.append((i, question))
+        if i + 1 == k:
+            break
+
+    # следващият въпрос, който влиза в извадката, е след skip пропуснати;
+    # 1 - random() е в (0, 1] – логаритъмът е определен
+    i = k - 1
+    w = math.exp(math.log(1.0 - rng.random()) / k)
+    while len(reservoir) == k:
+        skip = int(math.log(1.0 - rng.random()) / math.log(1.0 - w)) if w < 1.0 else 0
+        record = next(itertools.islice(records, skip, None), None)
+        if record is None:
+            break
+        i += skip + 1
+        reservoir[rng.randrange(k)] = (i, record[2])
+        w *= math.exp(math.log(1.0 - rng.random()) / k)
+
+    records.close()
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+def _build_index(json_path: str, index_path: str, st: os.stat_result):
+    """
+    Прави индекса с един проход през файла, като пише записите направо в
+    .idx – паметта не расте с размера на банката. OSError, ако папката е
+    само за четене.
+    """
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = index_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns, 0))
+            count = 0
+            for off, length, _ in iter_records(json_path):
+                f.write(_RECORD.pack(off, length))
+                count += 1
+            f.seek(0)
+            f.write(_HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns, count))
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, index_path)
+
+
+class BankIndex:
+    """
+    Достъп на случаен принцип до въпросите в един JSON файл.
+    Използва се като context manager:
+
+        with BankIndex.open(path) as bank:
+            questions = bank.sample(10)
+    """
+
+    def __init__(self, json_path: str, index_file=None, count: int = 0, offsets=None):
+        self.json_path = json_path
+        self._index_file = index_file     # отворен .idx файл или None
+        self._offsets = offsets           # array (offset, length, ...) в паметта, ако .idx не може да се запише
+        self._count = count
+        self._json_file = None
+
+    @classmethod
+    def open(cls, json_path: str, in_memory: bool = True) -> "BankIndex":
+        """
+        Отваря индекса (и при нужда го прави). Ако папката е само за четене
+        (напр. мрежово споделяне) – индекс в паметта за този процес, а с
+        in_memory=False – None.
+        """
+        st = os.stat(json_path)
+        index_path = index_path_for(json_path)
+
+        f, count = cls._open_fresh_index(index_path, st)
+        if f is not None:
+            return cls(json_path, index_file=f, count=count)
+
+        try:
+            _build_index(json_path, index_path, st)
+            f, count = cls._open_fresh_index(index_path, st)
+        except OSError:
+            f = None
+        if f is not None:
+            return cls(json_path, index_file=f, count=count)
+
+        if not in_memory:
+            return None
+        offsets = array.array("Q")
+        for off, length, _ in iter_records(json_path):
+            offsets.append(off)
+            offsets.append(length)
+        return cls(json_path, offsets=offsets, count=len(offsets) // 2)
+
+    @staticmethod
+    def _open_fresh_index(index_path: str, st: os.stat_result):
+        """Връща (отворен файл, брой въпроси) или (None, 0), ако индексът липсва или е стар."""
+        try:
+            f = open(index_path, "rb")
+        except OSError:
+            return None, 0
+        header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            magic, size, mtime, count = _HEADER.unpack(header)
+            if magic == INDEX_MAGIC and size == st.st_size and mtime == st.st_mtime_ns:
+                return f, count
+        f.close()
+        return None, 0
+
+    def __len__(self):
+        return self._count
+
+    def _record(self, i: int):
+        if self._offsets is not None:
+            return self._offsets[2 * i], self._offsets[2 * i + 1]
+        self._index_file.seek(_HEADER.size + i * _RECORD.size)
+        return _RECORD.unpack(self._index_file.read(_RECORD.size))
+
+    def read(self, i: int) -> dict:
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._read_at(*self._record(i))
+
+    def _read_at(self, off: int, length: int) -> dict:
+        if self._json_file is None:
+            self._json_file = open(self.json_path, "rb")
+        self._json_file.seek(off)
+        return json.loads(self._json_file.read(length))
+
+    def sample(self, k: int, rng=random) -> list:
+        """k случайни въпроса (без повторение), в случаен ред."""
+        return [q for _, q in self.sample_indexed(k, rng)]
+
+    def sample_indexed(self, k: int, rng=random) -> list:
+        """
+        Като sample, но връща [(индекс в банката, въпрос), ...]. Индексът е
+        стабилен идентификатор на въпроса, докато файлът не се промени.
+        """
+        picked = rng.sample(range(self._count), min(k, self._count))
+        result = self.read_indexed(picked)
+        rng.shuffle(result)
+        return result
+
+    def read_indexed(self, ids) -> list:
+        """[(индекс, въпрос), ...] за дадените индекси, в реда им на диска."""
+        records = sorted((self._record(i), i) for i in ids)   # четем подред по диска
+        return [(i, self._read_at(off, length)) for (off, length), i in records]
+
+    def close(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        if self._json_file is not None:
+            self._json_file.close()
+            self._json_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sample_list(questions, k: int, rng=random) -> list:
+    """
+    Като BankIndex.sample_indexed, но от въпроси в паметта – при същото rng
+    изборът е същият, както и да е заредена банката.
+    """
+    picked = sorted(rng.sample(range(len(questions)), min(k, len(questions))))
+    result = [(i, questions[i]) for i in picked]
+    rng.shuffle(result)
+    return result
+
+
+def sample_questions(json_path: str, k: int, rng=random) -> list:
+    """
+    Връща до k случайни въпроса от банката, като декодира само тях.
+    При грешен JSON хвърля ValueError.
+    """
+    return [q for _, q in sample_questions_with_ids(json_path, k, rng)]
+
+
+def sample_questions_with_ids(json_path: str, k: int, rng=random) -> list:
+    """Като sample_questions, но връща [(индекс в банката, въпрос), ...]."""
+    ops = read_journal(json_path)
+    if ops:
+        # индексът описва само основния файл – с журнал зареждаме всичко
+        return sample_list(load_bank(json_path), k, rng)
+
+    bank = BankIndex.open(json_path, in_memory=False)
+    if bank is None:
+        # индексът не може да се запише – един проход, без банката в паметта
+        return sample_stream(json_path, k, rng)
+    with bank:
+        return bank.sample_indexed(k, rng)
+
+
+# -------------------------------------------------------
+#  Правила за един въпрос
+# -------------------------------------------------------
+QUESTION_TYPES = ("choice", "text")
+
+# полетата, от които зависи отговорът – за question_hash
+_HASHED_FIELDS = ("type", "question", "options", "answer", "accepted", "image")
+
+
+def question_hash(question: dict) -> str:
+    """
+    Отпечатък на съдържанието на въпроса. id-то е само мястото в банката –
+    след изтриване или вмъкване в редактора под същото id е друг въпрос;
+    по отпечатъка се разбира дали записан резултат е за същия въпрос.
+    """
+    fields = [question.get(k) for k in _HASHED_FIELDS]
+    raw = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def validate_question(raw: dict):
+    """
+    Проверява един въпрос по правилата на редактора и го връща във формата
+    на банката. Резултат: (въпрос, None) или (None, съобщение за грешка).
+    Ползва се от QuestionDialog и от масовия импорт.
+    """
+    qtype = raw.get("type") or "choice"
+    if qtype not in QUESTION_TYPES:
+        return None, f"Непознат тип „{qtype}“ (очаквам choice или text)."
+
+    image = raw.get("image")
+    image = "" if image is None else str(image).strip()
+
+    # въпрос само с картинка е позволен (виж questions/primer.md)
+    question = raw.get("question")
+    if not isinstance(question, str) or not (question.strip() or image):
+        return None, "Моля въведете въпрос."
+
+    answer = raw.get("answer")
+    answer = "" if answer is None else str(answer).strip()
+    if not answer:
+        return None, "Моля въведете верния отговор."
+
+    data = {
+        "type": qtype,
+        "question": question,
+        "answer": answer,
+    }
+
+    if qtype == "choice":
+        options = raw.get("options") or []
+        if not isinstance(options, list):
+            return None, "Вариантите трябва да са списък."
+        options = [str(o).strip() for o in options if o is not None and str(o).strip()]
+        if len(options) < 2:
+            return None, "Моля въведете поне 2 възможни отговора."
+        if answer not in options:
+            return None, "Верният отговор трябва да съвпада с един от вариантите."
+        data["options"] = options
+
+    if qtype == "text":
+        # други верни отговори (списък или текст, разделен с |)
+        accepted = raw.get("accepted") or []
+        if isinstance(accepted, str):
+            accepted = accepted.split("|")
+        if not isinstance(accepted, list):
+            return None, "Другите верни отговори трябва да са списък."
+        accepted = [str(a).strip() for a in accepted if a is not None and str(a).strip()]
+        accepted = [a for a in dict.fromkeys(accepted) if a != answer]
+        if accepted:
+            data["accepted"] = accepted
+
+    if image:
+        data["image"] = image
+
+    # теми и тегло за избора на въпроси (виж selection.py)
+    tags = raw.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, list):
+        return None, "Темите трябва да са списък."
+    tags = list(dict.fromkeys(str(t).strip() for t in tags if t is not None and str(t).strip()))
+    if tags:
+        data["tags"] = tags
+
+    weight = raw.get("weight")
+    if weight is not None and weight != "":
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            return None, "Теглото трябва да е число."
+        if weight < 0:
+            return None, "Теглото не може да е отрицателно."
+        if weight != 1:
+            data["weight"] = int(weight) if weight.is_integer() else weight
+
+    return data, None
+
+
+# -------------------------------------------------------
+#  Зареждане и запис на цялата банка
+# -------------------------------------------------------
+def bank_path(questions_path: str, grade: str, category: str) -> str:
+    """Файлът на банката (.json или .jsonl); ако няма – пътят към .json."""
+    base = os.path.join(questions_path, f"{grade}_{category}")
+    for ext in BANK_EXTENSIONS:
+        if os.path.exists(base + ext):
+            return base + ext
+    return base + BANK_EXTENSIONS[0]
+
+
+def bank_stamp(json_path: str) -> tuple:
+    """((размер, mtime_ns) на файла, същото за журнала) – None за липсващ файл."""
+    stamp = []
+    for path in (json_path, journal_path_for(json_path)):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def journal_path_for(json_path: str) -> str:
+    return json_path + JOURNAL_SUFFIX
+
+
+def _fsync_dir(folder: str):
+    # преименуването е окончателно едва когато и папката е записана;
+    # под Windows папка не може да се отвори – там просто пропускаме
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def load_bank(json_path: str) -> list:
+    """
+    Целият списък с въпроси заедно с промените от журнала.
+    Хвърля ValueError при грешен JSON или ако файлът не е списък.
+    """
+    if json_path.endswith(JSONL_EXTENSIONS):
+        questions = list(iter_questions(json_path))
+    else:
+        with open(json_path, "rb") as f:
+            data = f.read()
+            # файлът и без това е прочетен целият – отпечатъкът за журнала е даром
+            _remember_hash(json_path, os.fstat(f.fileno()), hashlib.blake2b(data, digest_size=16).hexdigest())
+        questions = json.loads(data)
+        del data
+        if not isinstance(questions, list):
+            raise ValueError("Файлът няма валиден формат (очаквам списък).")
+
+    apply_journal(questions, read_journal(json_path))
+    return questions
+
+
+def is_compact_file(json_path: str) -> bool:
+    """Дали файлът е записан без отстъпи (write_bank(..., compact=True))."""
+    with open(json_path, "rb") as f:
+        head = f.read(2)
+    return head[1:2] not in (b"\n", b"\r")
+
+
+def write_bank(json_path: str, questions: list, compact: bool = False):
+    """
+    Записва цялата банка безопасно: временен файл + fsync + os.replace.
+    При срив по време на запис старият файл остава непокътнат. Журналът
+    вече е слят в questions и се изтрива.
+    """
+    folder = os.path.dirname(os.path.abspath(json_path))
+    os.makedirs(folder, exist_ok=True)
+
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        out = _HashingWriter(f)
+        if compact:
+            json.dump(questions, out, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(questions, out, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+        st = os.fstat(f.fileno())
+    os.replace(tmp_path, json_path)
+    _fsync_dir(folder)
+    # току-що записаният файл не се чете наново заради журнала
+    _remember_hash(json_path, st, out.hash.hexdigest())
+
+    # ако тук има срив, журналът остава, но base вече не съвпада с новия
+    # файл и read_journal ще го пренебрегне
+    try:
+        os.remove(journal_path_for(json_path))
+    except FileNotFoundError:
+        pass
+
+
+class BankChangedError(ValueError):
+    """Основният файл е сменен, след като банката е заредена."""
+
+
+class _HashingWriter:
+    """Текстов изход за json.dump, който смята и отпечатъка на записаните байтове."""
+
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def write(self, text: str):
+        # като текстов файл: "\n" става os.linesep
+        data = text.replace("\n", os.linesep).encode("utf-8")
+        self.f.write(data)
+        self.hash.update(data)
+
+
+# път -> ((размер, mtime_ns), отпечатък) – файлът се хешира веднъж за версия
+_file_hashes = {}
+
+
+def _remember_hash(json_path: str, st, digest: str):
+    _file_hashes[os.path.abspath(json_path)] = ((st.st_size, st.st_mtime_ns), digest)
+
+
+def _file_hash(json_path: str, st) -> str:
+    """Отпечатъкът на файла с този os.stat – чете файла само ако не е помнен."""
+    key = os.path.abspath(json_path)
+    cached = _file_hashes.get(key)
+    if cached is not None and cached[0] == (st.st_size, st.st_mtime_ns):
+        return cached[1]
+    h = hashlib.blake2b(digest_size=16)
+    with open(json_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+        st = os.fstat(f.fileno())
+    _remember_hash(json_path, st, h.hexdigest())
+    return h.hexdigest()
+
+
+def journal_base(json_path: str) -> dict:
+    """Заглавният ред на журнала за текущата версия на основния файл."""
+    st = os.stat(json_path)
+    return {"base": [st.st_size, st.st_mtime_ns], "hash": _file_hash(json_path, st)}
+
+
+def read_journal(json_path: str) -> list:
+    """
+    Промените от журнала или [], ако няма журнал или е остарял.
+    Недописан ред (срив по време на запис) се пропуска.
+    """
+    path = journal_path_for(json_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        st = os.stat(json_path)
+    except OSError:
+        return []
+
+    try:
+        header = json.loads(lines[0])
+        base = header["base"]
+        # по-старите журнали нямат hash – за тях стига размерът и mtime
+        expected_hash = header.get("hash")
+    except (IndexError, ValueError, KeyError, TypeError, AttributeError):
+        return []
+    if base != [st.st_size, st.st_mtime_ns] or (
+            expected_hash is not None and expected_hash != _file_hash(json_path, st)):
+        print(f"Журналът {path} е по-стар от банката – пренебрегва се.")
+        return []
+
+    ops = []
+    for line in lines[1:]:
+        try:
+            op = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(op, dict) and op.get("op") in ("add", "set", "del"):
+            ops.append(op)
+    return ops
+
+
+def apply_journal(questions: list, ops: list) -> list:
+    """
+    Прилага промените подред върху списъка (на място).
+    Хвърля ValueError, ако промяна не пасва на списъка.
+    """
+    for op in ops:
+        kind = op["op"]
+        try:
+            if kind == "add":
+                questions.append(op["question"])
+            elif kind == "set":
+                questions[op["index"]] = op["question"]
+            elif kind == "del":
+                del questions[op["index"]]
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f"Грешна промяна в журнала: {op}")
+    return questions
+
+
+def append_journal(json_path: str, ops: list, base: dict = None):
+    """
+    Добавя промените в журнала и прави fsync. Основният файл трябва да
+    съществува – журналът се отнася към неговата текуща версия.
+
+    base е journal_base() на версията, от която са индексите в ops – ако
+    файлът е сменен оттогава, хвърля BankChangedError и не пише нищо.
+    """
+    path = journal_path_for(json_path)
+    st = os.stat(json_path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    # първо размерът и mtime – хешът трябва само ако те съвпадат
+    if base is not None and (base["base"] != stamp or base["hash"] != _file_hash(json_path, st)):
+        raise BankChangedError(f"Файлът {json_path} е променен след зареждането.")
+    header = json.dumps({"base": stamp, "hash": _file_hash(json_path, st)})
+
+    try:
+        with open(path, "rb") as f:
+            first = f.readline().rstrip(b"\r\n")
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1))
+            last = f.read(1)
+    except FileNotFoundError:
+        first, last = b"", b""
+
+    # няма журнал или е за друга версия на файла – почваме нов
+    fresh = first != header.encode("utf-8")
+
+    with open(path, "w" if fresh else "a", encoding="utf-8", newline="\n") as f:
+        if fresh:
+            f.write(header + "\n")
+        elif last != b"\n":
+            # недописан ред от срив – новите промени почват на нов ред
+            f.write("\n")
+        for op in ops:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
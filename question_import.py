@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import re
+
+from question_bank import validate_question, JSONL_EXTENSIONS
+
+
+# Масов импорт на въпроси от CSV или JSON Lines
+# ----------------------------------------------
+# Файлът се чете ред по ред (без да се зарежда целият в паметта) и всеки ред
+# минава през validate_question – същите правила като в QuestionDialog.
+#
+# CSV: първият ред са заглавията на колоните. Разпознават се (на английски
+# или български):
+#   question / въпрос, answer / отговор, type / тип, image / картинка,
+#   options / варианти (разделени с |), option1..N / вариант1..N,
+#   accepted / други отговори (други верни свободни отговори, разделени с |),
+#   tags / теми (разделени със запетая), weight / тегло
+# Ако няма колона type, въпрос с варианти е choice, а без – text.
+#
+# JSON Lines (.jsonl): всеки ред е един въпрос във формата на JSON банката.
+
+# през колко реда се съобщава напредъкът
+PROGRESS_EVERY = 500
+
+_HEADER_ALIASES = {
+    "question": "question", "въпрос": "question",
+    "answer": "answer", "отговор": "answer", "верен отговор": "answer",
+    "type": "type", "тип": "type",
+    "image": "image", "картинка": "image",
+    "options": "options", "варианти": "options",
+    "accepted": "accepted", "други отговори": "accepted",
+    "tags": "tags", "теми": "tags",
+    "weight": "weight", "тегло": "weight",
+}
+_OPTION_RE = re.compile(r"^(?:option|вариант)\s*(\d+)$")
+
+
+def _column_key(header: str) -> str:
+    name = (header or "").strip().lower()
+    m = _OPTION_RE.match(name)
+    if m:
+        return f"option{int(m.group(1)):03d}"
+    return _HEADER_ALIASES.get(name, name)
+
+
+def _csv_row_to_raw(row: dict) -> dict:
+    options = []
+    if row.get("options"):
+        options.extend(row["options"].split("|"))
+    # option001, option002... – подредени по номер
+    for key in sorted(k for k in row if k and k.startswith("option") and k != "options"):
+        options.append(row[key] or "")
+
+    qtype = (row.get("type") or "").strip().lower()
+    if not qtype:
+        qtype = "choice" if any(o.strip() for o in options) else "text"
+
+    return {
+        "type": qtype,
+        "question": (row.get("question") or "").strip(),
+        "answer": row.get("answer"),
+        "options": options,
+        "accepted": row.get("accepted"),
+        "image": row.get("image"),
+        "tags": row.get("tags"),
+        "weight": (row.get("weight") or "").strip() or None,
+    }
+
+
+def _iter_csv(f):
+    sample = f.read(64 * 1024)
+    f.seek(0)
+    try:
+        # Excel с български настройки пише ; вместо ,
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(f, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    keys = [_column_key(h) for h in header]
+    if "question" not in keys:
+        raise ValueError("Липсва колона „question“ (или „въпрос“).")
+
+    for cells in reader:
+        if not any(c.strip() for c in cells):
+            continue
+        yield reader.line_num, _csv_row_to_raw(dict(zip(keys, cells)))
+
+
+def _iter_jsonl(f):
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Грешен JSON: {e}"
+            continue
+        if not isinstance(obj, dict):
+            yield line_no, "Редът не е JSON обект."
+            continue
+        yield line_no, obj
+
+
+def import_questions(path: str, progress=None, cancelled=None):
+    """
+    Чете файла и връща (въпроси, грешки), където грешки е списък от
+    (номер на ред, съобщение). progress(прочетени байтове, общо байтове)
+    се вика периодично; ако cancelled() върне True, четенето спира.
+    Хвърля OSError/ValueError, ако файлът изобщо не може да се прочете.
+    """
+    total = os.path.getsize(path)
+    is_jsonl = path.lower().endswith(JSONL_EXTENSIONS)
+
+    questions = []
+    errors = []
+
+    # utf-8-sig – Excel слага BOM в началото на CSV файла
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        rows = _iter_jsonl(f) if is_jsonl else _iter_csv(f)
+        for n, (line_no, raw) in enumerate(rows, 1):
+            if isinstance(raw, str):
+                errors.append((line_no, raw))
+            else:
+                data, error = validate_question(raw)
+                if error:
+                    errors.append((line_no, error))
+                else:
+                    questions.append(data)
+
+            if n % PROGRESS_EVERY == 0:
+                if cancelled is not None and cancelled():
+                    break
+                if progress is not None:
+                    progress(f.buffer.tell(), total)
+
+    if progress is not None:
+        progress(total, total)
+    return questions, errors
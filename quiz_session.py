@@ -0,0 +1,293 @@
+import time
+import random
+
+from question_bank import sample_questions_with_ids, sample_list
+from answer_matcher import compile_bank
+
+
+# брой въпроси в един тест
+QUESTIONS_PER_TEST = 10
+
+# текстът в празното поле не се брои за отговор
+TEXT_PLACEHOLDER = "моля въведете верният отговор"
+
+# версия на формата от QuizSession.plan()
+PLAN_VERSION = 1
+
+
+def new_seed() -> int:
+    """Случайно зърно за тест (63 бита – събира се в INTEGER на SQLite)."""
+    return random.SystemRandom().getrandbits(63)
+
+
+class QuizSession:
+    """
+    Един опит за решаване на тест – без Qt. Държи избраните въпроси,
+    навигацията, отговорите и точките. QuizApp само показва състоянието
+    му; същият обект може да се ползва от сървър, пакетна проверка или
+    симулации.
+
+    Целият тест е решен предварително (план): въпросите, редът им и редът
+    на вариантите. plan() го връща като JSON, а from_plan() възстановява
+    същия тест – за продължаване след срив и за проверка на проведен тест.
+    """
+
+    def __init__(self, questions: list, question_ids: list = None, rng=None,
+                 seed: int = None, option_orders: list = None):
+        self.questions = list(questions)
+        # стабилен id на всеки въпрос (индекс в банката)
+        self.question_ids = list(question_ids) if question_ids is not None else list(range(len(self.questions)))
+        # зърното, от което е изтеглен тестът (None – не е от from_bank)
+        self.seed = seed
+        self.rng = rng or random.Random(seed)
+        # верните свободни отговори – нормализирани веднъж, не при всяка проверка
+        self.matchers = compile_bank(self.questions)
+        # редът на вариантите – един и същ при всяко показване на въпроса
+        self.option_orders = option_orders if option_orders is not None else self._shuffle_options()
+
+        self.current_index = -1
+        self.correct_answers = 0
+        # дали was_counted/correct_answers са истинската оценка (виж RemoteSession)
+        self.scored = True
+
+        self.answers = {}            # id на въпроса -> въпрос + отговорите
+        self.review_order = []       # id-та по реда на първия отговор
+
+        self.finished_at = None      # time.time() при предаване на теста
+
+        # секунди, прекарани на всеки въпрос (id -> сума от всички посещения)
+        self.time_spent = {}
+        self._shown_at = None
+
+    @classmethod
+    def from_bank(cls, json_path: str, count: int = QUESTIONS_PER_TEST, rng=None,
+                  spec=None, exclude=(), seed: int = None) -> "QuizSession":
+        """
+        Нов тест с до count случайни въпроса от JSON банката – или по
+        правилата в spec (selection.SelectionSpec), без exclude, ако може.
+        Теглата на въпросите ("weight") се спазват и без spec.
+        Със същото seed, банка и правила се получава същият тест.
+        При грешен JSON хвърля ValueError.
+        """
+        from selection import SelectionSpec, select_questions, selector_for
+
+        if rng is None:
+            seed = new_seed() if seed is None else seed
+            rng = random.Random(seed)
+        if spec is None:
+            spec = SelectionSpec(count)
+        if spec.is_uniform and not exclude and not selector_for(json_path).weighted:
+            picked = sample_questions_with_ids(json_path, spec.count, rng)
+        else:
+            picked = select_questions(json_path, spec, rng, exclude)
+        return cls([q for _, q in picked], [qid for qid, _ in picked], rng, seed)
+
+    @classmethod
+    def from_cached(cls, bank, count: int = QUESTIONS_PER_TEST, rng=None,
+                    spec=None, exclude=(), seed: int = None) -> "QuizSession":
+        """
+        Като from_bank, но от банка в паметта (bank_cache.CachedBank) – без
+        четене от диска. Със същото seed се получава същият тест.
+        """
+        from selection import SelectionSpec
+
+        if rng is None:
+            seed = new_seed() if seed is None else seed
+            rng = random.Random(seed)
+        if spec is None:
+            spec = SelectionSpec(count)
+        if spec.is_uniform and not exclude and not bank.selector.weighted:
+            picked = sample_list(bank.questions, spec.count, rng)
+        else:
+            picked = [(i, bank.questions[i]) for i in bank.selector.pick(spec, rng, exclude)]
+        return cls([q for _, q in picked], [qid for qid, _ in picked], rng, seed)
+
+    @classmethod
+    def from_plan(cls, plan: dict) -> "QuizSession":
+        """Тестът от plan() – същите въпроси в същия ред, със същите варианти."""
+        if plan.get("version") != PLAN_VERSION:
+            raise ValueError(f"Непозната версия на плана: {plan.get('version')}")
+        return cls(plan["questions"], plan["question_ids"], seed=plan.get("seed"),
+                   option_orders=plan["option_orders"])
+
+    def plan(self) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            "seed": self.seed,
+            "question_ids": self.question_ids,
+            "option_orders": self.option_orders,
+            "questions": self.questions,
+        }
+
+    def _shuffle_options(self) -> list:
+        orders = []
+        for question in self.questions:
+            order = list(range(len(question.get("options") or []))) if question.get("type") == "choice" else []
+            self.rng.shuffle(order)
+            orders.append(order)
+        return orders
+
+    # -------------------------------------------------------
+    #  Състояние
+    # -------------------------------------------------------
+    @property
+    def total_questions(self) -> int:
+        return len(self.questions)
+
+    @property
+    def current_question(self):
+        if 0 <= self.current_index < len(self.questions):
+            return self.questions[self.current_index]
+        return None
+
+    @property
+    def current_question_id(self):
+        return self.question_ids[self.current_index]
+
+    @property
+    def is_last(self) -> bool:
+        return self.current_index == len(self.questions) - 1
+
+    @property
+    def percent(self) -> int:
+        if self.total_questions > 0:
+            return round((self.correct_answers / self.total_questions) * 100)
+        return 0
+
+    @property
+    def answers_log(self) -> list:
+        """Записите за всички отговорени въпроси, в реда за преглед."""
+        return [self.answers[qid] for qid in self.review_order]
+
+    def current_answer(self):
+        """Записът за текущия въпрос или None, ако още не е отговорен."""
+        return self.answers.get(self.current_question_id)
+
+    def current_options(self) -> list:
+        """Вариантите на текущия въпрос в реда от плана."""
+        options = self.current_question["options"]
+        order = self.option_orders[self.current_index]
+        if len(order) != len(options):
+            # стар план за променен въпрос – показваме вариантите както са
+            return list(options)
+        return [options[i] for i in order]
+
+    def seconds_on_current(self) -> float:
+        """Общото време на текущия въпрос досега (с това посещение)."""
+        seconds = self.time_spent.get(self.current_question_id, 0.0)
+        if self._shown_at is not None:
+            seconds += time.monotonic() - self._shown_at
+        return seconds
+
+    # -------------------------------------------------------
+    #  Навигация
+    # -------------------------------------------------------
+    def next(self) -> bool:
+        """Минава към следващия въпрос; False, ако тестът е свършил."""
+        self._leave_question()
+        if self.current_index + 1 >= len(self.questions):
+            self.current_index = len(self.questions)
+            return False
+        self.current_index += 1
+        self._shown_at = time.monotonic()
+        return True
+
+    def prev(self) -> bool:
+        if self.current_index - 1 < 0:
+            return False
+        self._leave_question()
+        self.current_index -= 1
+        self._shown_at = time.monotonic()
+        return True
+
+    def _leave_question(self):
+        if self._shown_at is not None and 0 <= self.current_index < len(self.questions):
+            qid = self.current_question_id
+            self.time_spent[qid] = self.time_spent.get(qid, 0.0) + time.monotonic() - self._shown_at
+        self._shown_at = None
+
+    # -------------------------------------------------------
+    #  Отговори и точки
+    # -------------------------------------------------------
+    def answer_choice(self, selected: str) -> dict:
+        question = self.current_question
+        correct = question["answer"]
+        qid = self.current_question_id
+
+        is_correct = (selected.strip().lower() == correct.strip().lower())
+
+        return self._record_answer(qid, {
+            "id": qid,
+            "type": "choice",
+            "question": question["question"],
+            "correct": correct,
+            "user_answer": selected,
+            "image": question.get("image"),
+            "was_counted": is_correct,
+        })
+
+    def answer_text(self, user_raw: str) -> dict:
+        question = self.current_question
+        qid = self.current_question_id
+
+        user_raw = user_raw.strip()
+        user = user_raw.lower()
+        if user == TEXT_PLACEHOLDER:
+            user = ""
+
+        correct_raw = question["answer"].strip()
+        is_correct = self.matchers[self.current_index].matches(user)
+
+        return self._record_answer(qid, {
+            "id": qid,
+            "type": "text",
+            "question": question["question"],
+            "correct": correct_raw,
+            "user_answer": user_raw,
+            "image": question.get("image"),
+            "was_counted": is_correct,
+        })
+
+    def finish(self) -> bool:
+        """
+        Отбелязва теста като предаден. True само първия път – тогава
+        резултатът се записва (финалният екран се показва и след преглед).
+        """
+        if self.finished_at is not None:
+            return False
+        self._leave_question()
+        self.finished_at = time.time()
+        return True
+
+    def replay(self, events: list):
+        """
+        Прилага записаните отговори [(индекс, отговор, секунди), ...] и
+        застава така, че next() да покаже първия неотговорен въпрос (или
+        последния, ако всички са отговорени).
+        """
+        for index, answer, seconds in events:
+            self.current_index = index
+            if self.current_question["type"] == "choice":
+                self.answer_choice(answer)
+            else:
+                self.answer_text(answer)
+            if seconds is not None:
+                self.time_spent[self.current_question_id] = float(seconds)
+        first = next((i for i, qid in enumerate(self.question_ids) if qid not in self.answers),
+                     len(self.questions) - 1)
+        self.current_index = first - 1
+        self._shown_at = None
+
+    def _record_answer(self, qid, entry: dict) -> dict:
+        # ако има стар запис – коригираме точките
+        prev_entry = self.answers.get(qid)
+        if prev_entry is not None and prev_entry["was_counted"]:
+            self.correct_answers -= 1
+        if entry["was_counted"]:
+            self.correct_answers += 1
+
+        # смяната на отговор не мести въпроса в реда за преглед
+        if prev_entry is None:
+            self.review_order.append(qid)
+        self.answers[qid] = entry
+        return entry
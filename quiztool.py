@@ -0,0 +1,230 @@
+"""
+Команди за поддръжка на банките с въпроси (без графичен интерфейс).
+
+    python quiztool.py dedupe [--threshold 0.8] [--json]
+    python quiztool.py validate [--jobs N] [--text] [--strict]
+    python quiztool.py renditions [--jobs N] [--force]
+    python quiztool.py items [--grade 4] [--category math] [--text]
+    python quiztool.py replay --grade 4 --category math --seed N [--text]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_DIR = os.path.join(ROOT, "questions")
+IMAGES_DIR = os.path.join(ROOT, "images")
+
+
+# -------------------------------------------------------
+#  dedupe
+# -------------------------------------------------------
+def cmd_dedupe(args) -> int:
+    import time
+    from dedupe import load_banks, find_duplicates, format_report
+
+    start = time.perf_counter()
+    banks = load_banks(args.questions)
+    clusters = find_duplicates(banks, threshold=args.threshold)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        json.dump({
+            "questions": sum(len(q) for q in banks.values()),
+            "threshold": args.threshold,
+            "seconds": round(elapsed, 3),
+            "clusters": clusters,
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(format_report(clusters))
+        print(f"\n({sum(len(q) for q in banks.values())} въпроса, {elapsed:.2f} s)")
+    return 0
+
+
+# -------------------------------------------------------
+#  validate
+# -------------------------------------------------------
+def cmd_validate(args) -> int:
+    import time
+    from validator import validate_all
+
+    start = time.perf_counter()
+    report = validate_all(args.questions, args.images, jobs=args.jobs)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+
+    if args.text:
+        for x in report["issues"]:
+            where = x["file"] if x["index"] is None else f"{x['file']} №{x['index'] + 1}"
+            label = "ГРЕШКА" if x["level"] == "error" else "внимание"
+            print(f"{label:<8} {where}: {x['message']}")
+        print(f"\n{report['files']} файла, {report['questions']} въпроса, "
+              f"{report['images']} картинки: {report['errors']} грешки, "
+              f"{report['warnings']} предупреждения ({report['seconds']:.2f} s)")
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    failed = report["errors"] > 0 or (args.strict and report["warnings"] > 0)
+    return 1 if failed else 0
+
+
+# -------------------------------------------------------
+#  renditions
+# -------------------------------------------------------
+def cmd_renditions(args) -> int:
+    import time
+    from renditions import build_renditions
+
+    start = time.perf_counter()
+    result = build_renditions(args.images, jobs=args.jobs, force=args.force)
+    print(f"{result['images']} картинки: {result['rendered']} обработени, "
+          f"{result['unchanged']} без промяна, {result['removed']} стари версии изтрити "
+          f"({time.perf_counter() - start:.2f} s)")
+    for name, error in result["errors"].items():
+        print(f"ГРЕШКА   {name}: {error}")
+    return 1 if result["errors"] else 0
+
+
+# -------------------------------------------------------
+#  items
+# -------------------------------------------------------
+def cmd_items(args) -> int:
+    import time
+    from results_store import connect
+    from item_analysis import ItemStats
+    from question_bank import bank_path, load_bank
+
+    if not os.path.exists(args.results):
+        print(f"Няма база с резултати: {args.results}", file=sys.stderr)
+        return 1
+
+    def current_bank(grade, category):
+        # само резултатите за въпросите, както са в банката сега
+        path = bank_path(args.questions, grade, category)
+        try:
+            return load_bank(path)
+        except (OSError, ValueError):
+            return None
+
+    start = time.perf_counter()
+    stats = ItemStats(bank_loader=current_bank)
+    conn = connect(args.results)
+    try:
+        responses = stats.update_from_db(conn, args.grade, args.category)
+    finally:
+        conn.close()
+    report = stats.report(min_responses=args.min_responses)
+    if args.flagged:
+        report = [item for item in report if item["flags"]]
+    elapsed = time.perf_counter() - start
+
+    if args.text:
+        for item in report:
+            p = "-" if item["difficulty"] is None else f"{item['difficulty']:.2f}"
+            r = "-" if item["discrimination"] is None else f"{item['discrimination']:+.2f}"
+            print(f"{item['grade']}_{item['category']} №{item['id'] + 1:<6} "
+                  f"n={item['responses']:<6} p={p:<5} r={r:<6} {' '.join(item['flags'])}")
+        print(f"\n{len(report)} въпроса, {responses} отговора ({elapsed:.2f} s)")
+    else:
+        json.dump({"responses": responses, "seconds": round(elapsed, 3), "items": report},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0
+
+
+# -------------------------------------------------------
+#  replay
+# -------------------------------------------------------
+def cmd_replay(args) -> int:
+    from quiz_session import QuizSession
+    from selection import load_spec
+    from question_bank import bank_path
+
+    path = bank_path(args.questions, args.grade, args.category)
+    filename = os.path.basename(path)
+    if not os.path.exists(path):
+        print(f"Файлът {filename} липсва!", file=sys.stderr)
+        return 1
+
+    # същият избор като в main.py – без изключването на последните тестове,
+    # защото то зависи от резултатите към момента на теста
+    spec = load_spec(args.questions, filename)
+    try:
+        session = QuizSession.from_bank(path, spec=spec, seed=args.seed)
+    except ValueError as e:
+        print(f"{filename}: {e}", file=sys.stderr)
+        return 1
+
+    if args.text:
+        for index, question in enumerate(session.questions):
+            session.current_index = index
+            print(f"{index + 1}. [№{session.question_ids[index] + 1}] {question['question']}")
+            if question.get("type") == "choice":
+                for option in session.current_options():
+                    print(f"     {'*' if option == question['answer'] else '-'} {option}")
+            else:
+                print(f"     = {question['answer']}")
+    else:
+        json.dump(session.plan(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=QUESTIONS_DIR,
+                        help="папка с банките (по подразбиране questions/)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("dedupe", help="почти еднакви въпроси във всички банки")
+    p.add_argument("--threshold", type=float, default=0.8,
+                   help="минимално сходство (0..1), по подразбиране 0.8")
+    p.add_argument("--json", action="store_true", help="резултат като JSON")
+    p.set_defaults(func=cmd_dedupe)
+
+    p = sub.add_parser("validate", help="проверка на всички банки и картинките към тях")
+    p.add_argument("--images", default=IMAGES_DIR,
+                   help="папка с картинките (по подразбиране images/)")
+    p.add_argument("--jobs", type=int, default=None,
+                   help="брой процеси (по подразбиране – броят ядра)")
+    p.add_argument("--text", action="store_true", help="четим текст вместо JSON")
+    p.add_argument("--strict", action="store_true",
+                   help="изходен код 1 и при предупреждения")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("renditions", help="готови 1x/2x версии на картинките (800x200)")
+    p.add_argument("--images", default=IMAGES_DIR,
+                   help="папка с картинките (по подразбиране images/)")
+    p.add_argument("--jobs", type=int, default=None,
+                   help="брой процеси (по подразбиране – броят ядра)")
+    p.add_argument("--force", action="store_true", help="обработва наново всички картинки")
+    p.set_defaults(func=cmd_renditions)
+
+    p = sub.add_parser("items", help="трудност и дискриминация на въпросите по резултатите")
+    p.add_argument("--results", default=os.path.join(ROOT, "results", "results.sqlite3"),
+                   help="база с резултати (по подразбиране results/results.sqlite3)")
+    p.add_argument("--grade", help="само този клас")
+    p.add_argument("--category", help="само този предмет (bel, math...)")
+    p.add_argument("--min-responses", type=int, default=30,
+                   help="под толкова отговора въпросът не се отбелязва (30)")
+    p.add_argument("--flagged", action="store_true", help="само въпросите с предупреждения")
+    p.add_argument("--text", action="store_true", help="четим текст вместо JSON")
+    p.set_defaults(func=cmd_items)
+
+    p = sub.add_parser("replay", help="тестът, изтеглен със зърното от резултатите (sessions.seed)")
+    p.add_argument("--grade", required=True, help="клас")
+    p.add_argument("--category", required=True, help="предмет (bel, math...)")
+    p.add_argument("--seed", type=int, required=True, help="зърното на теста")
+    p.add_argument("--text", action="store_true", help="четим текст вместо JSON")
+    p.set_defaults(func=cmd_replay)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
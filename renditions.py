@@ -0,0 +1,277 @@
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Готови (смалени) версии на картинките към въпросите
+# ----------------------------------------------------
+# build_renditions() смалява всяка картинка от images/ веднъж до рамката
+# 800x200 (1x) и двойно по-голяма (2x, за HiDPI екрани) и ги записва в
+# images/.cache/renditions/ под име = хеш на съдържанието. manifest.json пази
+# за всеки файл размер + mtime + хеш, така че при следващо пускане се
+# обработват само новите или сменените картинки.
+#
+# По време на теста image_cache само прочита готовия файл (без смаляване);
+# ако за картинката няма актуална версия, тя се смалява както преди.
+
+RENDITIONS_DIR = os.path.join(".cache", "renditions")
+MANIFEST_NAME = "manifest.json"
+
+# размерът на рамката за картинка към въпрос (виж questions/primer.md)
+BOX_WIDTH = 800
+BOX_HEIGHT = 200
+
+# сменя се, ако се смени начинът на смаляване – старите версии стават невалидни
+# 2: само снимките (JPEG) стават JPEG; чертежите и екранните снимки остават PNG
+RENDITION_VERSION = 2
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+# фонът има собствен кеш (image_cache.load_background)
+SKIP_NAMES = ("background.jpg",)
+
+
+def renditions_path(images_path: str) -> str:
+    return os.path.join(images_path, RENDITIONS_DIR)
+
+
+def _content_hash(path: str) -> str:
+    h = hashlib.sha256(f"v{RENDITION_VERSION} {BOX_WIDTH}x{BOX_HEIGHT}\n".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+def read_manifest(images_path: str) -> dict:
+    try:
+        with open(os.path.join(renditions_path(images_path), MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != RENDITION_VERSION:
+        return {}
+    return manifest.get("sources", {})
+
+
+def _write_manifest(out_dir: str, sources: dict):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": RENDITION_VERSION, "sources": sources}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+# -------------------------------------------------------
+#  Смаляване (в отделни процеси)
+# -------------------------------------------------------
+def render_source(images_path: str, name: str) -> dict:
+    """
+    Прави 1x и 2x версия на една картинка. Връща запис за manifest.json
+    или {"error": "..."}. Ако версии със същия хеш вече има (напр.
+    преименуван файл), само ги преизползва.
+    """
+    from PIL import Image, ImageOps
+
+    src = os.path.join(images_path, name)
+    out_dir = renditions_path(images_path)
+    try:
+        st = os.stat(src)
+        digest = _content_hash(src)
+
+        with Image.open(src) as img:
+            source_format = img.format
+            # снимките от телефон често са завъртени само чрез EXIF
+            img = ImageOps.exif_transpose(img)
+            w, h = img.size
+            scale = min(BOX_WIDTH / w, BOX_HEIGHT / h, 1.0)
+            logical = (max(1, round(w * scale)), max(1, round(h * scale)))
+
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            # форматът е като на източника: JPEG-ът си е снимка, а PNG (чертеж,
+            # текст) със загуби би се размазал около линиите
+            as_jpeg = source_format == "JPEG" and not has_alpha
+            ext = ".jpg" if as_jpeg else ".png"
+
+            sizes = {}
+            for factor in (1, 2):
+                px_scale = min(scale * factor, 1.0)
+                sizes[factor] = (max(1, round(w * px_scale)), max(1, round(h * px_scale)))
+
+            files = {}
+            for factor, size in sizes.items():
+                if factor == 2 and size == sizes[1]:
+                    # картинката е малка – 2x би било същото като 1x
+                    files["2"] = files["1"]
+                    continue
+                out_name = f"{digest}_{factor}x{ext}"
+                out_path = os.path.join(out_dir, out_name)
+                if not os.path.exists(out_path):
+                    frame = img.resize(size, Image.LANCZOS) if size != (w, h) else img
+                    frame = frame.convert("RGBA" if has_alpha else "RGB")
+                    # два файла с еднакво съдържание може да се обработват едновременно
+                    tmp_path = f"{out_path}.{os.getpid()}.tmp{ext}"
+                    if as_jpeg:
+                        frame.save(tmp_path, "JPEG", quality=92)
+                    else:
+                        frame.save(tmp_path, "PNG")
+                    os.replace(tmp_path, out_path)
+                files[str(factor)] = out_name
+    except Exception as e:
+        return {"error": str(e)}
+
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": digest,
+        "logical": list(logical),
+        "files": files,
+    }
+
+
+def _render_job(args):
+    images_path, name = args
+    return name, render_source(images_path, name)
+
+
+def source_images(images_path: str) -> list:
+    return sorted(
+        name for name in os.listdir(images_path)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+        and name not in SKIP_NAMES
+        and not name.startswith(".")
+        and os.path.isfile(os.path.join(images_path, name))
+    )
+
+
+def build_renditions(images_path: str, jobs: int = None, force: bool = False, progress=None) -> dict:
+    """
+    Обновява готовите версии за всички картинки в images_path.
+    progress(готови, общо) се вика след всяка обработена картинка.
+    Връща {"images", "rendered", "unchanged", "removed", "errors": {име: грешка}}.
+    """
+    out_dir = renditions_path(images_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    old = {} if force else read_manifest(images_path)
+    names = source_images(images_path)
+
+    sources = {}
+    todo = []
+    for name in names:
+        entry = old.get(name)
+        st = os.stat(os.path.join(images_path, name))
+        if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and all(os.path.exists(os.path.join(out_dir, f)) for f in entry["files"].values())):
+            sources[name] = entry
+        else:
+            todo.append(name)
+
+    errors = {}
+    jobs = jobs or os.cpu_count() or 1
+    done = 0
+    if force:
+        # при --force се правят наново и самите файлове
+        for f in os.listdir(out_dir):
+            if f != MANIFEST_NAME:
+                os.remove(os.path.join(out_dir, f))
+
+    def collect(name, entry):
+        nonlocal done
+        if "error" in entry:
+            errors[name] = entry["error"]
+        else:
+            sources[name] = entry
+        done += 1
+        if progress is not None:
+            progress(done, len(todo))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for name, entry in pool.map(_render_job, [(images_path, n) for n in todo]):
+                collect(name, entry)
+    else:
+        for name in todo:
+            collect(name, render_source(images_path, name))
+
+    # версиите, към които вече не сочи нищо (изтрити/сменени картинки)
+    used = {f for entry in sources.values() for f in entry["files"].values()}
+    removed = 0
+    for f in os.listdir(out_dir):
+        if f != MANIFEST_NAME and f not in used:
+            os.remove(os.path.join(out_dir, f))
+            removed += 1
+
+    _write_manifest(out_dir, sources)
+    return {
+        "images": len(names),
+        "rendered": len(todo) - len(errors),
+        "unchanged": len(names) - len(todo),
+        "removed": removed,
+        "errors": errors,
+    }
+
+
+# -------------------------------------------------------
+#  Търсене на готова версия (по време на теста)
+# -------------------------------------------------------
+class RenditionLookup:
+    """
+    Чете manifest.json (наново, ако файлът се смени) и за дадена картинка
+    връща пътя до готовата версия и логическия ѝ размер. Безопасно е от
+    няколко нишки.
+    """
+
+    def __init__(self, images_path: str):
+        self.images_path = images_path
+        self._manifest_path = os.path.join(renditions_path(images_path), MANIFEST_NAME)
+        self._stamp = None
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            st = os.stat(self._manifest_path)
+            stamp = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            stamp = None
+        if stamp != self._stamp:
+            self._sources = read_manifest(self.images_path) if stamp else {}
+            self._stamp = stamp
+
+    def find(self, path: str, dpr: float = 1.0):
+        """(път до версията, (логическа ширина, височина)) или None."""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.images_path):
+            return None
+        name = os.path.basename(path)
+
+        with self._lock:
+            self._refresh()
+            entry = self._sources.get(name)
+        if entry is None:
+            return None
+
+        # картинката е сменена след последното build_renditions
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if st.st_size != entry["size"] or st.st_mtime_ns != entry["mtime_ns"]:
+            return None
+
+        file = entry["files"]["2" if dpr > 1.0 else "1"]
+        return os.path.join(renditions_path(self.images_path), file), tuple(entry["logical"])
+
+
+_lookups = {}
+_lookups_lock = threading.Lock()
+
+
+def lookup_for(images_path: str) -> RenditionLookup:
+    key = os.path.abspath(images_path)
+    with _lookups_lock:
+        lookup = _lookups.get(key)
+        if lookup is None:
+            lookup = _lookups[key] = RenditionLookup(key)
+        return lookup
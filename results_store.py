@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import sqlite3
+import threading
+
+from question_bank import question_hash
+
+# Резултати от тестовете (SQLite)
+# --------------------------------
+# Всеки завършен тест е ред в sessions, а всеки отговор в него – ред в
+# answers. Базата е в WAL режим: четенето (справки, анализ на въпросите) не
+# спира записа, а няколко процеса (приложението, lab_server.py) могат да
+# пишат в един файл – чакат се до BUSY_TIMEOUT_MS.
+#
+# Записът е в отделна нишка: финалният екран само слага теста в опашка.
+# Нишката взима наведнъж всичко натрупано (до BATCH_SIZE теста) и го записва
+# в една транзакция – при изпитен ден fsync-ът е един за много тестове.
+# Ако записът не успее, тестовете отиват в FAILED_NAME (JSON Lines), за да
+# не се изгубят.
+
+RESULTS_DIR = "results"
+DB_NAME = "results.sqlite3"
+FAILED_NAME = "failed.jsonl"
+
+BATCH_SIZE = 200
+BUSY_TIMEOUT_MS = 10_000
+WRITE_ATTEMPTS = 3
+
+# 2: answers.seconds – време на въпроса
+# 3: sessions.seed – зърното на теста (виж QuizSession.from_bank)
+# 4: answers.question_hash – отпечатъкът на въпроса (question_bank.question_hash)
+# 5: sessions.scored – 0 за тест без оценка (отговорите от lab_server, записани
+#    локално, когато сървърът не отговори); анализът на въпросите го пропуска
+SCHEMA_VERSION = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id          INTEGER PRIMARY KEY,
+    uid         TEXT NOT NULL UNIQUE,
+    finished_at REAL NOT NULL,
+    grade       TEXT NOT NULL,
+    category    TEXT NOT NULL,
+    client      TEXT,
+    correct     INTEGER NOT NULL,
+    total       INTEGER NOT NULL,
+    percent     INTEGER NOT NULL,
+    seed        INTEGER,
+    scored      INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS sessions_bank ON sessions (grade, category, finished_at);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions (finished_at);
+
+CREATE TABLE IF NOT EXISTS answers (
+    session_id     INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    position       INTEGER NOT NULL,
+    question_id    INTEGER NOT NULL,
+    type           TEXT NOT NULL,
+    question       TEXT,
+    user_answer    TEXT,
+    correct_answer TEXT,
+    was_counted    INTEGER NOT NULL,
+    seconds        REAL,
+    question_hash  TEXT,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question_id, session_id);
+"""
+
+_INSERT_SESSION = (
+    "INSERT OR IGNORE INTO sessions"
+    " (uid, finished_at, grade, category, client, correct, total, percent, seed, scored)"
+    " VALUES (:uid, :finished_at, :grade, :category, :client, :correct, :total, :percent, :seed, :scored)"
+)
+_INSERT_ANSWER = (
+    "INSERT INTO answers"
+    " (session_id, position, question_id, type, question, user_answer, correct_answer, was_counted, seconds,"
+    " question_hash)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def default_path(base_path: str) -> str:
+    return os.path.join(base_path, RESULTS_DIR, DB_NAME)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Отваря (и при нужда създава) базата с резултатите."""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+
+    # isolation_level=None – транзакциите се отварят ръчно (BEGIN IMMEDIATE)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # FULL – завършена транзакция оцелява и при спиране на тока
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA foreign_keys=ON")
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # наново – друг процес може да е обновил базата междувременно
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+            else:
+                if version < 2:
+                    conn.execute("ALTER TABLE answers ADD COLUMN seconds REAL")
+                if version < 3:
+                    conn.execute("ALTER TABLE sessions ADD COLUMN seed INTEGER")
+                if version < 4:
+                    conn.execute("ALTER TABLE answers ADD COLUMN question_hash TEXT")
+                if version < 5:
+                    conn.execute("ALTER TABLE sessions ADD COLUMN scored INTEGER NOT NULL DEFAULT 1")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return conn
+
+
+def session_record(session, grade: str, category: str, uid: str = None, client: str = None) -> dict:
+    """
+    Моментна снимка на завършен тест (QuizSession) – записва се по-късно,
+    затова не държи препратки към живата сесия.
+    """
+    questions = dict(zip(session.question_ids, session.questions))
+    return {
+        "uid": uid or os.urandom(16).hex(),
+        "finished_at": session.finished_at or time.time(),
+        "grade": str(grade),
+        "category": str(category),
+        "client": client or socket.gethostname(),
+        "correct": session.correct_answers,
+        "total": session.total_questions,
+        "percent": session.percent,
+        "seed": session.seed,
+        "scored": 1 if session.scored else 0,
+        "answers": [
+            [
+                position,
+                entry["id"],
+                entry["type"],
+                entry.get("question"),
+                entry.get("user_answer"),
+                entry.get("correct"),
+                1 if entry["was_counted"] else 0,
+                session.time_spent.get(entry["id"]),
+                question_hash(questions[entry["id"]]) if entry["id"] in questions else None,
+            ]
+            for position, entry in enumerate(session.answers_log)
+        ],
+    }
+
+
+def write_records(conn: sqlite3.Connection, records: list) -> int:
+    """Записва тестовете в една транзакция. Връща броя на новите (по uid)."""
+    added = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for record in records:
+            cur = conn.execute(_INSERT_SESSION, record)
+            if cur.rowcount == 0:
+                # вече записан (напр. повторена заявка от клиента)
+                continue
+            session_id = cur.lastrowid
+            conn.executemany(_INSERT_ANSWER, ([session_id] + a for a in record["answers"]))
+            added += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+
+def recent_question_hashes(path: str, grade: str, category: str, client: str = None, sessions: int = 3) -> set:
+    """
+    Отпечатъците (question_hash) на въпросите от последните sessions теста
+    по банката на този компютър (client) – тези, на които е отговорено.
+    id-тата не стават – след изтриване в редактора сочат към други въпроси
+    (виж Selector.ids_for_hashes). Без база или при грешка – празно множество.
+    """
+    if sessions <= 0 or not os.path.exists(path):
+        return set()
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    except sqlite3.Error:
+        return set()
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT a.question_hash FROM answers a WHERE a.question_hash IS NOT NULL AND a.session_id IN ("
+            " SELECT id FROM sessions WHERE grade = ? AND category = ? AND client = ?"
+            " ORDER BY finished_at DESC LIMIT ?)",
+            (str(grade), str(category), client or socket.gethostname(), sessions),
+        ).fetchall()
+    except sqlite3.Error:
+        return set()
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
+
+
+class ResultsStore:
+    """
+    Записва резултатите в отделна нишка. record() само слага теста в
+    опашката; close() изчаква всичко да се запише.
+    """
+
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, session, grade: str, category: str, uid: str = None, client: str = None):
+        self.add(session_record(session, grade, category, uid, client))
+
+    def add(self, record: dict):
+        if self._closed:
+            raise RuntimeError("ResultsStore е затворен.")
+        self._queue.put(record)
+
+    def flush(self):
+        """Изчаква всичко в опашката да бъде записано (или отложено в failed.jsonl)."""
+        self._queue.join()
+
+    def close(self, timeout: float = None):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---------------- нишката за запис ----------------
+    def _run(self):
+        conn = None
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+            records = [r for r in batch if r is not None]
+
+            try:
+                if records:
+                    conn = self._write(conn, records)
+            except Exception as e:
+                # напр. лоши данни в партидата – тя отива във failed.jsonl,
+                # а нишката продължава със следващите тестове
+                print(f"results_store: партидата не е записана ({e!r}); тестовете са в {FAILED_NAME}",
+                      file=sys.stderr)
+                self._save_failed(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn, records: list):
+        """Записва партидата (с няколко опита); връща връзката за следващата."""
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                if conn is None:
+                    conn = connect(self.path)
+                write_records(conn, records)
+                return conn
+            except (sqlite3.Error, OSError) as e:
+                error = e
+                time.sleep(0.2 * attempt)
+        print(f"results_store: записът не успя ({error}); тестовете са в {FAILED_NAME}", file=sys.stderr)
+        self._save_failed(records)
+        return conn
+
+    def _save_failed(self, records: list):
+        path = os.path.join(os.path.dirname(os.path.abspath(self.path)), FAILED_NAME)
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except (OSError, ValueError) as e:
+            print(f"results_store: и {FAILED_NAME} не може да се запише: {e}", file=sys.stderr)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def store_for(path: str) -> ResultsStore:
+    """Един ResultsStore (една нишка за запис) на файл за целия процес."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ResultsStore(key)
+        return store
+
+
+def close_all(timeout: float = None):
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close(timeout)
@@ -0,0 +1,183 @@
+import re
+from bisect import bisect_left, insort
+
+
+# Търсене в банката с въпроси (за редактора)
+# -------------------------------------------
+# Обърнат индекс: дума -> множество от документи (въпроси). Всеки въпрос има
+# вътрешен номер на документ, който не се сменя при изтриване на други
+# въпроси – така добавяне/редакция/изтриване пипат само думите на един въпрос.
+
+_WORD_RE = re.compile(r"\w+")
+
+# ударения над гласни (ѝ, ѐ, à...) – махаме ги; другите знаци (й, ё) остават
+_STRIP_STRESS = str.maketrans({
+    "\u0300": None, "\u0301": None,     # комбиниращи ударения
+    "ѝ": "и", "ѐ": "е",
+    "à": "a", "á": "a", "è": "e", "é": "e", "ì": "i", "í": "i",
+    "ò": "o", "ó": "o", "ù": "u", "ú": "u", "ý": "y",
+})
+
+# при по-кратко начало на дума търсим само цели думи, иначе една буква
+# обхожда половината речник
+MIN_PREFIX_LEN = 2
+
+
+_STRESS_RE = re.compile("[" + "".join(map(chr, _STRIP_STRESS)) + "]")
+
+
+def normalize(text: str) -> str:
+    """Малки букви (casefold, вкл. кирилица) и без ударения."""
+    text = text.casefold()
+    # translate е бавен за не-ASCII текст – викаме го само ако има нужда
+    if _STRESS_RE.search(text):
+        text = text.translate(_STRIP_STRESS)
+    return text
+
+
+def tokenize(text: str) -> list:
+    return _WORD_RE.findall(normalize(text))
+
+
+def question_tokens(question: dict) -> set:
+    """Думите от текста, отговора, вариантите, типа и името на картинката."""
+    parts = [
+        question.get("question") or "",
+        question.get("answer") or "",
+        question.get("type") or "",
+        question.get("image") or "",
+    ]
+    parts.extend(question.get("options") or [])
+    parts.extend(question.get("accepted") or [])
+    return set(tokenize("\n".join(str(p) for p in parts)))
+
+
+class SearchIndex:
+    """
+    Обърнат индекс над списък с въпроси. Редовете отговарят на индексите в
+    списъка; след промяна в списъка се вика add/replace/remove със същия ред.
+    """
+
+    def __init__(self, questions=()):
+        self._postings = {}       # дума -> set(документи)
+        self._doc_tokens = {}     # документ -> set(думи)
+        self._docs = []           # ред -> документ
+        self._next_doc = 0
+
+        self._vocab = []          # сортираните думи, за търсене по начало
+        self._row_of = None       # документ -> ред; None = да се сметне наново
+        # докато няма изтрити въпроси, номерът на документа е и номер на реда
+        self._rows_are_docs = True
+
+        self._bulk = False
+        self.extend(questions)
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -------------------------------------------------------
+    #  Промени
+    # -------------------------------------------------------
+    def add(self, question: dict, tokens: set = None):
+        """tokens – готовите question_tokens(question), ако са сметнати другаде (напр. в нишка)."""
+        doc = self._next_doc
+        self._next_doc += 1
+        if self._row_of is not None:
+            self._row_of[doc] = len(self._docs)
+        self._docs.append(doc)
+        self._index_doc(doc, question, tokens)
+
+    def extend(self, questions, tokens=None):
+        """Много въпроса наведнъж; речникът се сортира веднъж накрая."""
+        self._bulk = True
+        try:
+            if tokens is None:
+                for q in questions:
+                    self.add(q)
+            else:
+                for q, t in zip(questions, tokens):
+                    self.add(q, t)
+        finally:
+            self._bulk = False
+        self._vocab = sorted(self._postings)
+
+    def replace(self, row: int, question: dict):
+        doc = self._docs[row]
+        self._unindex_doc(doc)
+        self._index_doc(doc, question)
+
+    def remove(self, row: int):
+        doc = self._docs.pop(row)
+        self._unindex_doc(doc)
+        # редовете след изтрития са се изместили
+        self._row_of = None
+        self._rows_are_docs = False
+
+    def _index_doc(self, doc: int, question: dict, tokens: set = None):
+        if tokens is None:
+            tokens = question_tokens(question)
+        self._doc_tokens[doc] = tokens
+        postings = self._postings
+        for token in tokens:
+            posting = postings.get(token)
+            if posting is None:
+                postings[token] = {doc}
+                if not self._bulk:
+                    insort(self._vocab, token)
+            else:
+                posting.add(doc)
+
+    def _unindex_doc(self, doc: int):
+        for token in self._doc_tokens.pop(doc, ()):
+            posting = self._postings[token]
+            posting.discard(doc)
+            if not posting:
+                del self._postings[token]
+                del self._vocab[bisect_left(self._vocab, token)]
+
+    # -------------------------------------------------------
+    #  Търсене
+    # -------------------------------------------------------
+    def _prefix_docs(self, prefix: str) -> set:
+        postings = []
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            postings.append(self._postings[self._vocab[i]])
+            i += 1
+        if len(postings) == 1:
+            return postings[0]
+        return set().union(*postings)
+
+    def search(self, query: str):
+        """
+        Редовете (във възходящ ред), чиито въпроси съдържат всички думи от
+        заявката. Последната дума се търси и като начало на дума – за търсене
+        докато се пише. Празна заявка връща None (= без филтър).
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+
+        # по-редките думи първи – сечението остава малко
+        last = words[-1]
+        sets = [self._postings.get(w, set()) for w in words[:-1]]
+        if len(last) >= MIN_PREFIX_LEN:
+            sets.append(self._prefix_docs(last))
+        else:
+            sets.append(self._postings.get(last, set()))
+        sets.sort(key=len)
+
+        hits = set(sets[0])
+        for s in sets[1:]:
+            if not hits:
+                break
+            hits &= s
+
+        if len(hits) == len(self._docs):
+            return list(range(len(self._docs)))
+        if self._rows_are_docs:
+            return sorted(hits)
+
+        if self._row_of is None:
+            self._row_of = {doc: row for row, doc in enumerate(self._docs)}
+        return sorted(self._row_of[doc] for doc in hits)
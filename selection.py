@@ -0,0 +1,392 @@
+import os
+import json
+import math
+import heapq
+import random
+
+from question_bank import (
+    BankIndex, INDEX_DIR, load_bank, iter_questions, read_journal, bank_stamp, question_hash,
+)
+
+
+# Избор на въпросите за един тест
+# --------------------------------
+# Вместо random.sample от цялата банка тестът може да се сглоби по правила
+# от questions/selection.json (всички ключове са по желание):
+#
+#   {
+#     "default": {"count": 10},
+#     "4_math":  {"count": 12,
+#                 "quotas": {"type:choice": 8, "type:text": 4},
+#                 "tag_weights": {"дроби": 2.0},
+#                 "exclude_recent": 3}
+#   }
+#
+#   count          – брой въпроси в теста;
+#   quotas         – колко въпроса от дадена група: "type:choice",
+#                    "type:text" или "tag:<тема>" (темите са в "tags");
+#                    остатъкът до count е от цялата банка;
+#   tag_weights    – въпросите с тази тема се падат толкова пъти по-често;
+#   exclude_recent – без въпросите от последните N теста на този компютър
+#                    (ако не стигат въпроси, се допускат и те); въпросите
+#                    се познават по отпечатъка (question_hash), не по id –
+#                    id-тата се сменят при изтриване в редактора.
+# Всеки въпрос може да има и собствено "weight" (по подразбиране 1).
+#
+# За всяка група се прави alias таблица (Vose) – изтеглянето на въпрос е O(1)
+# независимо от размера на банката. Таблиците зависят само от типовете,
+# темите и теглата (плюс отпечатъците за exclude_recent), затова се пазят в .index/<име>.json.profile и се правят
+# наново само ако банката (или журналът ѝ) се смени.
+#
+# Ако индексът и профилът не могат да се запишат (папка само за четене),
+# stream_select избира със същите правила с един проход през файла –
+# претеглен reservoir sampling за всяка група, без банката в паметта.
+
+SELECTION_FILE = "selection.json"
+PROFILE_SUFFIX = ".profile"
+PROFILE_VERSION = 2
+
+ALL = "*"
+# след толкова неуспешни опита на въпрос (повторен/изключен) се тегли от
+# alias таблица само на останалите въпроси в групата – със същите тегла
+MAX_REJECTS = 32
+
+
+class SelectionSpec:
+    """Правилата за един тест (виж началото на файла)."""
+
+    def __init__(self, count: int = 10, quotas=None, tag_weights=None, exclude_recent: int = 0):
+        self.count = int(count)
+        self.quotas = dict(quotas or {})
+        self.tag_weights = dict(tag_weights or {})
+        self.exclude_recent = int(exclude_recent)
+
+    @classmethod
+    def from_dict(cls, data: dict, count: int = 10) -> "SelectionSpec":
+        quotas = {str(k): int(v) for k, v in (data.get("quotas") or {}).items() if int(v) > 0}
+        tag_weights = {str(k): float(v) for k, v in (data.get("tag_weights") or {}).items()}
+        return cls(data.get("count", count), quotas, tag_weights, data.get("exclude_recent", 0))
+
+    @property
+    def is_uniform(self) -> bool:
+        """
+        Без квоти и тегла. Обикновен random.sample стига само ако и банката
+        няма въпроси с "weight" (виж Selector.weighted).
+        """
+        return not self.quotas and not self.tag_weights
+
+
+def load_spec(questions_path: str, bank_name: str, count: int = 10) -> SelectionSpec:
+    """
+    Правилата за банката bank_name (напр. "4_math.json") от selection.json.
+    Ако файлът липсва – count въпроса, избрани равномерно (както досега).
+    """
+    try:
+        with open(os.path.join(questions_path, SELECTION_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return SelectionSpec(count)
+    except (OSError, ValueError) as e:
+        print(f"{SELECTION_FILE}: пренебрегнат – {e}")
+        return SelectionSpec(count)
+
+    data = dict(config.get("default") or {})
+    data.update(config.get(os.path.splitext(bank_name)[0]) or {})
+    try:
+        return SelectionSpec.from_dict(data, count)
+    except (TypeError, ValueError) as e:
+        print(f"{SELECTION_FILE}: грешни правила за {bank_name} – {e}")
+        return SelectionSpec(count)
+
+
+# -------------------------------------------------------
+#  Alias таблица
+# -------------------------------------------------------
+class AliasTable:
+    """Тегловен избор на един от n елемента за O(1) (метод на Vose)."""
+
+    __slots__ = ("items", "prob", "alias")
+
+    def __init__(self, items: list, weights: list):
+        n = len(items)
+        self.items = items
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        total = sum(weights)
+        if n == 0 or total <= 0:
+            # всички тегла са 0 – равномерно
+            self.prob = [1.0] * n
+            return
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large[-1]
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(large.pop())
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw(self, rng) -> int:
+        i = int(rng.random() * len(self.items))
+        if rng.random() >= self.prob[i]:
+            i = self.alias[i]
+        return self.items[i]
+
+
+# -------------------------------------------------------
+#  Профил на банката (типове, теми, тегла)
+# -------------------------------------------------------
+def profile_path_for(json_path: str) -> str:
+    folder, name = os.path.split(os.path.abspath(json_path))
+    return os.path.join(folder, INDEX_DIR, name + PROFILE_SUFFIX)
+
+
+def build_profile(questions) -> dict:
+    """
+    {"weights": [...], "hashes": [...], "strata": {"type:choice": [ids], "tag:...": [ids]}}
+    – hashes са question_hash на въпросите (за exclude_recent).
+    """
+    weights = []
+    hashes = []
+    strata = {}
+    for i, q in enumerate(questions):
+        w = q.get("weight", 1) if isinstance(q, dict) else 0
+        weights.append(float(w) if isinstance(w, (int, float)) and w >= 0 else 1.0)
+        if not isinstance(q, dict):
+            hashes.append(None)
+            continue
+        hashes.append(question_hash(q))
+        strata.setdefault(f"type:{q.get('type') or 'choice'}", []).append(i)
+        for tag in q.get("tags") or []:
+            strata.setdefault(f"tag:{tag}", []).append(i)
+    return {"weights": weights, "hashes": hashes, "strata": strata}
+
+
+def load_profile(json_path: str) -> dict:
+    """Профилът от .index/ или – ако е стар – нов (чете цялата банка веднъж)."""
+    # като в JSON-а на профила – списъци, а не tuple
+    stamp = [list(s) if s is not None else None for s in bank_stamp(json_path)]
+    path = profile_path_for(json_path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+        if profile.get("version") == PROFILE_VERSION and profile.get("stamp") == stamp:
+            return profile
+    except (OSError, ValueError):
+        pass
+
+    # без журнал банката се чете на парчета – в паметта са само теглата и групите
+    questions = load_bank(json_path) if read_journal(json_path) else iter_questions(json_path)
+    profile = build_profile(questions)
+    profile["version"] = PROFILE_VERSION
+    profile["stamp"] = stamp
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        # папката е само за четене – профилът остава само в паметта
+        pass
+    return profile
+
+
+# -------------------------------------------------------
+#  Избор
+# -------------------------------------------------------
+class Selector:
+    """Alias таблиците на една банка; pick() връща id-тата на въпросите."""
+
+    def __init__(self, profile: dict):
+        self.weights = profile["weights"]
+        self.hashes = profile["hashes"]
+        # има въпрос със собствено "weight" – равномерният избор не става
+        self.weighted = any(w != 1.0 for w in self.weights)
+        self.strata = dict(profile["strata"])
+        self.strata[ALL] = range(len(self.weights))
+        self.tags = {}        # id -> теми (само за tag_weights)
+        for key, ids in self.strata.items():
+            if key.startswith("tag:"):
+                for i in ids:
+                    self.tags.setdefault(i, []).append(key[4:])
+        self._tables = {}
+
+    @classmethod
+    def from_questions(cls, questions: list) -> "Selector":
+        return cls(build_profile(questions))
+
+    def __len__(self):
+        return len(self.weights)
+
+    def ids_for_hashes(self, hashes) -> set:
+        """Сегашните id-та на въпросите с тези отпечатъци (за exclude в pick)."""
+        hashes = set(hashes)
+        if not hashes:
+            return set()
+        return {i for i, h in enumerate(self.hashes) if h in hashes}
+
+    def _weight(self, i: int, tag_weights: dict) -> float:
+        w = self.weights[i]
+        for tag in self.tags.get(i, ()):
+            w *= tag_weights.get(tag, 1.0)
+        return w
+
+    def table(self, key: str, tag_weights: dict) -> AliasTable:
+        cache_key = (key, tuple(sorted(tag_weights.items())))
+        table = self._tables.get(cache_key)
+        if table is None:
+            ids = list(self.strata.get(key, ()))
+            table = AliasTable(ids, [self._weight(i, tag_weights) for i in ids])
+            self._tables[cache_key] = table
+        return table
+
+    def pick(self, spec: SelectionSpec, rng=random, exclude=()) -> list:
+        """
+        id-тата на въпросите за теста, в случаен ред. Квотите се изпълняват
+        доколкото групата стига; изключените въпроси се допускат само ако
+        иначе тестът би бил по-кратък.
+        """
+        exclude = set(exclude)
+        picked = []
+        seen = set()
+
+        # остатъкът от цялата банка – и това, което малка група не е покрила
+        plan = list(spec.quotas.items()) + [(ALL, spec.count)]
+
+        for key, n in plan:
+            n = min(n, spec.count - len(picked))
+            if n <= 0:
+                continue
+            table = self.table(key, spec.tag_weights)
+            got = self._draw(table, n, rng, seen | exclude, spec.tag_weights)
+            if len(got) < n and exclude:
+                got += self._draw(table, n - len(got), rng, seen | set(got), spec.tag_weights)
+            picked.extend(got)
+            seen.update(got)
+
+        rng.shuffle(picked)
+        return picked
+
+    def _draw(self, table: AliasTable, n: int, rng, blocked: set, tag_weights: dict) -> list:
+        got = []
+        blocked = set(blocked)
+        rejects = 0
+        while len(got) < n and rejects < MAX_REJECTS and len(table):
+            i = table.draw(rng)
+            if i in blocked:
+                rejects += 1
+                continue
+            got.append(i)
+            blocked.add(i)
+        if len(got) < n:
+            # малка група или почти всичко е изключено – таблица само на
+            # останалите (с tag_weights, както голямата; ако всички тегла са
+            # 0 – равномерно, за да не е тестът по-кратък)
+            candidates = [i for i in table.items if i not in blocked]
+            while candidates and len(got) < n:
+                rest = AliasTable(candidates, [self._weight(i, tag_weights) for i in candidates])
+                i = rest.draw(rng)
+                got.append(i)
+                candidates.remove(i)
+        return got
+
+
+_selectors = {}       # път -> (stamp, Selector)
+
+
+def selector_for(json_path: str) -> Selector:
+    """Selector за банката; прави се наново само ако файлът е сменен."""
+    key = os.path.abspath(json_path)
+    stamp = bank_stamp(json_path)
+    cached = _selectors.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    selector = Selector(load_profile(json_path))
+    _selectors[key] = (stamp, selector)
+    return selector
+
+
+def select_questions(json_path: str, spec: SelectionSpec, rng=random, exclude=()) -> list:
+    """[(индекс в банката, въпрос), ...] по правилата в spec, в случаен ред."""
+    if read_journal(json_path):
+        # индексът описва само основния файл – с журнал зареждаме всичко
+        ids = selector_for(json_path).pick(spec, rng, exclude)
+        questions = load_bank(json_path)
+        return [(i, questions[i]) for i in ids]
+
+    bank = BankIndex.open(json_path, in_memory=False)
+    if bank is None:
+        return stream_select(json_path, spec, rng, exclude)
+    with bank:
+        ids = selector_for(json_path).pick(spec, rng, exclude)
+        by_id = dict(bank.read_indexed(ids))
+    return [(i, by_id[i]) for i in ids]
+
+
+def _question_weight(question: dict, tag_weights: dict) -> float:
+    w = question.get("weight", 1)
+    w = float(w) if isinstance(w, (int, float)) and w >= 0 else 1.0
+    for tag in question.get("tags") or []:
+        w *= tag_weights.get(tag, 1.0)
+    return w
+
+
+def stream_select(json_path: str, spec: SelectionSpec, rng=random, exclude=()) -> list:
+    """
+    Като select_questions, но с един проход през файла и без индекс.
+    За всяка група се пази претеглен reservoir (алгоритъм A-Res: ключ
+    log(u) / тегло, остават най-големите ключове; за всяка група с отделно
+    u, иначе квотите изкривяват остатъка) – толкова въпроса,
+    колкото групата може да даде, плюс колкото може да се повторят с
+    предишните групи. Изключените въпроси са с по-нисък приоритет от
+    всички останали, затова влизат само ако не стигат другите.
+    """
+    exclude = set(exclude)
+    plan = list(spec.quotas.items()) + [(ALL, spec.count)]
+    sizes = {}
+    before = 0
+    for key, n in plan:
+        sizes[key] = max(sizes.get(key, 0), min(spec.count, n + before))
+        before += n
+    reservoirs = {key: [] for key in sizes}
+
+    for i, question in enumerate(iter_questions(json_path)):
+        groups = [ALL, f"type:{question.get('type') or 'choice'}"]
+        groups += [f"tag:{tag}" for tag in question.get("tags") or []]
+        groups = [g for g in groups if g in reservoirs]
+        if not groups:
+            continue
+        weight = _question_weight(question, spec.tag_weights)
+        allowed = i not in exclude
+        for g in groups:
+            key = math.log(1.0 - rng.random()) / weight if weight > 0 else -math.inf
+            entry = (allowed, key, i, question)
+            heap = reservoirs[g]
+            if len(heap) < sizes[g]:
+                heapq.heappush(heap, entry)
+            elif entry[:3] > heap[0][:3]:
+                heapq.heapreplace(heap, entry)
+
+    picked = []
+    seen = set()
+    for key, n in plan:
+        n = min(n, spec.count - len(picked))
+        for _, _, i, question in sorted(reservoirs[key], reverse=True):
+            if n <= 0:
+                break
+            if i not in seen:
+                picked.append((i, question))
+                seen.add(i)
+                n -= 1
+
+    rng.shuffle(picked)
+    return picked
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+
+from quiz_session import QuizSession
+from results_store import RESULTS_DIR
+
+
+# Незавършеният тест на диска
+# ----------------------------
+# При започване на тест в SNAPSHOT_NAME се записва планът му (въпроси, ред,
+# варианти), а след всеки отговор се добавя по един ред:
+#
+#   {"version": 1, "grade": "4", "category": "math", "plan": {...}}
+#   {"i": 0, "a": "12", "s": 8.4}      # индекс, отговор, секунди на въпроса
+#   ...
+#
+# Ако приложението падне или бъде затворено по средата, при следващото
+# стартиране main.py възстановява същия тест от плана и прилага отговорите.
+# Всеки ред стига до ОС веднага (срив на приложението не губи нищо), а fsync
+# се прави най-много веднъж на FSYNC_INTERVAL секунди – при спиране на тока
+# се губят най-много отговорите от последните секунди. При предаване файлът
+# се изтрива.
+
+SNAPSHOT_NAME = "session.snapshot"
+SNAPSHOT_VERSION = 1
+FSYNC_INTERVAL = 2.0     # секунди
+
+
+def snapshot_path(base_path: str) -> str:
+    return os.path.join(base_path, RESULTS_DIR, SNAPSHOT_NAME)
+
+
+class SessionSnapshot:
+    """Файлът с плана и отговорите на текущия тест (само добавяне)."""
+
+    def __init__(self, path: str, f):
+        self.path = path
+        self._file = f
+        self._synced_at = time.monotonic()
+        self._dirty = False
+
+    @classmethod
+    def create(cls, path: str, session: QuizSession, grade: str, category: str) -> "SessionSnapshot":
+        """Нов файл за session (старият, ако има, се заменя)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        header = {"version": SNAPSHOT_VERSION, "grade": grade, "category": category, "plan": session.plan()}
+        tmp_path = path + ".tmp"
+        f = open(tmp_path, "w", encoding="utf-8")
+        try:
+            f.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            raise
+        # планът е на диска цял, преди да замени стария файл
+        os.replace(tmp_path, path)
+        return cls(path, f)
+
+    @classmethod
+    def reopen(cls, path: str) -> "SessionSnapshot":
+        """Продължава файла на възстановен тест."""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1))
+            last = f.read(1)
+        f = open(path, "a", encoding="utf-8", newline="\n")
+        if last != b"\n":
+            # недописан ред от срив – следващият отговор почва на нов ред
+            f.write("\n")
+            f.flush()
+        return cls(path, f)
+
+    def answer(self, session: QuizSession, answer: str):
+        """Записва отговора на текущия въпрос (вика се след answer_*)."""
+        record = {"i": session.current_index, "a": answer, "s": round(session.seconds_on_current(), 3)}
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._dirty = True
+        if time.monotonic() - self._synced_at >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self.sync()
+            finally:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Тестът е предаден – файлът вече не трябва."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def load_snapshot(path: str):
+    """
+    (QuizSession, клас, предмет) от файла или None, ако няма незавършен тест.
+    Недописаните редове (срив по време на запис) се пропускат.
+    """
+    try:
+        # недописан ред може да свършва по средата на UTF-8 символ
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().split("\n")
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"{SNAPSHOT_NAME}: не може да се прочете – {e}", file=sys.stderr)
+        return None
+
+    try:
+        header = json.loads(lines[0])
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"непозната версия {header.get('version')}")
+        session = QuizSession.from_plan(header["plan"])
+        events = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # недописан ред от срив – отговорите след него са на нов ред
+                continue
+            events.append((record["i"], record["a"], record.get("s")))
+        session.replay(events)
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        print(f"{SNAPSHOT_NAME}: пренебрегнат – {e}", file=sys.stderr)
+        return None
+    return session, header["grade"], header["category"]
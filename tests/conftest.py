@@ -0,0 +1,5 @@
+import os
+import sys
+
+# модулите на приложението са в корена на проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,27 @@
+import pytest
+
+from answer_matcher import AnswerMatcher
+
+
+@pytest.mark.parametrize("correct, user", [
+    ("24 см", "24см"),
+    ("24 см", "0,24 м"),
+    ("24 см", "24"),
+    ("1945 г.", "1945 година"),
+    ("1945 г.", "1945 г"),
+    ("3 и 4", "3 и 4"),
+    ("2 пъти", "2 пъти"),
+])
+def test_accepts(correct, user):
+    assert AnswerMatcher([correct]).matches(user)
+
+
+@pytest.mark.parametrize("correct, user", [
+    ("3 и 4", "3"),
+    ("2 пъти", "2"),
+    ("1945 г.", "1945 кг"),
+    ("24 см", "24 пъти"),
+    ("-5", "5"),
+])
+def test_rejects(correct, user):
+    assert not AnswerMatcher([correct]).matches(user)
@@ -0,0 +1,18 @@
+from dedupe import find_duplicates
+
+
+def image_question(image):
+    return {"type": "choice", "question": "", "image": image,
+            "options": ["343 см³", "346 см³", "350 см³", "320 см³"], "answer": "343 см³"}
+
+
+def test_image_only_questions_differ_by_image():
+    banks = {"4_math.json": [image_question("ma.jpg")], "5_math.json": [image_question("math1.png")]}
+    assert find_duplicates(banks) == []
+
+
+def test_same_image_is_duplicate():
+    banks = {"4_math.json": [image_question("ma.jpg")], "12_bel.json": [image_question("ma.jpg")]}
+    clusters = find_duplicates(banks)
+    assert len(clusters) == 1
+    assert {(m["bank"], m["index"]) for m in clusters[0]} == {("4_math.json", 0), ("12_bel.json", 0)}
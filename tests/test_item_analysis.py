@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from quiz_session import QuizSession
+from results_store import connect, session_record, write_records
+from item_analysis import ItemStats
+
+
+def make_questions():
+    return [
+        {"type": "choice", "question": f"Въпрос {i}?", "options": ["а", "б", "в"], "answer": "а"}
+        for i in range(4)
+    ]
+
+
+def finished_sessions(questions, count=40):
+    rng = random.Random(1)
+    sessions = []
+    for seed in range(count):
+        session = QuizSession(questions, seed=seed)
+        while session.next():
+            # последният въпрос остава без отговор
+            if session.current_index < len(questions) - 1:
+                session.answer_choice(rng.choice(["а", "а", "б"]))
+        session.finish()
+        sessions.append(("4", "math", session))
+    return sessions
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "results.sqlite3"))
+    yield conn
+    conn.close()
+
+
+def test_same_statistics_from_sessions_and_db(conn):
+    sessions = finished_sessions(make_questions())
+    write_records(conn, [session_record(s, g, c) for g, c, s in sessions])
+
+    from_sessions = ItemStats()
+    from_sessions.add_sessions(sessions)
+    from_db = ItemStats()
+    from_db.update_from_db(conn)
+
+    for a, b in zip(from_sessions.report(0), from_db.report(0)):
+        assert (a["id"], a["difficulty"], a["discrimination"]) == (b["id"], b["difficulty"], b["discrimination"])
+
+
+def test_unpicked_options_are_reported(conn):
+    questions = make_questions()
+    sessions = finished_sessions(questions)
+    write_records(conn, [session_record(s, g, c) for g, c, s in sessions])
+
+    stats = ItemStats(bank_loader=lambda grade, category: questions)
+    stats.update_from_db(conn)
+    item = stats.report(0)[0]
+    assert {a["answer"]: a["rate"] for a in item["answers"]}["в"] == 0
+
+
+def test_results_follow_question_after_delete(conn):
+    questions = make_questions()
+    sessions = finished_sessions(questions)
+    write_records(conn, [session_record(s, g, c) for g, c, s in sessions])
+
+    # въпрос 0 е изтрит, а на мястото на последния е вмъкнат нов
+    edited = questions[1:3] + [{"type": "choice", "question": "Нов?", "options": ["а", "б"], "answer": "б"}]
+    stats = ItemStats(bank_loader=lambda grade, category: edited)
+    stats.update_from_db(conn)
+    report = {item["id"]: item for item in stats.report(0)}
+
+    assert sorted(report) == [0, 1]
+    assert report[0]["question"] == "Въпрос 1?"
+    assert report[1]["question"] == "Въпрос 2?"
+    assert report[0]["responses"] == 40
+
+
+def test_unscored_sessions_are_skipped(conn):
+    questions = make_questions()
+    sessions = finished_sessions(questions)
+    # отговорите от lab_server, записани локално без оценка – всички „грешни“
+    unscored = finished_sessions(questions)
+    for _, _, s in unscored:
+        s.scored = False
+        s.correct_answers = 0
+        for entry in s.answers_log:
+            entry["was_counted"] = False
+    write_records(conn, [session_record(s, g, c) for g, c, s in sessions + unscored])
+
+    expected = ItemStats()
+    expected.add_sessions(sessions)
+    from_db = ItemStats()
+    from_db.update_from_db(conn)
+    from_all = ItemStats()
+    from_all.add_sessions(sessions + unscored)
+
+    for a, b, c in zip(expected.report(0), from_db.report(0), from_all.report(0)):
+        assert (a["responses"], a["difficulty"]) == (b["responses"], b["difficulty"]) == (c["responses"], c["difficulty"])
@@ -0,0 +1,41 @@
+import json
+import asyncio
+
+from lab_server import LabServer
+
+
+def make_bank(folder):
+    questions = [
+        {"type": "choice", "question": f"{i}+1?", "options": [str(i + 1), str(i + 2)], "answer": str(i + 1)}
+        for i in range(5)
+    ]
+    (folder / "4_math.json").write_text(json.dumps(questions), encoding="utf-8")
+
+
+def test_answers_are_hidden_until_finish(tmp_path):
+    make_bank(tmp_path)
+    server = LabServer(str(tmp_path))
+
+    async def run():
+        status, data = await server.handle("POST", "/sessions", {"grade": "4", "subject": "math", "count": 5})
+        assert status == 201
+        sid = data["session"]
+        assert all("answer" not in q for q in data["questions"])
+
+        for i, q in enumerate(data["questions"]):
+            status, ack = await server.handle("POST", f"/sessions/{sid}/answers",
+                                              {"index": i, "answer": q["options"][0]})
+            assert status == 200
+            assert ack == {"index": i, "id": data["question_ids"][i], "accepted": True}
+
+        _, progress = await server.handle("GET", f"/sessions/{sid}", None)
+        assert progress == {"finished": False, "total_questions": 5, "answered": 5}
+
+        _, result = await server.handle("POST", f"/sessions/{sid}/finish", {})
+        assert result["finished"]
+        assert len(result["answers"]) == 5
+        assert all("correct" in e and "was_counted" in e for e in result["answers"])
+        return result
+
+    result = asyncio.run(run())
+    assert result["correct_answers"] == sum(e["was_counted"] for e in result["answers"])
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import question_bank
+from question_bank import (
+    BankChangedError,
+    append_journal,
+    journal_base,
+    load_bank,
+    read_journal,
+    write_bank,
+)
+
+
+def make_questions(n=3):
+    return [{"type": "text", "question": f"Въпрос {i}?", "answer": str(i)} for i in range(n)]
+
+
+def replace_outside(path, questions):
+    # git pull / копиране – същият размер и mtime, друго съдържание
+    st = os.stat(path)
+    write_bank(path, questions, compact=True)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_journal_applied_to_its_base(tmp_path):
+    path = str(tmp_path / "4_math.json")
+    write_bank(path, make_questions(), compact=True)
+    append_journal(path, [{"op": "del", "index": 0}], journal_base(path))
+    assert [q["answer"] for q in load_bank(path)] == ["1", "2"]
+
+
+def test_journal_ignored_after_bank_replaced(tmp_path):
+    path = str(tmp_path / "4_math.json")
+    write_bank(path, make_questions(), compact=True)
+    append_journal(path, [{"op": "del", "index": 0}])
+
+    other = make_questions()
+    other[0]["answer"] = "9"
+    replace_outside(path, other)
+
+    assert read_journal(path) == []
+    assert [q["answer"] for q in load_bank(path)] == ["9", "1", "2"]
+
+
+def test_append_refuses_changed_bank(tmp_path):
+    path = str(tmp_path / "4_math.json")
+    write_bank(path, make_questions(), compact=True)
+    base = journal_base(path)
+
+    write_bank(path, make_questions(5), compact=True)
+    with pytest.raises(BankChangedError):
+        append_journal(path, [{"op": "del", "index": 0}], base)
+    assert read_journal(path) == []
+    assert len(load_bank(path)) == 5
+
+
+def test_written_file_is_not_hashed_again(tmp_path, monkeypatch):
+    path = str(tmp_path / "4_math.json")
+    write_bank(path, make_questions(), compact=False)
+    remembered = journal_base(path)
+
+    question_bank._file_hashes.clear()
+    assert journal_base(path) == remembered
+
+    # отпечатъкът е помнен – малките промени не четат цялата банка
+    monkeypatch.setattr(question_bank.hashlib, "blake2b", None)
+    append_journal(path, [{"op": "del", "index": 0}], remembered)
+    assert len(read_journal(path)) == 1
@@ -0,0 +1,31 @@
+import json
+
+from quiz_session import QuizSession
+from results_store import FAILED_NAME, ResultsStore, connect, session_record
+
+
+def finished_session():
+    questions = [{"type": "text", "question": f"{i}?", "answer": str(i)} for i in range(3)]
+    session = QuizSession(questions, seed=1)
+    while session.next():
+        session.answer_text("1")
+    session.finish()
+    return session
+
+
+def test_bad_batch_does_not_stop_the_writer(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = ResultsStore(path)
+    bad = session_record(finished_session(), "4", "math")
+    del bad["answers"]
+    store.add(bad)
+    store.flush()
+
+    store.record(finished_session(), "4", "math")
+    store.close()
+
+    conn = connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 1
+    conn.close()
+    with open(tmp_path / FAILED_NAME, encoding="utf-8") as f:
+        assert [json.loads(line)["uid"] for line in f] == [bad["uid"]]
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from bank_cache import BankCache
+from question_bank import write_bank
+from quiz_session import QuizSession
+from selection import Selector, SelectionSpec
+
+
+def test_fallback_keeps_tag_weights():
+    # почти всичко е изключено – изборът минава през резервното теглене
+    questions = [{"type": "choice", "question": f"{i}?"} for i in range(1000)]
+    questions += [{"type": "choice", "question": "дроб?", "tags": ["дроби"]}]
+    questions += [{"type": "choice", "question": f"друг {i}?"} for i in range(4)]
+    selector = Selector.from_questions(questions)
+    spec = SelectionSpec(count=1, tag_weights={"дроби": 10.0})
+    exclude = set(range(1000))
+
+    rng = random.Random(7)
+    trials = 2000
+    hits = sum(selector.pick(spec, rng, exclude) == [1000] for _ in range(trials))
+    # тегло 10 срещу 4 x 1 -> 10/14; равномерно би било 1/5
+    assert abs(hits / trials - 10 / 14) < 0.05
+
+
+def test_short_quota_is_filled_from_the_bank():
+    questions = [{"type": "choice", "question": f"{i}?"} for i in range(20)]
+    questions[3]["tags"] = ["дроби"]
+    selector = Selector.from_questions(questions)
+    spec = SelectionSpec(count=5, quotas={"tag:дроби": 3})
+    picked = selector.pick(spec, random.Random(1))
+    assert len(picked) == len(set(picked)) == 5
+    assert 3 in picked
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_question_weight_without_selection_rules(tmp_path, cached):
+    # без selection.json (spec без квоти и tag_weights) "weight" пак важи
+    questions = [{"type": "text", "question": f"{i}?", "answer": str(i)} for i in range(20)]
+    questions[0]["weight"] = 100
+    path = str(tmp_path / "4_math.json")
+    write_bank(path, questions, compact=True)
+    bank = BankCache(64 << 20).get(path)
+
+    trials = 500
+    hits = 0
+    for seed in range(trials):
+        if cached:
+            session = QuizSession.from_cached(bank, spec=SelectionSpec(count=1), seed=seed)
+        else:
+            session = QuizSession.from_bank(path, spec=SelectionSpec(count=1), seed=seed)
+        hits += session.question_ids == [0]
+    # 100 / 119; равномерно би било 1 / 20
+    assert abs(hits / trials - 100 / 119) < 0.06
+
+
+def test_recent_questions_follow_edits(tmp_path):
+    from results_store import connect, recent_question_hashes, session_record, write_records
+
+    questions = [{"type": "text", "question": f"{i}?", "answer": str(i)} for i in range(10)]
+    session = QuizSession(questions[5:8], [5, 6, 7], seed=1)
+    while session.next():
+        session.answer_text("x")
+    session.finish()
+    db = str(tmp_path / "results.sqlite3")
+    conn = connect(db)
+    write_records(conn, [session_record(session, "4", "math", client="pc1")])
+    conn.close()
+
+    # в редактора е изтрит въпрос 0 – 5, 6 и 7 вече са 4, 5 и 6
+    selector = Selector.from_questions(questions[1:])
+    recent = recent_question_hashes(db, "4", "math", "pc1", sessions=1)
+    assert selector.ids_for_hashes(recent) == {4, 5, 6}
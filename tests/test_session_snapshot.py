@@ -0,0 +1,65 @@
+from quiz_session import QuizSession
+from session_snapshot import SessionSnapshot, load_snapshot
+
+
+def make_questions(n=5):
+    return [
+        {"type": "choice", "question": f"Въпрос {i}?", "answer": str(i), "options": [str(i), "a", "b", "c"]}
+        for i in range(n)
+    ]
+
+
+def answer_next(session, snapshot, answer):
+    session.next()
+    session.answer_choice(answer)
+    snapshot.answer(session, answer)
+
+
+def tear_last_line(path):
+    # срив по време на запис – от последния ред остава половината
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-8])
+
+
+def test_resume_twice_after_torn_line(tmp_path):
+    path = str(tmp_path / "session.snapshot")
+    session = QuizSession(make_questions(), seed=1)
+    snapshot = SessionSnapshot.create(path, session, "4", "math")
+    answer_next(session, snapshot, "0")
+    answer_next(session, snapshot, "a")
+    snapshot.close()
+    tear_last_line(path)
+
+    session, grade, category = load_snapshot(path)
+    assert (grade, category) == ("4", "math")
+    assert len(session.answers) == 1
+    snapshot = SessionSnapshot.reopen(path)
+    answer_next(session, snapshot, "1")
+    answer_next(session, snapshot, "2")
+    snapshot.close()
+    tear_last_line(path)
+
+    session, _, _ = load_snapshot(path)
+    assert sorted(session.answers) == [0, 1]
+    snapshot = SessionSnapshot.reopen(path)
+    answer_next(session, snapshot, "2")
+    answer_next(session, snapshot, "3")
+    snapshot.close()
+
+    session, _, _ = load_snapshot(path)
+    assert sorted(session.answers) == [0, 1, 2, 3]
+    assert session.correct_answers == 4
+
+
+def test_replay_resumes_at_first_unanswered():
+    session = QuizSession(make_questions(), seed=1)
+    session.replay([(0, "0", 1.0), (2, "2", 1.0)])
+    assert session.next()
+    assert session.current_index == 1
+
+    session = QuizSession(make_questions(3), seed=1)
+    session.replay([(0, "0", None), (1, "1", None), (2, "2", None)])
+    assert session.next()
+    assert session.current_index == 2
@@ -0,0 +1,15 @@
+import json
+
+from validator import bank_paths, duplicate_key
+
+
+def test_duplicate_key_includes_image():
+    question = {"type": "choice", "question": "", "image": "ma.jpg", "options": ["1", "2"], "answer": "1"}
+    assert duplicate_key(question) != duplicate_key(dict(question, image="math1.png"))
+    assert duplicate_key(question) == duplicate_key(dict(question, options=["2", "1"]))
+
+
+def test_selection_file_is_not_a_bank(tmp_path):
+    for name in ("4_math.json", "12_bel.jsonl", "selection.json"):
+        (tmp_path / name).write_text(json.dumps([]), encoding="utf-8")
+    assert [p.rsplit("/", 1)[-1] for p in bank_paths(str(tmp_path))] == ["12_bel.jsonl", "4_math.json"]
@@ -0,0 +1,203 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from dedupe import BANK_FILE_RE
+from question_bank import load_bank, validate_question
+from search_index import tokenize
+
+
+# Проверка на всички банки в questions/
+# -------------------------------------
+# Всеки файл се проверява в отделен процес (JSON, схема, типове, верният
+# отговор сред вариантите, еднакви въпроси); после – отново паралелно –
+# всяка спомената картинка веднъж: съществува ли в images/ и с какъв размер е.
+#
+# Всеки проблем е dict:
+#   {"level": "error"/"warning", "code": "...", "file": "...",
+#    "index": номер на въпроса (от 0) или None, "message": "..."}
+
+# размерът на картинките по questions/primer.md
+EXPECTED_IMAGE_SIZE = (800, 200)
+
+# под толкова файла не си струва да се пускат процеси
+PARALLEL_MIN_FILES = 8
+
+
+def _issue(level, code, file, index, message, **extra) -> dict:
+    issue = {"level": level, "code": code, "file": file, "index": index, "message": message}
+    issue.update(extra)
+    return issue
+
+
+def duplicate_key(question: dict) -> str:
+    """
+    Кратък отпечатък на нормализирания текст, картинката и вариантите – за
+    еднакви въпроси (въпросите само с картинка се различават по нея).
+    """
+    text = " ".join(tokenize(str(question.get("question") or "")))
+    options = sorted(" ".join(tokenize(str(o))) for o in question.get("options") or [])
+    raw = "\x1f".join([text, str(question.get("image") or "")] + options)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# -------------------------------------------------------
+#  Работа в процесите
+# -------------------------------------------------------
+def check_bank_file(path: str) -> dict:
+    """
+    Проверява един JSON файл. Връща {"file", "questions", "issues",
+    "images": {име: [индекси]}, "keys": [(отпечатък, индекс)]}.
+    """
+    name = os.path.basename(path)
+    result = {"file": name, "questions": 0, "issues": [], "images": {}, "keys": []}
+    issues = result["issues"]
+
+    try:
+        questions = load_bank(path)
+    except (OSError, ValueError) as e:
+        issues.append(_issue("error", "json", name, None, f"Файлът не може да се прочете: {e}"))
+        return result
+    result["questions"] = len(questions)
+
+    seen = {}
+    for i, q in enumerate(questions):
+        if not isinstance(q, dict):
+            issues.append(_issue("error", "schema", name, i, "Въпросът не е JSON обект."))
+            continue
+
+        _, error = validate_question(q)
+        if error:
+            issues.append(_issue("error", "schema", name, i, error))
+
+        # main.py чете тези полета директно – липсата им е срив по време на теста
+        for key in ("question", "type"):
+            if key not in q:
+                issues.append(_issue("error", "schema", name, i, f"Липсва поле „{key}“."))
+
+        image = q.get("image")
+        if image:
+            result["images"].setdefault(str(image), []).append(i)
+
+        key = duplicate_key(q)
+        if key in seen:
+            issues.append(_issue(
+                "warning", "duplicate", name, i,
+                f"Същият въпрос като №{seen[key] + 1} в този файл.", duplicate_of=seen[key],
+            ))
+        else:
+            seen[key] = i
+        result["keys"].append((key, i))
+
+    return result
+
+
+def check_image(images_path: str, image: str) -> dict:
+    """Размерът на картинката или грешка. Чете се само заглавието на файла."""
+    path = os.path.join(images_path, image)
+    if not os.path.isfile(path):
+        return {"image": image, "error": "missing"}
+
+    # Pillow – само тук, за да не го зареждат процесите за JSON
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            return {"image": image, "size": img.size}
+    except Exception as e:
+        return {"image": image, "error": f"unreadable: {e}"}
+
+
+def _check_images_chunk(args) -> list:
+    images_path, images = args
+    return [check_image(images_path, image) for image in images]
+
+
+# -------------------------------------------------------
+#  Цялата папка
+# -------------------------------------------------------
+def bank_paths(questions_path: str) -> list:
+    # само {клас}_{предмет}.json – selection.json и др. не са банки
+    return sorted(
+        os.path.join(questions_path, name)
+        for name in os.listdir(questions_path)
+        if BANK_FILE_RE.match(name)
+    )
+
+
+def _chunks(items: list, n: int) -> list:
+    size = max(1, (len(items) + n - 1) // n)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def validate_all(questions_path: str, images_path: str, jobs: int = None) -> dict:
+    """
+    Проверява всички questions/*.json и картинките към тях. Връща отчет:
+    {"files", "questions", "images", "errors", "warnings", "issues": [...]}.
+    jobs – брой процеси (по подразбиране колкото ядра има).
+    """
+    paths = bank_paths(questions_path)
+    jobs = jobs or os.cpu_count() or 1
+    parallel = jobs > 1 and len(paths) >= PARALLEL_MIN_FILES
+
+    pool = ProcessPoolExecutor(max_workers=jobs) if parallel else None
+    try:
+        if pool is not None:
+            results = list(pool.map(check_bank_file, paths, chunksize=max(1, len(paths) // (jobs * 4))))
+        else:
+            results = [check_bank_file(p) for p in paths]
+
+        issues = []
+        image_refs = {}      # картинка -> [(файл, индекс)]
+        first_seen = {}      # отпечатък -> (файл, индекс)
+        for r in results:
+            issues.extend(r["issues"])
+            for image, indexes in r["images"].items():
+                image_refs.setdefault(image, []).extend((r["file"], i) for i in indexes)
+            for key, i in r["keys"]:
+                other = first_seen.get(key)
+                if other is None:
+                    first_seen[key] = (r["file"], i)
+                elif other[0] != r["file"]:
+                    issues.append(_issue(
+                        "warning", "duplicate", r["file"], i,
+                        f"Същият въпрос като №{other[1] + 1} в {other[0]}.",
+                        duplicate_of={"file": other[0], "index": other[1]},
+                    ))
+
+        images = sorted(image_refs)
+        if pool is not None and len(images) > 1:
+            chunks = [(images_path, c) for c in _chunks(images, jobs * 4)]
+            checked = [item for part in pool.map(_check_images_chunk, chunks) for item in part]
+        else:
+            checked = _check_images_chunk((images_path, images))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for info in checked:
+        image = info["image"]
+        for file, i in image_refs[image]:
+            if info.get("error") == "missing":
+                issues.append(_issue("error", "image_missing", file, i,
+                                     f"Картинката „{image}“ липсва в images/.", image=image))
+            elif "error" in info:
+                issues.append(_issue("error", "image_unreadable", file, i,
+                                     f"Картинката „{image}“ не може да се отвори ({info['error']}).",
+                                     image=image))
+            elif tuple(info["size"]) != EXPECTED_IMAGE_SIZE:
+                w, h = info["size"]
+                issues.append(_issue("warning", "image_size", file, i,
+                                     f"Картинката „{image}“ е {w}x{h}, очаква се "
+                                     f"{EXPECTED_IMAGE_SIZE[0]}x{EXPECTED_IMAGE_SIZE[1]}.",
+                                     image=image, size=[w, h]))
+
+    issues.sort(key=lambda x: (x["file"], -1 if x["index"] is None else x["index"], x["code"]))
+    return {
+        "files": len(paths),
+        "questions": sum(r["questions"] for r in results),
+        "images": len(images),
+        "errors": sum(1 for x in issues if x["level"] == "error"),
+        "warnings": sum(1 for x in issues if x["level"] == "warning"),
+        "issues": issues,
+    }